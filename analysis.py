@@ -1,117 +1,239 @@
+import time
+from functools import cached_property
+
 import pandas as pd
 from datetime import datetime, timedelta
-from tzlocal import get_localzone
-
-
-def analyze_data_hourly(
-    df: pd.DataFrame,
-) -> tuple[
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-    pd.DataFrame,
-]:
-    """Analyze the hourly weather data and calculate min, max and average values for different time intervals.
-    The hourly data include today's data, archived data up to 4 days and forecast data up to 3 days.
+
+from window_stats import stats_frames
+
+
+def is_epoch_time(df: pd.DataFrame) -> bool:
+    """Check whether the 'time' column holds Unix epoch seconds (timeformat=unixtime).
 
     Args:
         df (pd.DataFrame): DataFrame containing weather data with a 'time' column.
 
     Returns:
-        tuple: A tuple containing DataFrames for archived data (5 hours, 1 day, and 4 days) and forecast data (3 days),
-               as well as DataFrames with min, max, and average statistics for each interval.
+        bool: True for integer epoch seconds, False for datetimes or ISO 8601 strings.
     """
+    return pd.api.types.is_integer_dtype(df["time"])
+
+
+def sort_by_time(df: pd.DataFrame) -> pd.DataFrame:
+    """Validate that the 'time' column is sorted in ascending order, so that windows can be cut by binary search.
 
-    # Convert timestamp strings to datetime objects
-    df["time"] = pd.to_datetime(df["time"], utc=True)
+    Args:
+        df (pd.DataFrame): DataFrame containing weather data with a 'time' column.
 
-    local_tz = get_localzone()  # get local timezone
-    now = datetime.now(local_tz)  # get timezone-aware datetime object
+    Returns:
+        pd.DataFrame: df itself if it is sorted, otherwise a copy sorted by time (equal times keep their order).
 
-    hours_5 = timedelta(hours=5)
-    days_1 = timedelta(days=1)
+    Raises:
+        ValueError: If the 'time' column has missing values.
+    """
+    if df["time"].is_monotonic_increasing:
+        return df
+    if df["time"].isna().any():
+        raise ValueError("The 'time' column has missing values.")
+    return df.sort_values("time", kind="stable", ignore_index=True)
 
-    # Split archived and forecast data
 
-    # Future data (forecast) - 3 days ahead
-    df_forecast = df[df["time"] > now]
+# Windows of an HourlyAnalysis, in the order of its stats
+HOURLY_WINDOWS = ("all", "5h", "1d", "archive", "forecast")
 
-    # Past data (archived) - 4 days past
-    df_archive = df[df["time"] <= now]
 
-    # From now, go back 5 hours and 1 day
-    # This assumes that the DataFrame is sorted by time in ascending order
-    mask_5h = (
-        df_archive["time"] >= (df_archive.iloc[-1].loc["time"] - hours_5).isoformat()
-    )
+class HourlyAnalysis:
+    """Windows of the hourly weather data and their min, max and average values.
 
-    mask_1d = (
-        df_archive["time"] >= (df_archive.iloc[-1].loc["time"] - days_1).isoformat()
-    )
+    Every window and its statistics are computed on first access and memoized, so plotting
+    one duration does not pay for the others. The object keeps the former 10-tuple interface:
+    ``result[6]``, ``len(result)`` and unpacking all work, in the order of FIELDS.
+
+    Args:
+        df (pd.DataFrame): Hourly data sorted by time (see sort_by_time).
+        now: Current time, in the type of the 'time' column (epoch seconds or a datetime).
+        hours_5: Length of the 5 hour window, in the same units.
+        days_1: Length of the 1 day window, in the same units.
+    """
 
-    df_5h = df_archive[mask_5h]
-    df_1d = df_archive[mask_1d]
-
-    # Calculate min, max and average values for the entire DataFrame
-    min_data = df.drop("time", axis=1).min()
-    max_data = df.drop("time", axis=1).max()
-    avg_data = df.drop("time", axis=1).mean()
-
-    # Calculate min, max and average values for the 5 hour DataFrame
-    min_data_5h = df_5h.drop("time", axis=1).min()
-    max_data_5h = df_5h.drop("time", axis=1).max()
-    avg_data_5h = df_5h.drop("time", axis=1).mean()
-
-    # Calculate min, max and average values for the 1 day DataFrame
-    min_data_1d = df_1d.drop("time", axis=1).min()
-    max_data_1d = df_1d.drop("time", axis=1).max()
-    avg_data_1d = df_1d.drop("time", axis=1).mean()
-
-    # Calculate min, max and average values for the archived 4 day DataFrame
-    min_data_archive = df_archive.drop("time", axis=1).min()
-    max_data_archive = df_archive.drop("time", axis=1).max()
-    avg_data_archive = df_archive.drop("time", axis=1).mean()
-
-    # Calculate min, max and average values for the forecast 3 day DataFrame
-    min_data_forecast = df_forecast.drop("time", axis=1).min()
-    max_data_forecast = df_forecast.drop("time", axis=1).max()
-    avg_data_forecast = df_forecast.drop("time", axis=1).mean()
-
-    # Combine the series into a DataFrame (first combine into columns and then transpose)
-    df_stats = pd.concat([min_data, max_data, avg_data], axis=1).T
-    df_stats_5h = pd.concat([min_data_5h, max_data_5h, avg_data_5h], axis=1).T
-    df_stats_1d = pd.concat([min_data_1d, max_data_1d, avg_data_1d], axis=1).T
-    df_stats_archive = pd.concat(
-        [min_data_archive, max_data_archive, avg_data_archive], axis=1
-    ).T
-    df_stats_forecast = pd.concat(
-        [min_data_forecast, max_data_forecast, avg_data_forecast], axis=1
-    ).T
-
-    # Rename the row labels
-    df_stats.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
-    df_stats_5h.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
-    df_stats_1d.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
-    df_stats_archive.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
-    df_stats_forecast.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
-
-    return (
-        df,
-        df_5h,
-        df_1d,
-        df_archive,
-        df_forecast,
-        df_stats,
-        df_stats_5h,
-        df_stats_1d,
-        df_stats_archive,
-        df_stats_forecast,
+    FIELDS = (
+        "df",
+        "df_5h",
+        "df_1d",
+        "df_archive",
+        "df_forecast",
+        "df_stats",
+        "df_stats_5h",
+        "df_stats_1d",
+        "df_stats_archive",
+        "df_stats_forecast",
     )
 
+    def __init__(self, df: pd.DataFrame, now, hours_5, days_1):
+        self.df = df
+        self.now = now
+        self.hours_5 = hours_5
+        self.days_1 = days_1
+        self._stats = {}
+
+    def _search(self, value, side: str = "left") -> int:
+        """Binary search of a time in the sorted 'time' column."""
+        return int(self.df["time"].searchsorted(value, side=side))
+
+    @cached_property
+    def _archive_stop(self) -> int:
+        """Number of archived rows: the forecast starts at the first time after now."""
+        return self._search(self.now, side="right")
+
+    def bounds(self, window: str) -> tuple[int, int]:
+        """Row range of a window of HOURLY_WINDOWS, found by binary search.
+
+        The table is sorted, so the archive is its first rows, the forecast the rest,
+        and the 5 hour and 1 day windows the last rows of the archive.
+
+        Args:
+            window (str): One of HOURLY_WINDOWS.
+
+        Returns:
+            tuple: (start, stop) row positions in df.
+        """
+        n_all = len(self.df)
+        if window == "all":
+            return 0, n_all
+        n_archive = self._archive_stop
+        if window == "archive":
+            return 0, n_archive
+        if window == "forecast":
+            return n_archive, n_all
+        if window in ("5h", "1d"):
+            if n_archive == 0:
+                return 0, 0
+            # From the last archived hour, go back 5 hours and 1 day
+            last_time = self.df["time"].iloc[n_archive - 1]
+            length = self.hours_5 if window == "5h" else self.days_1
+            return self._search(last_time - length), n_archive
+        raise ValueError(f"Unknown window: {window}")
+
+    def window(self, window: str) -> pd.DataFrame:
+        """Rows of a window of HOURLY_WINDOWS (a positional slice, not a filtered copy).
+
+        Args:
+            window (str): One of HOURLY_WINDOWS.
+
+        Returns:
+            pd.DataFrame: The rows of the window.
+        """
+        start, stop = self.bounds(window)
+        return self.df.iloc[start:stop]
+
+    @cached_property
+    def df_5h(self) -> pd.DataFrame:
+        """Last 5 hours of the archived data."""
+        return self.window("5h")
+
+    @cached_property
+    def df_1d(self) -> pd.DataFrame:
+        """Last day of the archived data."""
+        return self.window("1d")
+
+    @cached_property
+    def df_archive(self) -> pd.DataFrame:
+        """Past data (archived) - 4 days past."""
+        return self.window("archive")
+
+    @cached_property
+    def df_forecast(self) -> pd.DataFrame:
+        """Future data (forecast) - 3 days ahead."""
+        return self.window("forecast")
+
+    def stats(self, *windows: str) -> list[pd.DataFrame]:
+        """Min, max and average values of windows of HOURLY_WINDOWS.
+
+        The windows not computed yet are computed together in one pass.
+
+        Args:
+            *windows (str): Window names (all of HOURLY_WINDOWS if none are given).
+
+        Returns:
+            list: One DataFrame of min, max and avg rows per window.
+        """
+        windows = windows or HOURLY_WINDOWS
+        missing = [window for window in dict.fromkeys(windows) if window not in self._stats]
+        if missing:
+            frames = stats_frames(self.df, [self.bounds(window) for window in missing])
+            self._stats.update(zip(missing, frames))
+        return [self._stats[window] for window in windows]
+
+    @property
+    def df_stats(self) -> pd.DataFrame:
+        return self.stats("all")[0]
+
+    @property
+    def df_stats_5h(self) -> pd.DataFrame:
+        return self.stats("5h")[0]
+
+    @property
+    def df_stats_1d(self) -> pd.DataFrame:
+        return self.stats("1d")[0]
+
+    @property
+    def df_stats_archive(self) -> pd.DataFrame:
+        return self.stats("archive")[0]
+
+    @property
+    def df_stats_forecast(self) -> pd.DataFrame:
+        return self.stats("forecast")[0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return tuple(self)[index]
+        return getattr(self, self.FIELDS[index])
+
+    def __iter__(self):
+        # Everything is needed: compute all the statistics in one pass
+        self.stats()
+        return (getattr(self, field) for field in self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __repr__(self) -> str:
+        return f"HourlyAnalysis({len(self.df)} rows, computed: {sorted(self._stats) or 'nothing'})"
+
+
+def analyze_data_hourly(df: pd.DataFrame) -> "HourlyAnalysis":
+    """Analyze the hourly weather data and calculate min, max and average values for different time intervals.
+    The hourly data include today's data, archived data up to 4 days and forecast data up to 3 days.
+
+    Args:
+        df (pd.DataFrame): DataFrame containing weather data with a 'time' column
+            (ISO 8601 strings, datetimes or Unix epoch seconds).
+
+    Returns:
+        HourlyAnalysis: The DataFrames for archived data (5 hours, 1 day, and 4 days) and forecast data (3 days),
+               as well as DataFrames with min, max, and average statistics for each interval.
+               They are computed on first access, and the result still unpacks and indexes like the former 10-tuple.
+    """
+
+    if is_epoch_time(df):
+        # Epoch seconds: plain integer comparisons, no datetime parsing
+        now = int(time.time())
+        hours_5 = 5 * 3600
+        days_1 = 24 * 3600
+    else:
+        # Convert timestamp strings to datetime objects
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+
+        from tzlocal import get_localzone
+
+        local_tz = get_localzone()  # get local timezone
+        now = datetime.now(local_tz)  # get timezone-aware datetime object
+
+        hours_5 = timedelta(hours=5)
+        days_1 = timedelta(days=1)
+
+    return HourlyAnalysis(sort_by_time(df), now, hours_5, days_1)
+
 
 def analyze_data_daily(
     df: pd.DataFrame, time_limit: int = 30
@@ -121,37 +243,33 @@ def analyze_data_daily(
     The default time limit is 30 days in the past and the maximum time limit is 90 days in the past.
 
     Args:
-        df (pd.DataFrame): DataFrame containing weather data with a 'time' column.
+        df (pd.DataFrame): DataFrame containing weather data with a 'time' column
+            (ISO 8601 strings, datetimes or Unix epoch seconds).
+        time_limit (int): Number of days to go back from the last timestamp.
 
     Returns:
         tuple: A tuple containing DataFrames for a custom time limit interval (default is 30 days),
                as well as DataFrames with min, max, and average statistics for that interval.
     """
 
-    # Convert timestamp strings to datetime objects
-    df["time"] = pd.to_datetime(df["time"], utc=True)
-
     if time_limit < 1 or time_limit > 90:
         raise ValueError("Time limit must be between 1 and 90 days.")
 
-    days_limit = timedelta(days=time_limit)
+    if is_epoch_time(df):
+        days_limit = time_limit * 24 * 3600
+    else:
+        # Convert timestamp strings to datetime objects
+        df["time"] = pd.to_datetime(df["time"], utc=True)
+        days_limit = timedelta(days=time_limit)
 
     # From the last timestamp, go back a custom time limit set by the user (default is 30 days)
-    # This assumes that the DataFrame is sorted by time in ascending order
-    df_custom = df[df["time"] >= (df.iloc[-1].loc["time"] - days_limit).isoformat()]
+    # The window is found by binary search on the sorted times
+    df = sort_by_time(df)
+    start = int(df["time"].searchsorted(df["time"].iloc[-1] - days_limit, side="left"))
+    df_custom = df.iloc[start:]
 
     # Calculate min, max and average values for the custom time limit DataFrame
-    min_data_custom = df_custom.drop("time", axis=1).min()
-    max_data_custom = df_custom.drop("time", axis=1).max()
-    avg_data_custom = df_custom.drop("time", axis=1).mean()
-
-    # Combine the series into a DataFrame (first combine into columns and then transpose)
-    df_stats_custom = pd.concat(
-        [min_data_custom, max_data_custom, avg_data_custom], axis=1
-    ).T
-
-    # Rename the row labels
-    df_stats_custom.rename(index={0: "min", 1: "max", 2: "avg"}, inplace=True)
+    (df_stats_custom,) = stats_frames(df, [(start, len(df))])
 
     return df_custom, df_stats_custom
 
@@ -0,0 +1,256 @@
+"""
+Local store of daily archive data with incremental (delta) fetching.
+
+Every location and variable set is one series in a SQLite file next to the
+response cache. A series keeps one row per day, whose values are a packed
+float64 vector in the order of the variables, so a range reads back as one
+columnar block. Before fetching a date range, the store works out which days
+it does not have yet and asks the archive API for those ranges only. The
+first request for a location is a full fetch, and later ones fetch only the
+days since the last sync.
+
+Days that were fetched less than ARCHIVE_SETTLE_DAYS after the fact are
+provisional (the reanalysis keeps filling them in) and are fetched again.
+"""
+from datetime import date, timedelta
+from pathlib import Path
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+import data_processing
+from data_processing import DAILY_VARIABLES, ISO8601, UNIXTIME
+from http_cache import ARCHIVE_SETTLE_DAYS, CACHE_DIR
+
+STORE_FILE = "archive_store.sqlite3"
+
+# Missing ranges closer than this many days are fetched as one request
+# (refetching a few stored days is cheaper than another round trip)
+MERGE_GAP_DAYS = 7
+
+# Response fields kept with a series
+META_FIELDS = (
+    "latitude",
+    "longitude",
+    "elevation",
+    "timezone",
+    "timezone_abbreviation",
+    "utc_offset_seconds",
+    "daily_units",
+)
+
+
+def series_key(lat: float, lng: float, variables) -> str:
+    """
+    Key of a location (to 4 decimals, ~10 m) and variable set
+    """
+    return f"{float(lat):.4f},{float(lng):.4f}|{','.join(variables)}"
+
+
+def day_ranges(days: np.ndarray, merge_gap: int = 0) -> list[tuple[int, int]]:
+    """
+    Groups sorted day ordinals into inclusive (first, last) runs,
+    joining runs separated by at most `merge_gap` days
+    """
+    if len(days) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(days) > merge_gap + 1)
+    firsts = np.concatenate(([days[0]], days[breaks + 1]))
+    lasts = np.concatenate((days[breaks], [days[-1]]))
+    return [(int(first), int(last)) for first, last in zip(firsts, lasts)]
+
+
+class ArchiveStore:
+    """
+    SQLite store of daily series, one row per (series, day)
+    """
+    def __init__(self, path=None, clock=time.time):
+        self.path = Path(path) if path else CACHE_DIR / STORE_FILE
+        self.clock = clock
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS series (
+                key TEXT PRIMARY KEY,
+                variables TEXT NOT NULL,
+                meta TEXT NOT NULL
+            )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS days (
+                key TEXT NOT NULL,
+                day INTEGER NOT NULL,
+                fetched INTEGER NOT NULL,
+                vals BLOB NOT NULL,
+                PRIMARY KEY (key, day)
+            ) WITHOUT ROWID"""
+        )
+
+    def today(self) -> date:
+        return date.fromtimestamp(self.clock())
+
+    def missing_ranges(self, key: str, start: date, end: date,
+                       merge_gap: int = MERGE_GAP_DAYS) -> list[tuple[date, date]]:
+        """
+        Date ranges of [start, end] that have to be fetched: days never
+        stored, and days stored while they were still provisional
+
+        :return: inclusive (from_date, to_date) ranges, oldest first
+        """
+        first, last = start.toordinal(), end.toordinal()
+        if last < first:
+            return []
+        with self._lock:
+            final = self._db.execute(
+                "SELECT day FROM days WHERE key = ? AND day BETWEEN ? AND ? AND fetched - day >= ?",
+                (key, first, last, ARCHIVE_SETTLE_DAYS),
+            ).fetchall()
+        wanted = np.arange(first, last + 1)
+        missing = np.setdiff1d(wanted, np.fromiter((day for (day,) in final), dtype=np.int64))
+        return [
+            (date.fromordinal(a), date.fromordinal(b))
+            for a, b in day_ranges(missing, merge_gap)
+        ]
+
+    def merge(self, key: str, variables, raw_data: dict) -> int:
+        """
+        Stores the days of an archive response fetched with ISO 8601 times,
+        replacing any stored values for them
+
+        :return: number of days stored
+        """
+        daily = raw_data["daily"]
+        days = [date.fromisoformat(day).toordinal() for day in daily["time"]]
+        block = np.empty((len(days), len(variables)), dtype=np.float64)
+        for column, name in enumerate(variables):
+            block[:, column] = np.asarray(daily[name], dtype=np.float64)
+        fetched = self.today().toordinal()
+        meta = {field: raw_data[field] for field in META_FIELDS if field in raw_data}
+
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO series VALUES (?, ?, ?)",
+                    (key, json.dumps(list(variables)), json.dumps(meta)),
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO days VALUES (?, ?, ?, ?)",
+                    [(key, day, fetched, row.tobytes()) for day, row in zip(days, block)],
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return len(days)
+
+    def read(self, key: str, start: date, end: date) -> tuple[np.ndarray, np.ndarray, dict]:
+        """
+        Stored days of [start, end]
+
+        :return: (day ordinals, float64 block of shape (days, variables), series meta)
+        """
+        with self._lock:
+            series = self._db.execute(
+                "SELECT variables, meta FROM series WHERE key = ?", (key,)
+            ).fetchone()
+            rows = self._db.execute(
+                "SELECT day, vals FROM days WHERE key = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (key, start.toordinal(), end.toordinal()),
+            ).fetchall()
+        if series is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0)), {}
+        n_vars = len(json.loads(series[0]))
+        days = np.fromiter((day for day, _ in rows), dtype=np.int64, count=len(rows))
+        block = np.frombuffer(b"".join(vals for _, vals in rows), dtype=np.float64)
+        return days, block.reshape(len(rows), n_vars), json.loads(series[1])
+
+    def clear(self) -> None:
+        """Drops every series"""
+        with self._lock:
+            self._db.execute("DELETE FROM days")
+            self._db.execute("DELETE FROM series")
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def days_to_times(days: np.ndarray, timeformat: str, timezone: str | None):
+    """
+    Day ordinals -> the 'time' values Open-Meteo returns for daily data:
+    ISO 8601 dates, or the epoch seconds of local midnight
+    """
+    import pandas as pd
+
+    dates = pd.to_datetime(days - date(1970, 1, 1).toordinal(), unit="D")
+    if timeformat == UNIXTIME:
+        midnight = dates.tz_localize(timezone or "UTC", nonexistent="shift_forward", ambiguous=False)
+        return midnight.as_unit("s").asi8
+    return list(dates.strftime("%Y-%m-%d"))
+
+
+def fetch_daily_data(lat, lng, from_date=None, to_date=None, timeformat=ISO8601, store=None):
+    """
+    data_processing.fetch_daily_data() through the local store: only the
+    missing ranges are requested from the archive API, and the response is
+    assembled from the store in the same JSON shape
+
+    :param store: ArchiveStore to use, by default get_store(); without a
+                  store this is a plain data_processing.fetch_daily_data()
+    """
+    store = store or get_store()
+    from_date = from_date or date.today() - timedelta(days=30)
+    to_date = to_date or date.today() - timedelta(days=1)
+    if store is None:
+        return data_processing.fetch_daily_data(lat, lng, from_date, to_date, timeformat)
+
+    variables = list(DAILY_VARIABLES)
+    key = series_key(lat, lng, variables)
+    for start, end in store.missing_ranges(key, from_date, to_date):
+        store.merge(key, variables, data_processing.fetch_daily_data(lat, lng, start, end, ISO8601))
+
+    days, block, meta = store.read(key, from_date, to_date)
+    daily = {"time": days_to_times(days, timeformat, meta.get("timezone"))}
+    for column, name in enumerate(variables):
+        daily[name] = block[:, column]
+    return {**meta, "daily": daily}
+
+
+def raw_daily_data_imperial(lat, lng, from_date=None, to_date=None, timeformat=ISO8601, store=None):
+    """
+    fetch_daily_data() converted to imperial units
+    """
+    return data_processing.to_imperial(fetch_daily_data(lat, lng, from_date, to_date, timeformat, store))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ArchiveStore | None:
+    """
+    Returns the process wide ArchiveStore, or None if disabled
+    (WEATHER_CACHE_DISABLE=1 or set_store(None))
+    """
+    global _store
+    if _store is None and os.environ.get("WEATHER_CACHE_DISABLE") != "1":
+        with _store_lock:
+            if _store is None:
+                _store = ArchiveStore()
+    return _store or None
+
+
+def set_store(store: ArchiveStore | None) -> None:
+    """
+    Replaces the process wide store; None disables it
+    """
+    global _store
+    _store = store if store is not None else False
@@ -0,0 +1,141 @@
+"""
+Asyncio engine for downloading many locations concurrently.
+
+The fetch functions of data_processing.py run on a thread pool behind two
+asyncio semaphores, one bounding the total number of requests in flight and
+one per API host. The threads share the pooled session of http_session.py,
+so each host's keep-alive connections are reused (the per-host limit should
+not exceed the session pool size). Results have the same shapes as the
+synchronous functions: JSON dicts, or DataFrames with tables=True.
+
+Concurrent fetches of the same kind, location and arguments are coalesced
+(see single_flight.py): duplicates wait on the event loop for the first one
+instead of taking a thread and a semaphore slot of their own.
+
+fetch_many() is the synchronous entry point for code that does not run an
+event loop itself (Visuals, scripts).
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlsplit
+
+import data_processing
+from http_cache import canonical_params
+from http_session import POOL_SIZE
+from single_flight import get_flights
+
+MAX_CONCURRENCY = 16
+MAX_PER_HOST = POOL_SIZE
+
+FORECAST_HOST = urlsplit(data_processing.FORECAST_URL).netloc
+ARCHIVE_HOST = urlsplit(data_processing.ARCHIVE_URL).netloc
+
+# kind -> (fetch function name in data_processing, host, table function name)
+KINDS = {
+    "hourly_metric": ("fetch_hourly_metric_data", FORECAST_HOST, "data_in_table"),
+    "hourly_imperial": ("hourly_imperial_data", FORECAST_HOST, "data_in_table"),
+    "daily_metric": ("fetch_daily_data", ARCHIVE_HOST, "daily_data_table"),
+    "daily_imperial": ("raw_daily_data_imperial", ARCHIVE_HOST, "daily_data_table"),
+}
+
+
+class AsyncFetchEngine:
+    """
+    Runs the data_processing fetchers concurrently with bounded concurrency
+
+    An engine belongs to the event loop it is first used in.
+    """
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY, max_per_host: int = MAX_PER_HOST):
+        self.max_concurrency = max_concurrency
+        self.max_per_host = max_per_host
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._host_semaphores = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="fetch")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    async def run(self, host: str, func, *args, **kwargs):
+        """
+        Calls a blocking fetch function on the pool once both
+        the global and the per host semaphores allow it
+        """
+        host_semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.max_per_host))
+        async with self._semaphore, host_semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def fetch(self, kind: str, lat: float, lng: float, tables: bool = False, **kwargs):
+        """
+        Async counterpart of one of the four fetchers (see KINDS)
+
+        :param tables: also parse the JSON into a DataFrame
+        """
+        flights = get_flights()
+        if flights is None:
+            return await self._fetch(kind, lat, lng, tables, **kwargs)
+        key = ("async_fetch", kind, float(lat), float(lng), tuple(canonical_params(kwargs)), tables)
+        return await flights.do_async(key, self._fetch, kind, lat, lng, tables, **kwargs)
+
+    async def _fetch(self, kind: str, lat: float, lng: float, tables: bool, **kwargs):
+        func_name, host, table_name = KINDS[kind]
+        raw_data = await self.run(host, getattr(data_processing, func_name), lat, lng, **kwargs)
+        if tables:
+            return getattr(data_processing, table_name)(raw_data)
+        return raw_data
+
+    async def fetch_hourly_metric_data(self, lat, lng):
+        return await self.fetch("hourly_metric", lat, lng)
+
+    async def hourly_imperial_data(self, lat, lng):
+        return await self.fetch("hourly_imperial", lat, lng)
+
+    async def fetch_daily_data(self, lat, lng, **kwargs):
+        return await self.fetch("daily_metric", lat, lng, **kwargs)
+
+    async def raw_daily_data_imperial(self, lat, lng, **kwargs):
+        return await self.fetch("daily_imperial", lat, lng, **kwargs)
+
+    async def fetch_all(self, kind: str, coords, tables: bool = False, **kwargs) -> list:
+        """
+        Fetches every (lat, lng) in coords concurrently, results in input order
+        """
+        return await asyncio.gather(
+            *(self.fetch(kind, lat, lng, tables=tables, **kwargs) for lat, lng in coords)
+        )
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from synchronous code,
+    also when the caller is itself inside a running event loop
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def fetch_many(kind: str, coords, tables: bool = False,
+               max_concurrency: int = MAX_CONCURRENCY, max_per_host: int = MAX_PER_HOST,
+               **kwargs) -> list:
+    """
+    Synchronous wrapper: fetches `kind` (see KINDS) for every (lat, lng)
+    in coords concurrently and returns the results in input order
+
+    >>> fetch_many("hourly_metric", [(52.52, 13.41), (48.85, 2.35)])
+    """
+    async def main():
+        async with AsyncFetchEngine(max_concurrency, max_per_host) as engine:
+            return await engine.fetch_all(kind, coords, tables=tables, **kwargs)
+
+    return run_sync(main())
@@ -0,0 +1,377 @@
+"""
+Headless chart rendering, for servers and for charts of many cities.
+
+Charts are drawn on the non-interactive Agg backend and written to files
+(PNG, SVG or PDF by extension) instead of being shown. render_batch() takes a
+list of (city, duration, unit) jobs and renders them across a pool of
+processes. Each worker configures matplotlib and imports the plotting code
+once, in its initializer, and then renders job after job. The workers split
+the Open-Meteo rate limits between them (see rate_limit.py). Cities are
+resolved to coordinates in the calling process, so the search index is
+built once.
+
+Jobs of the same location are rendered together by one worker: the
+location's data is fetched once and shared by all its durations and both
+unit systems (see location_data.py). Besides charts, a batch can compute the min, max and
+average values of every job (stats=True), as one table.
+
+Jobs can be read from a CSV or JSON lines file (read_jobs) with the fields
+city, country (optional), duration and unit (optional, default Metric).
+
+The BatchReport of a batch gives the throughput in charts per second per core.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import NamedTuple
+import csv
+import json
+import os
+import re
+import time
+
+BACKEND = "Agg"
+FORMATS = ("png", "svg", "pdf")
+DURATIONS = ("5hr", "24hr", "pst_4d", "nxt_3d", "1m", "2m", "3m")
+UNIT_SYSTEMS = ("Metric", "Imperial")
+# Candidates listed for a city name that matches more than one
+AMBIGUOUS_SHOWN = 3
+
+
+class RenderJob(NamedTuple):
+    """
+    One chart to render
+
+    :city: "City", "City, Country" or a (lat, lng) tuple
+    :duration: duration code (see DURATIONS)
+    :unit_sys: "Metric" or "Imperial"
+    """
+    city: str | tuple
+    duration: str
+    unit_sys: str = "Metric"
+
+
+class RenderResult(NamedTuple):
+    """
+    Outcome of a RenderJob
+
+    :path: chart file written, None if it failed or without charts
+    :seconds: time the worker spent on the job (fetch, analysis and drawing;
+              the data of a location is fetched by its first job)
+    :error: error message if it failed
+    :stats: with stats=True, a table of variable, unit, min, max and avg
+    :place: gazetteer Place the job's city was resolved to
+            (None for coordinates, or if it was not found)
+    """
+    job: RenderJob
+    path: Path | None
+    seconds: float
+    error: str | None = None
+    stats: object = None
+    place: object = None
+
+
+@dataclass
+class BatchReport:
+    """
+    Results and throughput of a render_batch() call
+    """
+    results: list = field(default_factory=list)
+    seconds: float = 0.0
+    workers: int = 1
+    locations: int = 0  # distinct locations
+    fetches: int = 0  # payloads fetched for them
+
+    @property
+    def charts(self) -> int:
+        return sum(result.error is None for result in self.results)
+
+    @property
+    def failed(self) -> list:
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def charts_per_second(self) -> float:
+        return self.charts / self.seconds if self.seconds else 0.0
+
+    @property
+    def charts_per_second_per_core(self) -> float:
+        cores = min(self.workers, os.cpu_count() or 1)
+        return self.charts_per_second / cores
+
+    def stats_table(self):
+        """
+        Stats of every successful job as one table: city (as in the job),
+        place (the city it was resolved to), duration, unit_sys, variable,
+        unit, min, max, avg
+        """
+        import pandas as pd
+
+        frames = [
+            result.stats.assign(city=str(result.job.city),
+                                place=f"{result.place.city}, {result.place.country}" if result.place else "",
+                                duration=result.job.duration, unit_sys=result.job.unit_sys)
+            for result in self.results if result.stats is not None
+        ]
+        columns = ["city", "place", "duration", "unit_sys", "variable", "unit", "min", "max", "avg"]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def __str__(self) -> str:
+        return (f"{self.charts} charts ({len(self.failed)} failed) in {self.seconds:.2f}s "
+                f"on {self.workers} worker(s): {self.charts_per_second:.2f} charts/s, "
+                f"{self.charts_per_second_per_core:.2f} charts/s/core, "
+                f"{self.fetches} fetches for {self.locations} location(s)")
+
+
+def configure_headless() -> None:
+    """
+    Switches matplotlib to the non-interactive backend
+    (before pyplot draws anything; safe to call more than once)
+    """
+    import matplotlib
+    matplotlib.use(BACKEND, force=True)
+
+
+def resolve_place(city, strict: bool = True):
+    """
+    Gazetteer Place of a job's city, None for a (lat, lng) tuple
+
+    A name ("Paris" or "Paris, France") is looked up in the gazetteer, and
+    goes through the city search if it is not there as written. A name
+    without country must be listed in one country only. With strict (batch
+    jobs, no one to ask) the search must give one exact match, or a single
+    candidate, so a chart is never made for a city picked by guess.
+
+    :raises ValueError: if no city matches, or (strict) several could
+    """
+    if isinstance(city, (tuple, list)):
+        return None
+    from city_search import EXACT, search_cities
+    from gazetteer import get_gazetteer
+
+    name, _, country = str(city).partition(",")
+    name, country = name.strip(), country.strip()
+    if country:
+        place = get_gazetteer().lookup(name, country)
+        if place:
+            return place
+    else:
+        places = get_gazetteer().lookup_city(name)
+        if len(places) == 1 or (places and not strict):
+            return places[0]
+        if places:
+            candidates = "; ".join(f"{place.city}, {place.country}" for place in places[:AMBIGUOUS_SHOWN])
+            raise ValueError(f"Ambiguous city: {city} (listed in {len(places)} countries: {candidates}; "
+                             "give the country)")
+    matches = search_cities(name, country or None, limit=AMBIGUOUS_SHOWN)
+    if not matches:
+        raise ValueError(f"City not found: {city}")
+    exact = [match for match in matches if match.kind == EXACT]
+    if not strict or len(matches) == 1 or len(exact) == 1:
+        return (exact or matches)[0].place
+    candidates = "; ".join(f"{match.place.city}, {match.place.country}" for match in matches)
+    raise ValueError(f"Ambiguous city: {city} (could be {candidates}; give the exact name and country)")
+
+
+def resolve_city(city, strict: bool = True) -> tuple:
+    """
+    (lat, lng) of a job's city: a tuple is returned as is, a name
+    is resolved by resolve_place()
+
+    :raises ValueError: if no city matches, or (strict) several could
+    """
+    if isinstance(city, (tuple, list)):
+        lat, lng = city
+        return float(lat), float(lng)
+    return resolve_place(city, strict).coords
+
+
+def read_jobs(path) -> list:
+    """
+    Reads jobs from a CSV file with a header row, or a JSON lines file
+    (.jsonl or .json), with the fields city, country (optional), duration
+    and unit (optional, "Metric" by default, any case)
+
+    :return: list of RenderJob, city as "City, Country"
+    :raises ValueError: for a job without city or duration
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.suffix.lower() in (".jsonl", ".json"):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+
+    jobs = []
+    for number, row in enumerate(rows, start=1):
+        city = str(row.get("city") or "").strip()
+        duration = str(row.get("duration") or "").strip()
+        if not city or not duration:
+            raise ValueError(f"{path.name}, job {number}: city and duration are required")
+        country = str(row.get("country") or "").strip()
+        unit = str(row.get("unit") or "Metric").strip().capitalize()
+        jobs.append(RenderJob(f"{city}, {country}" if country else city, duration, unit))
+    return jobs
+
+
+def job_filename(job: RenderJob, fmt: str) -> str:
+    """
+    File name of a job's chart, e.g. "paris_france_5hr_metric.png"
+    """
+    if isinstance(job.city, (tuple, list)):
+        city = "{:.4f}_{:.4f}".format(*job.city)
+    else:
+        city = job.city
+    slug = re.sub(r"[^0-9a-z.-]+", "_", str(city).lower()).strip("_")
+    return f"{slug}_{job.duration}_{job.unit_sys.lower()}.{fmt}"
+
+
+def render_chart(coords: tuple, duration: str, unit_sys: str, path, data=None) -> Path:
+    """
+    Fetches, analyses and draws one chart into `path` (headless)
+
+    :param data: LocationData of coords to reuse (default: fetched for this chart)
+    """
+    configure_headless()
+    from visuals import Visuals
+
+    Visuals(coords, duration, unit_sys, output=str(path), data=data)
+    return Path(path)
+
+
+def job_stats(data, duration: str, unit_sys: str):
+    """
+    Min, max and avg of every variable of a duration, one row per variable
+    """
+    _, stats = data.window(duration, unit_sys)
+    units = data.load(duration, unit_sys).units
+    table = stats.T.rename_axis("variable").reset_index()
+    table.insert(1, "unit", [units.get(name, "") for name in table["variable"]])
+    return table
+
+
+def _init_worker(initializer=None, initargs=(), rate_limits=None) -> None:
+    """
+    Worker initializer: configures matplotlib and imports the plotting
+    code once per process, then runs the caller's initializer
+    (headless charts are drawn on figure templates, without pyplot)
+
+    :param rate_limits: this worker's share of the rate limits
+                        (see rate_limit.worker_limits), None to keep them
+    """
+    configure_headless()
+    import visuals  # noqa: F401
+
+    if rate_limits is not None:
+        from rate_limit import use_limits
+
+        use_limits(rate_limits)
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _render_group(task) -> tuple:
+    """
+    Renders the jobs of one location, with one fetch per payload
+
+    :return: (list of (job position, RenderResult), number of fetches)
+    """
+    from location_data import LocationData
+
+    coords, items, charts, stats = task
+    data = LocationData(coords)
+    # The longest daily range covers the shorter ones
+    prefetch = [job.duration for _, job, _ in items]
+    results = []
+    for position, job, path in items:
+        started = time.perf_counter()
+        try:
+            if prefetch:
+                data.prefetch(prefetch)
+                prefetch = None
+            if charts:
+                render_chart(coords, job.duration, job.unit_sys, path, data=data)
+            table = job_stats(data, job.duration, job.unit_sys) if stats else None
+        except Exception as error:  # reported in the result, the batch goes on
+            prefetch = None
+            result = RenderResult(job, None, time.perf_counter() - started, f"{type(error).__name__}: {error}")
+        else:
+            result = RenderResult(job, Path(path) if charts else None, time.perf_counter() - started,
+                                  stats=table)
+        results.append((position, result))
+    return results, data.fetches
+
+
+def _city_key(city):
+    return city if isinstance(city, str) else tuple(city)
+
+
+def render_batch(jobs, out_dir, fmt: str = "png", workers: int | None = None,
+                 initializer=None, initargs=(), charts: bool = True, stats: bool = False) -> BatchReport:
+    """
+    Renders every job into out_dir across a process pool
+
+    :param jobs: RenderJobs or (city, duration, unit_sys) tuples
+    :param fmt: file format, one of FORMATS
+    :param workers: number of processes (default: one per core);
+                    0 renders in this process
+    :param initializer: extra per worker setup, called with initargs
+    :param charts: draw the charts (False for stats only)
+    :param stats: compute the min, max and avg values of each job
+                  (see BatchReport.stats_table)
+    :return: BatchReport with one RenderResult per job, in job order;
+             a job with an unknown duration or unit system, or a city
+             that cannot be resolved, fails without stopping the others
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (use one of {', '.join(FORMATS)})")
+    jobs = [RenderJob(*job) for job in jobs]
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+
+    # Every city is resolved once, and jobs are grouped by location
+    places = {}
+    groups = {}
+    results = [None] * len(jobs)
+    for position, job in enumerate(jobs):
+        if job.duration not in DURATIONS:
+            results[position] = RenderResult(job, None, 0.0, f"ValueError: Unknown duration: {job.duration}")
+            continue
+        if job.unit_sys not in UNIT_SYSTEMS:
+            results[position] = RenderResult(job, None, 0.0, f"ValueError: Unknown unit system: {job.unit_sys}")
+            continue
+        key = _city_key(job.city)
+        if key not in places:
+            try:
+                places[key] = resolve_place(job.city)
+            except ValueError as error:
+                places[key] = error
+        place = places[key]
+        if isinstance(place, ValueError):
+            results[position] = RenderResult(job, None, 0.0, f"ValueError: {place}")
+            continue
+        coords = place.coords if place else resolve_city(job.city)
+        groups.setdefault(coords, []).append((position, job, out_dir / job_filename(job, fmt)))
+    tasks = [(location, items, charts, stats) for location, items in groups.items()]
+
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers == 0:
+        _init_worker(initializer, initargs)
+        done = [_render_group(task) for task in tasks]
+    else:
+        from rate_limit import worker_limits
+
+        # the workers split the rate limits, so the batch stays within them
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(initializer, initargs, worker_limits(workers))) as pool:
+            done = list(pool.map(_render_group, tasks))
+
+    for group_results, _ in done:
+        for position, result in group_results:
+            results[position] = result._replace(place=places[_city_key(result.job.city)])
+    return BatchReport(results, time.perf_counter() - started, max(workers, 1),
+                       locations=len(tasks), fetches=sum(fetches for _, fetches in done))
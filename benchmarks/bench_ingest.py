@@ -0,0 +1,67 @@
+"""
+Benchmark of the JSON -> DataFrame ingest (data_in_table / daily_data_table).
+
+Compares the current columnar builder with the previous column-by-column
+assignment on synthetic Open-Meteo payloads of growing length, including the
+cost of parsing the 'time' strings that analysis.py needs.
+
+Run from the repository root:
+    python benchmarks/bench_ingest.py
+"""
+from pathlib import Path
+import json
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from data_processing import data_in_table, HOURLY_TABLE_COLUMNS  # noqa: E402
+from http_cache import json_loads  # noqa: E402
+
+
+def legacy_data_in_table(raw_data):
+    """data_in_table before the columnar builder"""
+    df_raw = pd.DataFrame()
+    df_raw["time"] = raw_data["hourly"]["time"]
+    for name in HOURLY_TABLE_COLUMNS:
+        df_raw[name] = raw_data["hourly"][name]
+    # analysis.py then parsed the strings
+    df_raw["time"] = pd.to_datetime(df_raw["time"])
+    return df_raw
+
+
+def hourly_payload(hours: int) -> bytes:
+    """Synthetic hourly response with `hours` rows and a few nulls"""
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2020-01-01", periods=hours, freq="h").strftime("%Y-%m-%dT%H:%M")
+    hourly = {"time": list(times)}
+    for name in HOURLY_TABLE_COLUMNS:
+        values = np.round(rng.normal(50, 20, hours), 1).tolist()
+        values[::97] = [None] * len(values[::97])
+        hourly[name] = values
+    return json.dumps({"hourly": hourly}).encode()
+
+
+def best_of(func, repeat=7):
+    number = 5
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def main():
+    print(f"{'payload':<22}{'decode':>10}{'legacy':>10}{'columnar':>10}{'speedup':>9}")
+    for label, hours in (("3 months hourly", 92 * 24), ("1 year hourly", 365 * 24),
+                         ("5 years hourly", 5 * 365 * 24)):
+        body = hourly_payload(hours)
+        raw = json_loads(body)
+        decode = best_of(lambda: json_loads(body))
+        legacy = best_of(lambda: legacy_data_in_table(raw))
+        columnar = best_of(lambda: data_in_table(raw))
+        print(f"{label:<22}{decode * 1e3:>8.2f}ms{legacy * 1e3:>8.2f}ms"
+              f"{columnar * 1e3:>8.2f}ms{legacy / columnar:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
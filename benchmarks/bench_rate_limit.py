@@ -0,0 +1,94 @@
+"""
+Benchmark of the rate limiter against a simulated Open-Meteo (no network).
+
+The simulated API counts calls in fixed minute and hour windows and answers
+429 with Retry-After until the window ends once a limit is reached. A
+fetcher sends requests one after the other (each one takes LATENCY seconds)
+through a RateLimiter, on a simulated clock, and the table shows the
+sustained requests per minute and the 429 responses it got:
+- when the configured budgets are the API's limits,
+- when the API allows less than configured (e.g. other clients on the same IP),
+- without a limiter, only waiting for Retry-After.
+
+Run from the repository root:
+    python benchmarks/bench_rate_limit.py [requests]
+"""
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rate_limit import RateLimiter  # noqa: E402
+
+LATENCY = 0.05  # seconds per request
+CONFIGURED = [("minute", 600, 60), ("hour", 5000, 3600)]
+SCENARIOS = {
+    "limits as configured": ((600, 60), (5000, 3600)),
+    "API allows half": ((300, 60), (2500, 3600)),
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class SimulatedAPI:
+    """Fixed window limits: (calls, window seconds) pairs"""
+    def __init__(self, limits):
+        self.limits = limits
+        self.counts = {}
+
+    def call(self, now: float) -> float | None:
+        """None if served, else the Retry-After seconds of a 429"""
+        for limit, window in self.limits:
+            if self.counts.get((window, now // window), 0) >= limit:
+                return (now // window + 1) * window - now
+        for limit, window in self.limits:
+            key = (window, now // window)
+            self.counts[key] = self.counts.get(key, 0) + 1
+        return None
+
+
+def run(api: SimulatedAPI, requests: int, limiter: RateLimiter | None, clock: Clock) -> tuple:
+    throttled = 0
+    done = 0
+    while done < requests:
+        if limiter is not None:
+            limiter.acquire()
+        clock.sleep(LATENCY)
+        retry_after = api.call(clock.now)
+        if retry_after is None:
+            done += 1
+            if limiter is not None:
+                limiter.success()
+            continue
+        throttled += 1
+        if limiter is not None:
+            limiter.throttled(retry_after)
+        else:
+            clock.sleep(retry_after)
+    return clock.now, throttled
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+    print(f"{requests} requests, {LATENCY * 1000:.0f} ms each, configured {CONFIGURED}")
+    print(f"{'scenario':<24}{'limiter':>9}{'minutes':>9}{'req/min':>9}{'429s':>7}")
+    for name, limits in SCENARIOS.items():
+        for limited in (True, False):
+            clock = Clock()
+            limiter = RateLimiter(CONFIGURED, clock=clock, sleep=clock.sleep) if limited else None
+            seconds, throttled = run(SimulatedAPI(limits), requests, limiter, clock)
+            print(f"{name:<24}{'yes' if limited else 'no':>9}{seconds / 60:>9.1f}"
+                  f"{requests / seconds * 60:>9.0f}{throttled:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of headless batch rendering (batch_render.render_batch).
+
+Renders every duration in both unit systems for a few locations, with an
+increasing number of worker processes, and prints the throughput in charts
+per second per core. The workers answer requests with synthetic Open-Meteo
+payloads, so the figures measure analysis and drawing, not the network.
+
+Run from the repository root:
+    python benchmarks/bench_render.py [charts]
+"""
+from datetime import date
+from pathlib import Path
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from batch_render import DURATIONS, UNIT_SYSTEMS, render_batch  # noqa: E402
+
+LOCATIONS = [(51.5072, -0.1275), (48.8567, 2.3522), (40.6943, -73.9249), (35.6897, 139.6922)]
+
+UNITS = {
+    "temperature_2m": "°C", "relative_humidity_2m": "%", "precipitation": "mm",
+    "wind_speed_10m": "km/h", "cloud_cover": "%", "surface_pressure": "hPa",
+    "wind_direction_10m": "°", "temperature_2m_max": "°C", "temperature_2m_min": "°C",
+    "apparent_temperature_mean": "°C", "precipitation_sum": "mm", "sunshine_duration": "s",
+    "wind_speed_10m_max": "km/h", "wind_direction_10m_dominant": "°",
+}
+
+
+def synthetic_response(url, params):
+    """Open-Meteo like response for the requested variables and dates"""
+    block = "hourly" if "hourly" in params else "daily"
+    start = date.fromisoformat(params["start_date"]).toordinal() - date(1970, 1, 1).toordinal()
+    end = date.fromisoformat(params["end_date"]).toordinal() - date(1970, 1, 1).toordinal()
+    step = 3600 if block == "hourly" else 86400
+    times = np.arange(start * 86400, (end + 1) * 86400, step)
+    rng = np.random.default_rng(len(times))
+    columns = {"time": times if params.get("timeformat") == "unixtime"
+               else list(np.datetime_as_string(times.astype("datetime64[s]"), unit="m" if step == 3600 else "D"))}
+    for name in params[block]:
+        columns[name] = np.abs(rng.normal(20, 8, len(times))).round(1)
+    return {
+        "timezone": "GMT",
+        "utc_offset_seconds": 0,
+        f"{block}_units": {name: UNITS.get(name, "") for name in columns},
+        block: columns,
+    }
+
+
+def use_synthetic_data():
+    """Worker initializer: no network, no caches"""
+    import archive_store
+    import data_processing
+    import http_cache
+
+    http_cache.set_cache(None)
+    archive_store.set_store(None)
+    data_processing.fetch_json = synthetic_response
+
+
+def main():
+    charts = int(sys.argv[1]) if len(sys.argv) > 1 else 56
+    jobs = [
+        (LOCATIONS[n % len(LOCATIONS)], DURATIONS[n % len(DURATIONS)], UNIT_SYSTEMS[n // len(DURATIONS) % 2])
+        for n in range(charts)
+    ]
+    cores = os.cpu_count() or 1
+    print(f"{charts} charts, {cores} core(s)")
+    print(f"{'workers':<9}{'seconds':>9}{'charts/s':>10}{'charts/s/core':>15}")
+    for workers in sorted({1, max(1, cores // 2), cores}):
+        with tempfile.TemporaryDirectory() as out_dir:
+            started = time.perf_counter()
+            report = render_batch(jobs, out_dir, workers=workers, initializer=use_synthetic_data)
+            assert not report.failed, report.failed[0].error
+            print(f"{workers:<9}{time.perf_counter() - started:>9.2f}"
+                  f"{report.charts_per_second:>10.2f}{report.charts_per_second_per_core:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
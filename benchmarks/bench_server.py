@@ -0,0 +1,72 @@
+"""
+Benchmark of weather_server on cached data.
+
+Starts the server in this process with synthetic Open-Meteo payloads (no
+network), warms the caches with one request per URL, then has keep-alive
+clients send requests as fast as they can and prints the requests per
+second per endpoint. The clients share the event loop and the core with
+the server, so the figures are a lower bound.
+
+Run from the repository root:
+    python benchmarks/bench_server.py [requests] [clients]
+"""
+from pathlib import Path
+import asyncio
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_render import LOCATIONS, use_synthetic_data  # noqa: E402
+from weather_server import WeatherService  # noqa: E402
+
+ENDPOINTS = {
+    "coords": ["/coords?city=Paris&country=France", "/coords?city=Tokyo&country=Japan"],
+    "stats": [f"/stats?lat={lat}&lng={lng}&duration={duration}"
+              for lat, lng in LOCATIONS for duration in ("5hr", "pst_4d", "1m")],
+    "hourly": [f"/hourly?lat={lat}&lng={lng}&duration=nxt_3d" for lat, lng in LOCATIONS],
+    "daily": [f"/daily?lat={lat}&lng={lng}&days=90&format=csv" for lat, lng in LOCATIONS],
+    "chart": [f"/chart.png?lat={lat}&lng={lng}&duration=24hr" for lat, lng in LOCATIONS[:2]],
+}
+
+
+async def client(port: int, targets: list, count: int) -> None:
+    """Sends count GET requests over one keep-alive connection"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for n in range(count):
+        writer.write(f"GET {targets[n % len(targets)]} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+        head = await reader.readuntil(b"\r\n\r\n")
+        if not head.startswith(b"HTTP/1.1 200"):
+            raise RuntimeError(head.decode("latin-1"))
+        length = int(head.lower().split(b"content-length: ")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+    writer.close()
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    clients = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    use_synthetic_data()
+    service = WeatherService(render_workers=0)
+    server = await service.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    started = time.perf_counter()
+    for targets in ENDPOINTS.values():
+        await client(port, targets, len(targets))
+    print(f"cold: {sum(map(len, ENDPOINTS.values()))} URLs in {time.perf_counter() - started:.2f}s")
+
+    print(f"{requests} cached requests per endpoint, {clients} keep-alive clients")
+    print(f"{'endpoint':<10}{'seconds':>9}{'requests/s':>12}")
+    for name, targets in ENDPOINTS.items():
+        started = time.perf_counter()
+        await asyncio.gather(*(client(port, targets, requests // clients) for _ in range(clients)))
+        seconds = time.perf_counter() - started
+        print(f"{name:<10}{seconds:>9.2f}{requests // clients * clients / seconds:>12.0f}")
+
+    server.close()
+    service.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""
+Benchmark of import (startup) time, measured with python -X importtime.
+
+Each entry module is imported in a fresh interpreter a few times. The best
+cumulative import time is compared with its budget, and the heavy modules it
+pulled in are listed. weather_main must show its first prompt without
+loading pandas or matplotlib. data_processing must fetch without pandas.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py [runs]
+Exits with status 1 if a module is over its budget or loads a module it
+must not.
+"""
+from pathlib import Path
+import re
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# module -> (budget in ms, modules it must not load)
+BUDGETS = {
+    "weather_main": (50, ("numpy", "pandas", "matplotlib", "requests")),
+    "batch_render": (100, ("pandas", "matplotlib")),
+    "data_processing": (400, ("pandas", "matplotlib")),
+    "visuals": (1500, ("matplotlib.pyplot",)),
+}
+HEAVY = ("numpy", "pandas", "matplotlib", "matplotlib.pyplot", "requests", "tzlocal")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_time(module: str) -> tuple:
+    """
+    Imports module in a new interpreter
+
+    :return: (cumulative import time in ms, set of the modules imported)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match[3]] = int(match[1])
+    return cumulative[module] / 1000, set(cumulative)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'module':<17}{'best ms':>9}{'budget':>8}  heavy modules loaded")
+    failed = False
+    for module, (budget, forbidden) in BUDGETS.items():
+        timings = [import_time(module) for _ in range(runs)]
+        best = min(ms for ms, _ in timings)
+        loaded = timings[0][1]
+        heavy = [name for name in HEAVY if name in loaded]
+        bad = [name for name in forbidden if name in loaded]
+        over = best > budget
+        failed |= over or bool(bad)
+        status = "OVER BUDGET" if over else ""
+        if bad:
+            status += f" must not load {', '.join(bad)}"
+        print(f"{module:<17}{best:>9.1f}{budget:>8}  {', '.join(heavy) or '-'} {status}".rstrip())
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
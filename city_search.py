@@ -0,0 +1,267 @@
+"""
+Typo and accent tolerant city search over the gazetteer.
+
+Two indexes are built once per process over both the `city` and the
+`city_ascii` spellings:
+
+1. a prefix index: every folded name in one sorted array, so all the names
+   starting with a prefix are one contiguous range found by binary search
+   (a flattened trie)
+2. a trigram index: posting lists of name ids per character trigram, used to
+   rank names by trigram similarity with the query
+
+Candidates can be restricted to a (leniently matched) country, and ties keep
+the row order of worldcities.csv, which lists the most populous cities first.
+"""
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import NamedTuple
+import re
+import unicodedata
+
+import numpy as np
+
+from gazetteer import Place, get_gazetteer
+
+# Minimum trigram similarity (Dice coefficient) for a fuzzy match
+MIN_SIMILARITY = 0.4
+
+# Common country names / abbreviations that are not in the CSV
+COUNTRY_ALIASES = {
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "england": "united kingdom",
+    "usa": "united states",
+    "america": "united states",
+    "uae": "united arab emirates",
+    "south korea": "korea south",
+    "north korea": "korea north",
+}
+
+_NON_ALNUM = re.compile(r"[\W_]+")
+
+# Match kinds, best first
+EXACT = "exact"
+PREFIX = "prefix"
+FUZZY = "fuzzy"
+
+
+class CityMatch(NamedTuple):
+    """
+    A search result
+
+    :place: the gazetteer Place
+    :kind: "exact", "prefix" or "fuzzy"
+    :score: trigram similarity of the best matching name (1.0 for exact)
+    """
+    place: Place
+    kind: str
+    score: float
+
+    @property
+    def coords(self) -> tuple:
+        """(lat, lng) of the city"""
+        return self.place.coords
+
+
+def fold(text: str) -> str:
+    """
+    Folds a name for searching: accents removed, lower case,
+    punctuation turned into spaces and runs of spaces collapsed
+    ("Zürich" -> "zurich", "Saint-Denis" -> "saint denis")
+    """
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", text.lower()).strip()
+
+
+def trigrams(folded: str) -> set:
+    """
+    Character trigrams of a folded name, padded so that
+    the start of the word weighs more than its end
+    """
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CitySearchIndex:
+    """
+    Prefix and trigram indexes over the gazetteer's city names
+    """
+    def __init__(self, gazetteer=None):
+        self.gazetteer = gazetteer or get_gazetteer()
+        gaz = self.gazetteer
+
+        # One entry per distinct folded spelling of each row
+        names, rows = [], []
+        for row, (city, city_ascii) in enumerate(zip(gaz.city, gaz.city_ascii)):
+            folded = fold(city_ascii)
+            spellings = (folded,) if city == city_ascii else {folded, fold(city)}
+            for name in spellings:
+                if name:
+                    names.append(name)
+                    rows.append(row)
+        self._names = names
+        self._name_rows = np.asarray(rows, dtype=np.int64)
+
+        # Prefix index: names sorted, then by row so ranges come out in CSV order
+        order = sorted(range(len(names)), key=lambda i: (names[i], rows[i]))
+        self._sorted_names = [names[i] for i in order]
+        self._sorted_rows = self._name_rows[order]
+        self._sorted_lengths = np.asarray([len(n) for n in self._sorted_names], dtype=np.float64)
+
+        # Trigram index: trigram -> ids of the names containing it
+        postings = {}
+        sizes = np.empty(len(names), dtype=np.float64)
+        for name_id, name in enumerate(names):
+            grams = trigrams(name)
+            sizes[name_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(name_id)
+        self._postings = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+        self._trigram_counts = sizes
+
+        # Countries, for filtering and for fuzzy matching of the country name
+        folded_countries = {c: fold(c) for c in set(gaz.country)}
+        self._row_country = np.asarray([folded_countries[c] for c in gaz.country], dtype=object)
+        self._countries = sorted(set(folded_countries.values()))
+        self._country_codes = {
+            fold(code): folded_countries[country]
+            for code, country in zip(gaz.iso2, gaz.country) if code
+        }
+
+    def resolve_country(self, country: str) -> str | None:
+        """
+        Returns the folded name of the known country closest to `country`
+        or None if nothing is similar enough
+        """
+        folded = fold(country)
+        if not folded:
+            return None
+        folded = COUNTRY_ALIASES.get(folded, folded)
+        if folded in self._countries:
+            return folded
+        if folded in self._country_codes:
+            return self._country_codes[folded]
+        query = trigrams(folded)
+        best, best_score = None, MIN_SIMILARITY
+        for name in self._countries:
+            grams = trigrams(name)
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score > best_score:
+                best, best_score = name, score
+        return best
+
+    def _country_mask(self, rows: np.ndarray, country: str | None) -> np.ndarray:
+        if country is None:
+            return np.ones(len(rows), dtype=bool)
+        return self._row_country[rows] == country
+
+    def prefix_rows(self, prefix: str, country: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rows with a folded city name starting with `prefix`
+
+        :param country: folded country name to restrict to (see resolve_country)
+        :return: (rows in CSV order, share of the shortest matching name typed)
+        """
+        folded = fold(prefix)
+        if not folded:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        # every name starting with folded sorts between folded and folded + U+FFFF
+        lo = bisect_left(self._sorted_names, folded)
+        hi = bisect_right(self._sorted_names, folded + "\uffff", lo)
+        rows = self._sorted_rows[lo:hi]
+        lengths = self._sorted_lengths[lo:hi]
+        keep = self._country_mask(rows, country)
+        rows, lengths = rows[keep], lengths[keep]
+
+        # one entry per row, with its shortest matching name
+        order = np.lexsort((lengths, rows))
+        rows, first = np.unique(rows[order], return_index=True)
+        return rows, len(folded) / lengths[order][first]
+
+    def fuzzy_rows(self, query: str, country: str | None = None,
+                   min_similarity: float = MIN_SIMILARITY) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Rows ranked by trigram similarity between `query` and their names
+
+        :return: (rows, similarity), best first; ties in CSV order
+        """
+        grams = trigrams(fold(query))
+        lists = [self._postings[g] for g in grams if g in self._postings]
+        if not lists:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # shared trigrams per name, then Dice similarity
+        shared = np.bincount(np.concatenate(lists), minlength=len(self._names))
+        name_ids = np.flatnonzero(shared)
+        similarity = 2 * shared[name_ids] / (len(grams) + self._trigram_counts[name_ids])
+
+        keep = similarity >= min_similarity
+        rows, similarity = self._name_rows[name_ids[keep]], similarity[keep]
+        keep = self._country_mask(rows, country)
+        rows, similarity = rows[keep], similarity[keep]
+
+        # best first, then CSV order; one entry per row (its best name)
+        order = np.lexsort((rows, -similarity))
+        rows, similarity = rows[order], similarity[order]
+        _, first = np.unique(rows, return_index=True)
+        first.sort()
+        return rows[first], similarity[first]
+
+    def search(self, query: str, country: str | None = None, limit: int = 10,
+               fuzzy: bool = True) -> list[CityMatch]:
+        """
+        Ranked candidates for a (possibly misspelt or partial) city name
+
+        Exact name matches come first, then names starting with the query,
+        then (if fuzzy) names with similar trigrams. A country, itself
+        matched leniently, restricts the candidates to that country.
+        Ties keep the CSV (population) order.
+        """
+        folded = fold(query)
+        if not folded or limit < 1:
+            return []
+        country_key = self.resolve_country(country) if country else None
+
+        rows, shares = self.prefix_rows(folded, country_key)
+        exact = shares == 1.0
+        ranked = [(EXACT, rows[exact], shares[exact]), (PREFIX, rows[~exact], shares[~exact])]
+        if fuzzy:
+            ranked.append((FUZZY, *self.fuzzy_rows(folded, country_key)))
+
+        matches, seen = [], set()
+        for kind, rows, scores in ranked:
+            for row, score in zip(rows.tolist(), scores.tolist()):
+                if row in seen:
+                    continue
+                seen.add(row)
+                matches.append(CityMatch(self.gazetteer.place(row), kind, score))
+                if len(matches) == limit:
+                    return matches
+        return matches
+
+
+@lru_cache(maxsize=None)
+def get_city_search_index() -> CitySearchIndex:
+    """
+    Returns the process wide CitySearchIndex, building it on first use
+    """
+    return CitySearchIndex()
+
+
+def search_cities(query: str, country: str | None = None, limit: int = 10) -> list[CityMatch]:
+    """
+    Exact, prefix and fuzzy matches for a city name, best first
+    """
+    return get_city_search_index().search(query, country, limit)
+
+
+def suggest_cities(prefix: str, country: str | None = None, limit: int = 10) -> list[CityMatch]:
+    """
+    Completions for a partly typed city name (cheap enough for every keystroke)
+    """
+    return get_city_search_index().search(prefix, country, limit, fuzzy=False)
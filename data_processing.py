@@ -1,16 +1,97 @@
 
 
 
-import pandas as pd
+import numpy as np
 import requests
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
+from functools import lru_cache, partial
+from urllib.parse import urlencode
+import time
 
+from http_cache import cache_key, get_cache, json_loads
+from http_session import get_session, get_timeout
+from rate_limit import backoff_seconds, get_limiter, retry_after_seconds
+from single_flight import get_flights
+from units import to_imperial
 
-pd.set_option("display.max_columns", None)
-pd.set_option("display.width", None)
-pd.set_option("display.max_colwidth", None)
 
+"""
+pandas is only needed to build tables, so it is imported on first use:
+fetching data does not pay for it. The display options are set then.
+"""
+@lru_cache(maxsize=None)
+def pandas():
+
+    import pandas as pd
+
+    pd.set_option("display.max_columns", None)
+    pd.set_option("display.width", None)
+    pd.set_option("display.max_colwidth", None)
+    return pd
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+HOURLY_VARIABLES = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "precipitation",
+    "wind_speed_10m",
+    "cloud_cover",
+    "surface_pressure",
+    "wind_direction_10m"
+]
+
+DAILY_VARIABLES = [
+    "temperature_2m_max",
+    "temperature_2m_min",
+    "wind_direction_10m_dominant",
+    "wind_speed_10m_max",
+    "sunshine_duration",
+    "precipitation_sum",
+    "apparent_temperature_mean"
+]
+
+# Time formats Open-Meteo can return: ISO 8601 local time strings (default)
+# or Unix epoch seconds (int, UTC) that skip string parsing entirely
+ISO8601 = "iso8601"
+UNIXTIME = "unixtime"
+
+# Column order of the tables built by data_in_table / daily_data_table
+HOURLY_TABLE_COLUMNS = [
+    "temperature_2m",
+    "relative_humidity_2m",
+    "precipitation",
+    "cloud_cover",
+    "surface_pressure",
+    "wind_speed_10m",
+    "wind_direction_10m"
+]
+
+DAILY_TABLE_COLUMNS = [
+    "temperature_2m_min",
+    "temperature_2m_max",
+    "apparent_temperature_mean",
+    "precipitation_sum",
+    "sunshine_duration",
+    "wind_speed_10m_max",
+    "wind_direction_10m_dominant"
+]
+
+# Limits for multi-location requests
+MAX_URL_LENGTH = 4000
+MAX_LOCATIONS_PER_REQUEST = 100
+
+# Long archive ranges are fetched as chunks of at most this many days
+# (about 8.8k hourly or 366 daily rows per request), concurrently
+MAX_DAILY_CHUNK_DAYS = 366
+MAX_HOURLY_CHUNK_DAYS = 92
+CHUNK_WORKERS = 4
+CHUNK_RETRIES = 2  # on top of the session's own retries
+CHUNK_RETRY_DELAY = 1.0  # seconds, doubled on every retry
+RATE_LIMIT_RETRIES = 5  # requests answered with 429 sent again after the limiter's pause
 
 
 # url = "https://api.open-meteo.com/v1/forecast"
@@ -45,16 +126,76 @@ def main():
     print(data_in_table(raw_data))
 
 
+"""
+'fetch_json' sends a GET request through the shared session (see http_session.py)
+and returns the decoded JSON. Transient errors are retried with backoff,
+and an error response that persists raises requests.HTTPError.
+Successful responses are cached (see http_cache.py), so the same request
+for the same coordinates and dates does not go to the network again
+until the cached entry expires.
+Concurrent callers of the same request (same canonical URL and params)
+share one download, each getting its own copy of the JSON (see single_flight.py).
+"""
+def fetch_json(url, params):
+
+    cache = get_cache()
+    if cache is not None:
+        data = cache.get(url, params)
+        if data is not None:
+            return data
+
+    flights = get_flights()
+    if flights is None:
+        return download_json(url, params, cache)
+    return flights.do(cache_key(url, params), download_json, url, params, cache)
+
+
+"""
+'download_json' is the network part of 'fetch_json': one GET, decoded and cached.
+Every request first takes a token of the rate limiter (see rate_limit.py).
+A 429 response slows the limiter down and pauses it for the Retry-After
+delay, then the request is sent again, up to RATE_LIMIT_RETRIES times.
+Without a limiter (WEATHER_RATE_LIMITS=off) the request waits for the
+Retry-After delay, or a doubling backoff, before it is sent again.
+"""
+def download_json(url, params, cache=None):
+
+    limiter = get_limiter()
+    for attempt in range(1, RATE_LIMIT_RETRIES + 2):
+        if limiter is not None:
+            limiter.acquire()
+        response = get_session().get(url, params=params, timeout=get_timeout())
+        if response.status_code != 429:
+            break
+        retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+        if limiter is not None:
+            limiter.throttled(retry_after)
+        elif attempt <= RATE_LIMIT_RETRIES:
+            time.sleep(backoff_seconds(attempt) if retry_after is None else retry_after)
+    response.raise_for_status()
+    if limiter is not None:
+        limiter.success()
+
+    # convert response to JSON (with orjson when it is installed)
+    data = json_loads(response.content)
+
+    if cache is not None:
+        cache.put(url, params, response.content, data)
+
+    return data
+
 """
 'fetch_hourly_rawdata' takes latitude and longitude of the place
 you need to find the weather data on, and fetches the hourly weather data 
 for that place in JSON format
 It provides hourly data for a total of 8 days which includes the hourly weather 
 for the next(future) 3 days.
+With timeformat=UNIXTIME the 'time' values are Unix epoch seconds (UTC)
+instead of local ISO 8601 strings.
 """
-def fetch_hourly_metric_data(lat, lng):
+def fetch_hourly_metric_data(lat, lng, timeformat = ISO8601):
 
-    url = "https://api.open-meteo.com/v1/forecast"
+    url = FORECAST_URL
 
     today = date.today()
 
@@ -64,68 +205,52 @@ def fetch_hourly_metric_data(lat, lng):
     params = {
         "latitude": lat,
         "longitude": lng,
-        "hourly": [
-            "temperature_2m",
-            "relative_humidity_2m",
-            "precipitation",
-            "wind_speed_10m",
-            "cloud_cover",
-            "surface_pressure",
-            "wind_direction_10m"
-        ],
+        "hourly": HOURLY_VARIABLES,
         "start_date": past_date.isoformat(),
         "end_date": future_date.isoformat(),
-        "timezone": "auto"
+        "timezone": "auto",
+        "timeformat": timeformat
     }
 
-    response = requests.get(url, params=params)
-
-    # convert response to JSON
-    data = response.json()
+    data = fetch_json(url, params)
 
     return data
 
 """
 Fetches hourly weather data in imperial units (Fahrenheit, mph, inches).
 Default range: past 4 days + next 3 days.
-Returns raw JSON from Open-Meteo API.
+The data is fetched in metric units (shared with 'fetch_hourly_metric_data',
+so switching units needs no second request) and converted locally.
+Returns the Open-Meteo JSON with converted values and units.
 """
-def hourly_imperial_data(lat, lng):
-
-    url = "https://api.open-meteo.com/v1/forecast"
+def hourly_imperial_data(lat, lng, timeformat = ISO8601):
 
-    today = date.today()
+    return to_imperial(fetch_hourly_metric_data(lat, lng, timeformat))
 
-    past_date = today - timedelta(days=4)
-    future_date = today + timedelta(days=3)
 
-    params = {
-        "latitude": lat,
-        "longitude": lng,
-        "hourly": [
-            "temperature_2m",
-            "relative_humidity_2m",
-            "precipitation",
-            "wind_speed_10m",
-            "cloud_cover",
-            "surface_pressure",
-            "wind_direction_10m"
-        ],
-        "start_date": past_date.isoformat(),
-        "end_date": future_date.isoformat(),
-        "timezone": "auto",
-        "temperature_unit": "fahrenheit",
-        "wind_speed_unit": "mph",
-        "precipitation_unit": "inch",
-
-    }
+"""
+'columns_to_table' builds a DataFrame in one go from the JSON arrays of one block
+('hourly' or 'daily') of an Open-Meteo response:
+- the measurements are written into one preallocated float64 array, which the
+  DataFrame wraps without copying (null values become NaN)
+- 'time' is parsed once into datetime64 (wall clock time of the location),
+  or kept as int64 epoch seconds for responses fetched with timeformat=UNIXTIME
+"""
+def columns_to_table(block, columns):
 
-    response = requests.get(url, params=params)
+    values = np.empty((len(columns), len(block["time"])), dtype=np.float64)
+    for row, name in enumerate(columns):
+        values[row] = np.asarray(block[name], dtype=np.float64)
 
-    # convert response to JSON
-    data = response.json()
+    times = np.asarray(block["time"])
+    if times.dtype.kind in "iu":
+        times = times.astype(np.int64)
+    else:
+        times = times.astype("datetime64[s]")
 
-    return data
+    df = pandas().DataFrame(values.T, columns=columns, copy=False)
+    df.insert(0, "time", times)
+    return df
 
 
 """
@@ -136,23 +261,7 @@ and returns a 2-D table.
 """
 def data_in_table(raw_data):
 
-    df_raw = pd.DataFrame()
-       
-    df_raw['time'] = raw_data['hourly']['time']
-    df_raw['temperature_2m'] = raw_data['hourly']['temperature_2m']
-    df_raw['relative_humidity_2m'] = raw_data['hourly']['relative_humidity_2m']
-    df_raw['precipitation'] = raw_data['hourly']['precipitation']
-
-    df_raw['cloud_cover'] = raw_data['hourly']['cloud_cover']
-
-    df_raw['surface_pressure'] = raw_data['hourly']['surface_pressure']
-
-    df_raw['wind_speed_10m'] = raw_data['hourly']['wind_speed_10m']
-        
-    df_raw['wind_direction_10m'] = raw_data['hourly']['wind_direction_10m']
-
-    #print(df_raw)
-    return df_raw
+    return columns_to_table(raw_data['hourly'], HOURLY_TABLE_COLUMNS)
 
 
 """
@@ -172,30 +281,29 @@ in case you want to specify the timeframe, and fetches the daily weather data
 for that place in JSON format
 The default duration is past 30 days.
 The default data units use metric system.
+With timeformat=UNIXTIME the 'time' values are Unix epoch seconds.
+Ranges longer than MAX_DAILY_CHUNK_DAYS are fetched with 'fetch_archive_chunks'.
 """
-def fetch_daily_data(lat, lng, from_date = date.today()-timedelta(days=30), to_date = date.today()-timedelta(days=1)):
+def fetch_daily_data(lat, lng, from_date = None, to_date = None, timeformat = ISO8601):
+
+    url = ARCHIVE_URL
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
+    from_date = from_date or date.today()-timedelta(days=30)
+    to_date = to_date or date.today()-timedelta(days=1)
+
+    # several years are fetched in concurrent chunks
+    if (to_date - from_date).days >= MAX_DAILY_CHUNK_DAYS:
+        return fetch_archive_chunks(lat, lng, from_date, to_date, "daily", timeformat)
     
     params = {
     "latitude": lat,
 	"longitude": lng,
     "start_date": from_date.isoformat(),
 	"end_date": to_date.isoformat(),
-	"daily": ["temperature_2m_max", 
-           "temperature_2m_min", 
-           "wind_direction_10m_dominant", 
-           "wind_speed_10m_max", 
-           "sunshine_duration", 
-           "precipitation_sum", 
-           "apparent_temperature_mean"],
+	"daily": DAILY_VARIABLES,
+    "timeformat": timeformat,
     }
-    response = requests.get(url, params=params)
-    #response.raise_for_status()
-
-
-    # convert response to JSON
-    daily_data = response.json()
+    daily_data = fetch_json(url, params)
 
     return daily_data
 
@@ -209,18 +317,7 @@ and returns a 2-D table.
 """
 def daily_data_table(daily_data):
 
-    df_daily = pd.DataFrame()
-
-    df_daily['time'] = daily_data['daily']['time']
-    df_daily['temperature_2m_min'] = daily_data['daily']['temperature_2m_min']
-    df_daily['temperature_2m_max'] = daily_data['daily']['temperature_2m_max']
-    df_daily['apparent_temperature_mean'] = daily_data['daily']['apparent_temperature_mean']
-    df_daily['precipitation_sum'] = daily_data['daily']['precipitation_sum']
-    df_daily['sunshine_duration'] = daily_data['daily']['sunshine_duration']
-    df_daily['wind_speed_10m_max'] = daily_data['daily']['wind_speed_10m_max']
-    df_daily['wind_direction_10m_dominant'] = daily_data['daily']['wind_direction_10m_dominant']
-
-    return df_daily
+    return columns_to_table(daily_data['daily'], DAILY_TABLE_COLUMNS)
 
 
 """
@@ -239,36 +336,257 @@ for that place in JSON format
 The default duration is past 30 days.
 The default data units use imperial system.
 """
-def raw_daily_data_imperial(lat, lng, from_date = date.today()-timedelta(days=30), to_date = date.today()-timedelta(days=1)):
+def raw_daily_data_imperial(lat, lng, from_date = None, to_date = None, timeformat = ISO8601):
+
+    # fetched in metric units (shared with 'fetch_daily_data') and converted locally
+    return to_imperial(fetch_daily_data(lat, lng, from_date, to_date, timeformat))
+
+
+"""
+'fetch_hourly_archive_data' fetches the hourly weather data of a past date range
+(both dates included) from the archive API, in metric units.
+Long ranges are split into chunks of MAX_HOURLY_CHUNK_DAYS days that are
+fetched concurrently and stitched back together (see 'fetch_archive_chunks').
+"""
+def fetch_hourly_archive_data(lat, lng, from_date, to_date, timeformat = ISO8601):
+
+    return fetch_archive_chunks(lat, lng, from_date, to_date, "hourly", timeformat)
+
+
+"""
+'plan_date_chunks' splits the date range from_date..to_date (both included)
+into consecutive (start, end) chunks of at most chunk_days days.
+Chunk boundaries are aligned to multiples of chunk_days since 0001-01-01,
+so overlapping ranges share their inner chunks (and their cache entries).
+"""
+def plan_date_chunks(from_date, to_date, chunk_days):
+
+    chunks = []
+    start = from_date.toordinal()
+    last = to_date.toordinal()
+    while start <= last:
+        end = min(last, (start // chunk_days + 1) * chunk_days - 1)
+        chunks.append((date.fromordinal(start), date.fromordinal(end)))
+        start = end + 1
+    return chunks
+
+
+"""
+'fetch_chunk' fetches one chunk, retrying it up to CHUNK_RETRIES times
+(after the session's own retries) so that one failed chunk does not
+restart the whole download. Client errors (4xx other than 429) are not retried.
+"""
+def fetch_chunk(url, params):
+
+    for attempt in range(CHUNK_RETRIES + 1):
+        try:
+            return fetch_json(url, params)
+        except (requests.RequestException, ValueError) as error:
+            response = getattr(error, "response", None)
+            status = response.status_code if response is not None else None
+            if attempt == CHUNK_RETRIES or (status is not None and 400 <= status < 500 and status != 429):
+                raise
+            time.sleep(CHUNK_RETRY_DELAY * 2 ** attempt)
+
+
+"""
+'stitch_blocks' joins the 'hourly' or 'daily' blocks of chunk responses
+into one response: rows ordered by time, and a time returned by two chunks
+kept once (the later chunk wins). The other fields come from the first chunk.
+"""
+def stitch_blocks(responses, block):
+
+    stitched = dict(responses[0])
+    times = np.concatenate([np.asarray(response[block]["time"]) for response in responses])
+    # last occurrence of every time, in time order
+    _, reversed_pos = np.unique(times[::-1], return_index=True)
+    keep = len(times) - 1 - reversed_pos
+
+    columns = {"time": times[keep].tolist()}
+    for name in responses[0][block]:
+        if name != "time":
+            values = np.concatenate(
+                [np.asarray(response[block][name], dtype=np.float64) for response in responses]
+            )
+            columns[name] = values[keep]
+    stitched[block] = columns
+    return stitched
+
+
+"""
+'fetch_archive_chunks' fetches a long archive range ("hourly" or "daily" block)
+as aligned chunks (see 'plan_date_chunks'), CHUNK_WORKERS at a time,
+and returns one response with the chunks stitched together.
+"""
+def fetch_archive_chunks(lat, lng, from_date, to_date, block, timeformat = ISO8601,
+                         chunk_days = None, max_workers = None):
+
+    if block == "hourly":
+        chunk_days = chunk_days or MAX_HOURLY_CHUNK_DAYS
+        variables = HOURLY_VARIABLES
+    else:
+        chunk_days = chunk_days or MAX_DAILY_CHUNK_DAYS
+        variables = DAILY_VARIABLES
+    chunks = plan_date_chunks(from_date, to_date, chunk_days)
+    if not chunks:
+        raise ValueError("from_date must not be after to_date.")
+
+    params = [
+        {
+            "latitude": lat,
+            "longitude": lng,
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            block: variables,
+            "timeformat": timeformat,
+        }
+        for start, end in chunks
+    ]
+    if len(params) == 1:
+        return fetch_chunk(ARCHIVE_URL, params[0])
+
+    workers = min(max_workers or CHUNK_WORKERS, len(params))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chunk") as pool:
+        responses = list(pool.map(partial(fetch_chunk, ARCHIVE_URL), params))
+    return stitch_blocks(responses, block)
+
+
+"""
+'plan_coord_chunks' splits a list of (lat, lng) into chunks for multi-location
+requests: Open-Meteo accepts comma separated latitude/longitude lists, and each
+chunk is kept under MAX_URL_LENGTH characters (for the given url and the other
+params) and MAX_LOCATIONS_PER_REQUEST locations.
+Returns lists of positions into coords.
+"""
+def plan_coord_chunks(coords, url, params, max_url_length=None, max_locations=None):
+
+    max_url_length = max_url_length or MAX_URL_LENGTH
+    max_locations = max_locations or MAX_LOCATIONS_PER_REQUEST
+
+    # length of the url without any coordinate, then each coordinate adds
+    # its two numbers plus two url encoded commas (%2C)
+    base_length = len(url) + 1 + len(urlencode(params, doseq=True)) + len("&latitude=&longitude=")
+
+    chunks = []
+    chunk = []
+    length = base_length
+    for pos, (lat, lng) in enumerate(coords):
+        extra = len(str(lat)) + len(str(lng)) + 2 * len("%2C")
+        if chunk and (length + extra > max_url_length or len(chunk) == max_locations):
+            chunks.append(chunk)
+            chunk = []
+            length = base_length
+        chunk.append(pos)
+        length += extra
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+"""
+'fetch_batch' fetches the same request for many locations, with as few
+multi-location requests as the url length allows.
+Returns one JSON result per location, in the order of coords.
+"""
+def fetch_batch(url, params, coords):
+
+    coords = [(lat, lng) for lat, lng in coords]
+    results = [None] * len(coords)
+    for chunk in plan_coord_chunks(coords, url, params):
+        chunk_params = dict(params)
+        chunk_params["latitude"] = ",".join(str(coords[pos][0]) for pos in chunk)
+        chunk_params["longitude"] = ",".join(str(coords[pos][1]) for pos in chunk)
+
+        data = fetch_json(url, chunk_params)
+        # a single location comes back as an object, several as a list
+        if isinstance(data, dict):
+            data = [data]
+        for pos, location_data in zip(chunk, data):
+            results[pos] = location_data
+    return results
+
+
+"""
+Batch version of 'fetch_hourly_metric_data': takes a list of (lat, lng)
+and returns a list with the hourly JSON of each location.
+"""
+def fetch_hourly_metric_data_batch(coords, timeformat = ISO8601):
+
+    today = date.today()
+
+    past_date = today - timedelta(days=4)
+    future_date = today + timedelta(days=3)
 
-    url = "https://archive-api.open-meteo.com/v1/archive"
- 
     params = {
-    "latitude": lat,
-	"longitude": lng,
-    "start_date": from_date.isoformat(),
-	"end_date": to_date.isoformat(),
-	"daily": ["temperature_2m_max", 
-           "temperature_2m_min", 
-           "wind_direction_10m_dominant", 
-           "wind_speed_10m_max", 
-           "sunshine_duration", 
-           "precipitation_sum", 
-           "apparent_temperature_mean"],
-    "temperature_unit": "fahrenheit",
-	"wind_speed_unit": "mph",
-	"precipitation_unit": "inch",
+        "hourly": HOURLY_VARIABLES,
+        "start_date": past_date.isoformat(),
+        "end_date": future_date.isoformat(),
+        "timezone": "auto",
+        "timeformat": timeformat
+    }
+
+    return fetch_batch(FORECAST_URL, params, coords)
 
+
+"""
+Batch version of 'fetch_daily_data': takes a list of (lat, lng)
+(and optionally the start and end date) and returns a list with
+the daily JSON of each location.
+"""
+def fetch_daily_data_batch(coords, from_date = None, to_date = None, timeformat = ISO8601):
+
+    from_date = from_date or date.today()-timedelta(days=30)
+    to_date = to_date or date.today()-timedelta(days=1)
+
+    params = {
+        "start_date": from_date.isoformat(),
+        "end_date": to_date.isoformat(),
+        "daily": DAILY_VARIABLES,
+        "timeformat": timeformat,
     }
-    response = requests.get(url, params=params)
-    response.raise_for_status()
 
+    return fetch_batch(ARCHIVE_URL, params, coords)
 
-    # convert response to JSON
-    daily_data = response.json()
 
-    return daily_data
+"""
+Stacks the tables of many locations into one DataFrame with a 'location'
+column first. 'locations' labels each result (default: its position in
+the list), 'table' is the single location parser and 'columns' its
+measurement columns, for the empty table of an empty list.
+"""
+def stack_tables(raw_list, table, columns, locations=None):
+
+    if locations is None:
+        locations = range(len(raw_list))
+
+    frames = []
+    for location, raw_data in zip(locations, raw_list):
+        df = table(raw_data)
+        df.insert(0, "location", [location] * len(df))
+        frames.append(df)
+    if not frames:
+        df = columns_to_table({"time": [], **{name: [] for name in columns}}, columns)
+        df.insert(0, "location", [])
+        return df
+    return pandas().concat(frames, ignore_index=True)
+
+
+"""
+Batch version of 'data_in_table' for the list returned by
+'fetch_hourly_metric_data_batch'.
+"""
+def data_in_table_batch(raw_list, locations=None):
+
+    return stack_tables(raw_list, data_in_table, HOURLY_TABLE_COLUMNS, locations)
+
+
+"""
+Batch version of 'daily_data_table' for the list returned by
+'fetch_daily_data_batch'.
+"""
+def daily_data_table_batch(daily_list, locations=None):
 
+    return stack_tables(daily_list, daily_data_table, DAILY_TABLE_COLUMNS, locations)
 
 
 
@@ -0,0 +1,94 @@
+"""
+Downsampling of long time series before they are drawn.
+
+A chart panel is a few hundred pixels wide. Drawing thousands of points per
+line (hourly data over months, several cities on one chart) costs rendering
+time and SVG size, but adds nothing visible. downsample() cuts the time range
+into buckets of equal duration, about one per pixel, and keeps two rows per
+bucket: its first and last time. Each column takes its minimum and its
+maximum in the bucket, in the order they occurred. Every peak (a
+precipitation spike, the daily maximum temperature) is drawn at its value.
+The line looks the same as with every point, at a fixed number of points.
+
+Everything is vectorized with NumPy (ufunc.reduceat over the buckets of the
+sorted table). Missing values are skipped, and a bucket without any value
+stays a gap.
+"""
+import numpy as np
+import pandas as pd
+
+# Tables with more rows than this are downsampled (None: never)
+DOWNSAMPLE_THRESHOLD = 1000
+# Buckets across the time range, about the width of a panel in pixels
+DOWNSAMPLE_BUCKETS = 500
+
+
+def time_values(times) -> np.ndarray:
+    """Times (datetimes or numbers) as float64, for bucketing"""
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.datetime64):
+        return times.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return times.astype(np.float64)
+
+
+def bucket_starts(x: np.ndarray, buckets: int) -> np.ndarray:
+    """
+    First row of every non-empty bucket of equal width over sorted x
+    """
+    span = x[-1] - x[0]
+    if span <= 0:
+        return np.zeros(1, dtype=np.int64)
+    index = np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+    return np.flatnonzero(np.r_[True, index[1:] != index[:-1]])
+
+
+def minmax_rows(values: np.ndarray, starts: np.ndarray) -> tuple:
+    """
+    Per bucket (rows starts[i]:starts[i+1]) and column of a 2-D block,
+    the minimum and maximum in the order they occurred
+
+    :return: (first, second) arrays of shape (buckets, columns)
+    """
+    n = len(values)
+    rows = np.arange(n)[:, None]
+    with np.errstate(invalid="ignore"):
+        low = np.fmin.reduceat(values, starts, axis=0)
+        high = np.fmax.reduceat(values, starts, axis=0)
+    # Broadcast each bucket's extremes to its rows to find where they are
+    sizes = np.diff(np.r_[starts, n])
+    at_low = np.where(values == np.repeat(low, sizes, axis=0), rows, n)
+    at_high = np.where(values == np.repeat(high, sizes, axis=0), rows, n)
+    low_first = np.minimum.reduceat(at_low, starts, axis=0) <= np.minimum.reduceat(at_high, starts, axis=0)
+    return np.where(low_first, low, high), np.where(low_first, high, low)
+
+
+def downsample(df: pd.DataFrame, time_column: str = "time", threshold: int | None = None,
+               buckets: int | None = None) -> pd.DataFrame:
+    """
+    Min/max per time bucket of a table sorted by time, if it has more rows
+    than the threshold (otherwise the table itself is returned)
+
+    :param df: table with a time column and numeric columns
+    :param threshold: row count above which to downsample (default
+                      DOWNSAMPLE_THRESHOLD; set that to None to never downsample)
+    :param buckets: number of time buckets (default DOWNSAMPLE_BUCKETS)
+    :return: table of two rows per non-empty bucket, with the same columns
+    """
+    threshold = DOWNSAMPLE_THRESHOLD if threshold is None else threshold
+    buckets = DOWNSAMPLE_BUCKETS if buckets is None else buckets
+    if threshold is None or len(df) <= threshold or len(df) <= 2 * buckets:
+        return df
+
+    times = df[time_column].to_numpy()
+    starts = bucket_starts(time_values(times), buckets)
+    stops = np.r_[starts[1:], len(df)] - 1
+
+    columns = [name for name in df.columns
+               if name != time_column and pd.api.types.is_numeric_dtype(df[name])]
+    first, second = minmax_rows(df[columns].to_numpy(dtype=np.float64), starts)
+
+    # Rows: bucket start, bucket end, for every bucket
+    out = {time_column: np.stack([times[starts], times[stops]], axis=1).reshape(-1)}
+    for i, name in enumerate(columns):
+        out[name] = np.stack([first[:, i], second[:, i]], axis=1).reshape(-1)
+    return pd.DataFrame(out, columns=[name for name in df.columns if name in out])
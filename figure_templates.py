@@ -0,0 +1,333 @@
+"""
+Prebuilt figures for the hourly and daily chart layouts.
+
+Building a chart (subplots, twin axes, the polar axes over panel 4, titles,
+legends and the layout) costs far more than drawing its data. A template
+builds its figure once. Every render only swaps the data of the existing
+lines, bars and fills, updates the texts and rescales the axes. The layout
+is computed again only when the labels change, for example when switching
+between Metric and Imperial.
+
+Headless renders reuse one template per layout and process (get_template).
+Interactive charts need a fresh pyplot figure per window, so they build a
+new template each time but share the same drawing code.
+"""
+from functools import lru_cache
+
+import matplotlib.dates as mdates
+import matplotlib.ticker as ticker
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.patches import Patch
+
+from wind_rose import SECTORS, SPEED_CLASSES, wind_rose
+
+# Font sizes
+FT_FS = 14 # Figure title font size
+SP_FS = 12 # Sub plot title font size
+LGND_FS = 9 # Legend font size
+
+FIGSIZE = (12, 8)
+
+ROSE_COLORS = ["blue", "pink", "purple", "red", "green", "orange"]
+ROSE_TICKS = np.deg2rad([0, 45, 90, 135, 180, 225, 270, 315])
+ROSE_LABELS = ["N", "NE", "E", "SE", "S", "SW", "W", "NW"]
+STATS_BOX = dict(boxstyle="round", facecolor="white", alpha=0.5)
+
+
+def date_numbers(times) -> np.ndarray:
+    """Datetimes (a Series or array) -> matplotlib date numbers"""
+    return mdates.date2num(np.asarray(times, dtype="datetime64[s]"))
+
+
+def rescale(ax, bottom=None) -> None:
+    """Fits the view of an axes to its current data"""
+    ax.relim()
+    ax.autoscale_view()
+    if bottom is not None:
+        ax.set_ylim(bottom=bottom)
+
+
+def auto_dates(ax) -> None:
+    """Date ticks chosen for the current view"""
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+
+
+class ChartTemplate:
+    """
+    Base of the layouts: a 2x2 figure whose 4th panel holds a wind rose
+    (polar axes drawn over the hidden cartesian panel, which keeps the
+    wind speed stats box)
+
+    :param figure: Figure to build in; by default a Figure not managed by
+                   pyplot, for headless rendering
+    """
+    def __init__(self, figure=None):
+        self.fig = figure if figure is not None else Figure(figsize=FIGSIZE)
+        (self.ax1, self.ax2), (self.ax3, self.ax4) = self.fig.subplots(2, 2)
+        self._layout_key = None
+
+        # Panel 4: stats box on the hidden panel, rose on polar axes over it
+        self.ax4.set_xticks([])
+        self.ax4.set_yticks([])
+        self.stats_box = self.ax4.text(0.05, 0.85, "", transform=self.ax4.transAxes, fontsize=10,
+                                       verticalalignment="top", bbox=STATS_BOX)
+        self.rose = self.fig.add_subplot(2, 2, 4, projection="polar")
+        self.rose.set_theta_zero_location("N")
+        self.rose.set_theta_direction(-1) # Clockwise
+        self.rose.set_xticks(ROSE_TICKS)
+        self.rose.set_xticklabels(ROSE_LABELS)
+        self.rose.set_title("Wind speed & direction", fontsize=SP_FS)
+        self.rose.grid(True)
+        self.rose.yaxis.set_major_locator(ticker.MaxNLocator(4))
+        self.rose.yaxis.set_major_formatter(ticker.PercentFormatter(decimals=0))
+        # One bar per direction sector and speed class, stacked by class
+        sectors = np.arange(SECTORS) * (2 * np.pi / SECTORS)
+        self._rose_bars = [
+            self.rose.bar(sectors, np.zeros(SECTORS), width=2 * np.pi / SECTORS, color=color,
+                          alpha=0.7, edgecolor="white", linewidth=0.5)
+            for color in ROSE_COLORS[:SPEED_CLASSES]
+        ]
+        self._rose_legend = self.rose.legend(
+            handles=[bars.patches[0] for bars in self._rose_bars], labels=[""] * SPEED_CLASSES,
+            loc="center left", bbox_to_anchor=(1.1, 0.5), fontsize=LGND_FS, frameon=False)
+        self.suptitle = self.fig.suptitle("", fontsize=FT_FS, fontweight="bold")
+
+    def draw_rose(self, directions, speeds, unit: str = "") -> None:
+        """
+        Sets the stacked bars of the wind rose to the frequencies of the
+        samples by sector and speed class (directions in degrees)
+        """
+        rose = wind_rose(directions, speeds)
+        tops = np.cumsum(rose.frequencies, axis=1)
+        bottoms = tops - rose.frequencies
+        for bars, heights, starts in zip(self._rose_bars, rose.frequencies.T, bottoms.T):
+            for patch, height, start in zip(bars.patches, heights, starts):
+                patch.set_y(start)
+                patch.set_height(height)
+                patch.set_visible(height > 0)
+        # Limits from the totals, instead of relim over every patch
+        self.rose.set_ylim(0, max(tops[:, -1].max(), 1.0) * 1.05)
+
+        for text, low, high in zip(self._rose_legend.get_texts(), rose.edges[:-1], rose.edges[1:]):
+            text.set_text(f"{low:g}-{high:g} {unit}".rstrip())
+
+    def relayout(self, key) -> None:
+        """Recomputes the layout if the labels (key) changed since the last render"""
+        if key != self._layout_key:
+            self.fig.tight_layout()
+            self._layout_key = key
+
+
+class HourlyTemplate(ChartTemplate):
+    """
+    Hourly layout:
+    1. Panel 1: Temperature and humidity
+    2. Panel 2: Precipitation and Cloud cover
+    3. Panel 3: Surface pressure
+    4. Panel 4. Wind speed and Wind direction
+    """
+    def __init__(self, figure=None):
+        super().__init__(figure)
+        ax1, ax2, ax3 = self.ax1, self.ax2, self.ax3
+
+        # Panel 1: Temperature and humidity (on a twin axes sharing x)
+        self.temperature, = ax1.plot([], [], color="blue")
+        self.ax1b = ax1.twinx()
+        self.humidity, = self.ax1b.plot([], [], color="red")
+        ax1.set_xlabel("Time")
+        ax1.set_title("Temperature & humidity", fontsize=SP_FS)
+
+        # Panel 2: Precipitation and Cloud cover, as steps
+        self.precipitation, = ax2.plot([], [], color="red", drawstyle="steps-post", linewidth=2.0)
+        self.ax2b = ax2.twinx()
+        self.cloud_cover, = self.ax2b.plot([], [], color="green", drawstyle="steps-post")
+        ax2.set_xlabel("Time")
+        ax2.set_title("Precipitation & cloud cover", fontsize=SP_FS)
+
+        # Panel 3: Surface pressure
+        self.pressure, = ax3.plot([], [], color="purple")
+        ax3.set_xlabel("Time")
+
+        self.legends = []
+
+    def render(self, data, labels: dict, units: dict, title: str, stats_text: str,
+               marker=None, hour_labels=None, wind=None) -> Figure:
+        """
+        Draws hourly data into the template
+
+        :param data: DataFrame with naive local datetimes in 'time'
+        :param labels: variable name -> display name
+        :param units: variable name -> unit
+        :param title: figure title
+        :param stats_text: text of the wind speed stats box
+        :param marker: marker of the surface pressure line (None for no marker)
+        :param hour_labels: fixed x tick labels spread over the range (5 hour view)
+        :param wind: table of every sample for the wind rose, when data is
+                     downsampled (default: data)
+        :return: the Figure
+        """
+        x = date_numbers(data["time"])
+        ax1, ax2, ax3 = self.ax1, self.ax2, self.ax3
+
+        self.temperature.set_data(x, data["temperature_2m"])
+        self.humidity.set_data(x, data["relative_humidity_2m"])
+        self.precipitation.set_data(x, data["precipitation"])
+        self.cloud_cover.set_data(x, data["cloud_cover"])
+        self.pressure.set_data(x, data["surface_pressure"])
+        self.pressure.set_marker(marker or "None")
+
+        axis_labels = (
+            labels["temperature_2m"] + f" ({units['temperature_2m']})",
+            labels["relative_humidity_2m"] + f" ({units['relative_humidity_2m']})",
+            labels["precipitation"] + f" ({units['precipitation']})",
+            labels["cloud_cover"] + f" ({units['cloud_cover']})",
+            labels["surface_pressure"] + f" ({units['surface_pressure']})",
+        )
+        for ax, axis_label in zip((ax1, self.ax1b, ax2, self.ax2b, ax3), axis_labels):
+            ax.set_ylabel(axis_label)
+        ax3.set_title(labels["surface_pressure"], fontsize=SP_FS)
+
+        # Legends once the names are known (they do not depend on the units)
+        names = tuple(labels[name] for name in ("temperature_2m", "relative_humidity_2m",
+                                                 "precipitation", "cloud_cover", "surface_pressure"))
+        if not self.legends or tuple(line.get_label() for line in self._lines()) != names:
+            for legend in self.legends:
+                legend.remove()
+            for line, name in zip(self._lines(), names):
+                line.set_label(name)
+            self.legends = [
+                ax1.legend(handles=[self.temperature], loc="upper left", frameon=True, fontsize=LGND_FS),
+                self.ax1b.legend(handles=[self.humidity], loc="upper right", frameon=True, fontsize=LGND_FS),
+                ax2.legend(handles=[self.precipitation], loc="upper left", fontsize=LGND_FS),
+                self.ax2b.legend(handles=[self.cloud_cover], loc="upper right", fontsize=LGND_FS),
+                ax3.legend(handles=[self.pressure], loc="upper left", fontsize=LGND_FS),
+            ]
+
+        for ax in (ax1, self.ax1b, ax3):
+            rescale(ax)
+        # Set bottom val as 0 for both
+        rescale(ax2, bottom=0)
+        rescale(self.ax2b, bottom=0)
+
+        for ax in (ax1, ax2, ax3):
+            if hour_labels and len(x):
+                # e.g. "5hr ago" ... "Now" spread over the shown range
+                positions = np.linspace(x[0], x[-1], len(hour_labels))
+                ax.xaxis.set_major_locator(ticker.FixedLocator(positions))
+                ax.xaxis.set_major_formatter(ticker.FixedFormatter(hour_labels))
+            else:
+                auto_dates(ax)
+
+        self.stats_box.set_text(stats_text)
+        wind = data if wind is None else wind
+        self.draw_rose(wind["wind_direction_10m"], wind["wind_speed_10m"], units["wind_speed_10m"])
+        self.suptitle.set_text(title)
+
+        self.relayout(axis_labels + (stats_text.split("\n")[0], bool(hour_labels)))
+        return self.fig
+
+    def _lines(self):
+        return (self.temperature, self.humidity, self.precipitation, self.cloud_cover, self.pressure)
+
+
+class DailyTemplate(ChartTemplate):
+    """
+    Daily layout:
+    1. Panel 1: Temperature: temperature_2m_max, temperature_2m_min, apparent_temperature_mean
+    2. Panel 2: Precipitation: precipitation
+    3. Panel 3: Sunshine duration: sunshine_duration
+    4. Panel 4. Wind speed and Wind direction: wind_speed_10m_max, wind_direction_10m_dominant
+    """
+    def __init__(self, figure=None):
+        super().__init__(figure)
+        ax1, ax2, ax3 = self.ax1, self.ax2, self.ax3
+        self.stats_box.set_position((0.01, 0.85))
+        self.stats_box.set_horizontalalignment("left")
+
+        # Panel 1: Temperature min and max, and the range between them
+        self.t_max, = ax1.plot([], [], color="#8E18B9", label="Max Temp.")
+        self.t_min, = ax1.plot([], [], color="#16519F", label="Min Temp.")
+        self.t_mean, = ax1.plot([], [], color="#09BAB1", label="Mean Temp.")
+        self.t_range = ax1.fill_between([], [], [], color="#C67BD9", alpha=0.3, label="Temp. range")
+        ax1.legend(loc="upper left", frameon=True, fontsize=LGND_FS)
+        ax1.set_title("Temperature", fontsize=SP_FS)
+
+        # Panel 2: precipitation_sum, as bars (replaced on every render)
+        self._precipitation_bars = None
+        ax2.legend(handles=[Patch(color="#E18915", label="Precipitation")],
+                   loc="upper left", frameon=True, fontsize=LGND_FS)
+        ax2.set_title("Precipitation sum", fontsize=SP_FS)
+
+        # Panel 3: sunshine_duration
+        self.sunshine, = ax3.plot([], [], color="#DBDB07")
+
+        for ax in (ax1, ax2, ax3):
+            # to avoid overlap x-axis labels
+            ax.tick_params(axis="x", labelrotation=30)
+            auto_dates(ax)
+
+    def render(self, data, labels: dict, units: dict, title: str, stats_text: str,
+               wind=None) -> Figure:
+        """
+        Draws daily data into the template
+
+        :param data: DataFrame with naive local datetimes in 'time'
+        :param labels: variable name -> display name
+        :param units: variable name -> unit
+        :param title: figure title
+        :param stats_text: text of the wind speed stats box
+        :param wind: table of every sample for the wind rose, when data is
+                     downsampled (default: data)
+        :return: the Figure
+        """
+        x = date_numbers(data["time"])
+        ax1, ax2, ax3 = self.ax1, self.ax2, self.ax3
+
+        self.t_max.set_data(x, data["temperature_2m_max"])
+        self.t_min.set_data(x, data["temperature_2m_min"])
+        self.t_mean.set_data(x, data["apparent_temperature_mean"])
+        self.t_range.set_data(x, data["temperature_2m_min"], data["temperature_2m_max"])
+
+        if self._precipitation_bars is not None:
+            self._precipitation_bars.remove()
+        self._precipitation_bars = ax2.bar(x, data["precipitation_sum"], color="#E18915")
+
+        self.sunshine.set_data(x, data["sunshine_duration"])
+
+        axis_labels = (
+            f"Temperature({units['temperature_2m_max']})",
+            "Precipitation sum" + "(" + units["precipitation_sum"] + ")",
+            labels["sunshine_duration"] + "(" + units["sunshine_duration"] + ")",
+        )
+        for ax, axis_label in zip((ax1, ax2, ax3), axis_labels):
+            ax.set_ylabel(axis_label)
+        ax3.set_title(labels["sunshine_duration"], fontsize=SP_FS)
+
+        for ax in (ax1, ax2, ax3):
+            rescale(ax)
+            for label in ax.get_xticklabels():
+                label.set_horizontalalignment("right")
+
+        self.stats_box.set_text(stats_text)
+        wind = data if wind is None else wind
+        self.draw_rose(wind["wind_direction_10m_dominant"], wind["wind_speed_10m_max"],
+                       units["wind_speed_10m_max"])
+        self.suptitle.set_text(title)
+
+        self.relayout(axis_labels + (stats_text.split("\n")[0],))
+        return self.fig
+
+
+LAYOUTS = {"hourly": HourlyTemplate, "daily": DailyTemplate}
+
+
+@lru_cache(maxsize=None)
+def get_template(layout: str) -> ChartTemplate:
+    """
+    Returns the process wide headless template of a layout
+    ("hourly" or "daily"), building it on first use
+    """
+    return LAYOUTS[layout]()
@@ -0,0 +1,131 @@
+"""
+City gazetteer built from worldcities.csv.
+
+The CSV is parsed once per process and kept as NumPy column arrays, with a
+hash index keyed by the normalized (city_ascii, country) pair, so resolving a
+city to its coordinates is a dictionary lookup instead of a full table scan.
+"""
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+CSV_PATH = Path(__file__).resolve().parent / "worldcities.csv"
+
+
+class Place(NamedTuple):
+    """
+    One row of the gazetteer
+
+    :row: Row number in worldcities.csv (0 based, header excluded)
+    :city: City name as written in the CSV (may contain accents)
+    :city_ascii: ASCII spelling of the city name
+    :country: Country name
+    :iso2: Two letter country code
+    :lat: Latitude
+    :lng: Longitude
+    """
+    row: int
+    city: str
+    city_ascii: str
+    country: str
+    iso2: str
+    lat: float
+    lng: float
+
+    @property
+    def coords(self) -> tuple:
+        """(lat, lng), the shape the fetch functions in data_processing expect"""
+        return (self.lat, self.lng)
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a city or country name for exact lookups
+    (same rule the CSV search always used: lower case, outer spaces removed)
+    """
+    return name.strip().lower()
+
+
+class Gazetteer:
+    """
+    In-memory, indexed copy of worldcities.csv
+    """
+    def __init__(self, path=CSV_PATH):
+        # keep_default_na=False so that e.g. Namibia's iso2 "NA" stays a string
+        dfc = pd.read_csv(path, keep_default_na=False)
+
+        self.city = dfc["city"].to_numpy(dtype=object)
+        self.city_ascii = dfc["city_ascii"].to_numpy(dtype=object)
+        self.country = dfc["country"].to_numpy(dtype=object)
+        self.iso2 = dfc["iso2"].to_numpy(dtype=object)
+        self.lat = dfc["lat"].to_numpy(dtype=np.float64)
+        self.lng = dfc["lng"].to_numpy(dtype=np.float64)
+
+        # (city, country) -> row of the first occurrence
+        # the same city can be listed more than once for a country
+        # (like "Jaipur" in "India"), the first row always wins
+        self._index = {}
+        # city -> rows of every country listing it, for names given without country
+        self._city_index = {}
+        for row, key in enumerate(zip(
+            map(normalize_name, self.city_ascii),
+            map(normalize_name, self.country),
+        )):
+            if key not in self._index:
+                self._index[key] = row
+                self._city_index.setdefault(key[0], []).append(row)
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def place(self, row: int) -> Place:
+        """
+        Returns the Place stored at the given row
+        """
+        return Place(
+            int(row),
+            self.city[row],
+            self.city_ascii[row],
+            self.country[row],
+            self.iso2[row],
+            float(self.lat[row]),
+            float(self.lng[row]),
+        )
+
+    def lookup(self, city: str, country: str) -> Place | None:
+        """
+        Exact (case insensitive) match on city and country
+
+        :return: the first matching Place or None
+        """
+        row = self._index.get((normalize_name(city), normalize_name(country)))
+        if row is None:
+            return None
+        return self.place(row)
+
+    def lookup_city(self, city: str) -> list:
+        """
+        Exact (case insensitive) match on the city name alone
+
+        :return: the first matching Place of each country listing the city,
+                 in CSV order (empty if it is unknown)
+        """
+        return [self.place(row) for row in self._city_index.get(normalize_name(city), ())]
+
+    def coords(self, city: str, country: str) -> tuple:
+        """
+        :return: (lat, lng) of the city, or an empty tuple if it is unknown
+        """
+        place = self.lookup(city, country)
+        return place.coords if place else ()
+
+
+@lru_cache(maxsize=None)
+def get_gazetteer(path=CSV_PATH) -> Gazetteer:
+    """
+    Returns the process wide Gazetteer, loading the CSV on first use
+    """
+    return Gazetteer(path)
@@ -0,0 +1,278 @@
+"""
+Response cache for the Open-Meteo API.
+
+Responses are keyed by the canonical form of the URL and query params and kept
+in two tiers: an in-memory LRU of decoded JSON in front of a SQLite file that
+survives between runs. How long an entry stays valid depends on the endpoint:
+
+- archive responses whose date range has settled never expire
+- archive responses that include the last few days expire after a few hours,
+  because the reanalysis keeps filling those days in
+- forecast responses expire at the next model update (top of the hour)
+
+The SQLite file is trimmed to `max_bytes`, least recently used entries first.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+from pathlib import Path
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit
+
+from single_flight import copy_result
+
+try:
+    # optional, several times faster than the json module on large payloads
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+CACHE_DIR = Path(
+    os.environ.get("WEATHER_CACHE_DIR", Path.home() / ".cache" / "weather_project")
+)
+CACHE_FILE = "http_cache.sqlite3"
+MAX_BYTES = 256 * 1024 * 1024
+MEMORY_ITEMS = 256
+
+FORECAST_UPDATE_SECONDS = 3600  # Open-Meteo refreshes its forecasts hourly
+ARCHIVE_SETTLE_DAYS = 5  # the archive fills in the last ~5 days late
+ARCHIVE_RECENT_TTL = 6 * 3600
+
+# put() default: use the endpoint policy of ttl_for()
+ENDPOINT_POLICY = object()
+
+
+def canonical_params(params: dict) -> list:
+    """
+    Params as a sorted list of (name, value) strings, so that the
+    order of the keys and list vs comma separated values do not matter
+    """
+    canon = []
+    for name, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        canon.append((str(name), str(value)))
+    return sorted(canon)
+
+
+def cache_key(url: str, params: dict) -> str:
+    """
+    sha256 of the canonical URL (scheme, host and path) and params
+    """
+    parts = urlsplit(url)
+    canon_url = f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}"
+    payload = json.dumps([canon_url, canonical_params(params)], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def ttl_for(url: str, params: dict, now: float | None = None) -> float | None:
+    """
+    Seconds an Open-Meteo response stays valid, None meaning forever
+    """
+    now = time.time() if now is None else now
+    host = urlsplit(url).netloc.lower()
+    if host.startswith("archive-api."):
+        end = params.get("end_date")
+        today = date.fromtimestamp(now)
+        if end and date.fromisoformat(str(end)) < today - timedelta(days=ARCHIVE_SETTLE_DAYS):
+            return None
+        return ARCHIVE_RECENT_TTL
+    # forecast: valid until the next hourly model update
+    return FORECAST_UPDATE_SECONDS - (now % FORECAST_UPDATE_SECONDS)
+
+
+@dataclass
+class CacheStats:
+    """
+    Hit/miss counters of a ResponseCache
+    """
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    stores: int = 0
+    evictions: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.disk_hits
+
+    def as_dict(self) -> dict:
+        return {**asdict(self), "hits": self.hits}
+
+
+class ResponseCache:
+    """
+    Two tier (memory LRU + SQLite) cache of decoded JSON responses
+
+    Every hit returns its own copy of the decoded JSON (see
+    single_flight.copy_result), so callers can modify what they get.
+    """
+    def __init__(self, path=None, max_bytes: int = MAX_BYTES,
+                 memory_items: int = MEMORY_ITEMS, clock=time.time):
+        self.path = Path(path) if path else CACHE_DIR / CACHE_FILE
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.clock = clock
+        self.stats = CacheStats()
+
+        self._memory = OrderedDict()  # key -> (expires, data)
+        self._touched = {}  # key -> time of memory hits not yet written to disk
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires REAL,
+                accessed REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _remember(self, key: str, expires: float | None, data) -> None:
+        self._memory[key] = (expires, data)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, url: str, params: dict):
+        """
+        Returns the cached JSON for the request, or None on a miss
+        """
+        key = cache_key(url, params)
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, data = entry
+                if expires is None or expires > now:
+                    self._memory.move_to_end(key)
+                    self._touched[key] = now
+                    self.stats.memory_hits += 1
+                    return copy_result(data)
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT body, expires FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            body, expires = row
+            if expires is not None and expires <= now:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.stats.expired += 1
+                self.stats.misses += 1
+                return None
+
+            self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            data = json_loads(body)
+            self._remember(key, expires, data)
+            self.stats.disk_hits += 1
+            return copy_result(data)
+
+    def put(self, url: str, params: dict, body: bytes, data=None, ttl=ENDPOINT_POLICY) -> None:
+        """
+        Stores a response body (and its decoded JSON, if already decoded)
+
+        :param ttl: seconds the entry stays valid, None for forever;
+                    by default the endpoint policy of ttl_for()
+        """
+        key = cache_key(url, params)
+        now = self.clock()
+        if ttl is ENDPOINT_POLICY:
+            ttl = ttl_for(url, params, now)
+        expires = None if ttl is None else now + ttl
+        # the caller keeps its data: memory holds a copy
+        data = json_loads(body) if data is None else copy_result(data)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, url, body, len(body), expires, now),
+            )
+            self._remember(key, expires, data)
+            self.stats.stores += 1
+            self._evict()
+
+    def _flush_touched(self) -> None:
+        """Writes the access times of memory hits to disk"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE responses SET accessed = ? WHERE key = ?",
+                [(accessed, key) for key, accessed in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def _evict(self) -> None:
+        """Deletes least recently used rows until the file fits in max_bytes"""
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._flush_touched()
+        rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        for (key,) in doomed:
+            self._memory.pop(key, None)
+        self.stats.evictions += len(doomed)
+
+    def clear(self) -> None:
+        """Drops every entry (both tiers)"""
+        with self._lock:
+            self._memory.clear()
+            self._touched.clear()
+            self._db.execute("DELETE FROM responses")
+
+    def size_bytes(self) -> int:
+        """Total size of the stored response bodies"""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_touched()
+            self._db.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache | None:
+    """
+    Returns the process wide ResponseCache, or None if caching is disabled
+    (WEATHER_CACHE_DISABLE=1 or set_cache(None))
+    """
+    global _cache
+    if _cache is None and os.environ.get("WEATHER_CACHE_DISABLE") != "1":
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache or None
+
+
+def set_cache(cache: ResponseCache | None) -> None:
+    """
+    Replaces the process wide cache; None disables caching
+    """
+    global _cache
+    _cache = cache if cache is not None else False
@@ -0,0 +1,111 @@
+"""
+Shared HTTP session used by every fetcher in data_processing.py.
+
+One requests.Session keeps TCP/TLS connections alive between calls (per host
+connection pool), asks for gzip encoded responses and retries connection
+errors, timeouts and 5xx responses with jittered exponential backoff
+(429 responses are retried by data_processing.download_json, through the
+rate limiter when there is one, see rate_limit.py).
+The pool size can be raised for concurrent workloads with the
+WEATHER_HTTP_POOL_SIZE environment variable or configure_session().
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_SIZE = int(os.environ.get("WEATHER_HTTP_POOL_SIZE", 10))
+CONNECT_TIMEOUT = 5.0  # seconds
+READ_TIMEOUT = 30.0  # seconds
+RETRIES = 4
+BACKOFF_FACTOR = 0.5  # 0.5s, 1s, 2s, 4s ... between retries
+BACKOFF_JITTER = 0.5  # plus up to 0.5s of random jitter
+RETRY_STATUSES = (500, 502, 503, 504)
+
+HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "weather_project",
+}
+
+
+class LimiterRetry(Retry):
+    # urllib3 retries 429 by itself when it has a Retry-After header
+    RETRY_AFTER_STATUS_CODES = Retry.RETRY_AFTER_STATUS_CODES - {429}
+
+
+def build_session(
+    pool_size: int = POOL_SIZE,
+    retries: int = RETRIES,
+    backoff_factor: float = BACKOFF_FACTOR,
+    backoff_jitter: float = BACKOFF_JITTER,
+) -> requests.Session:
+    """
+    Creates a Session with a connection pool of `pool_size` connections
+    per host and automatic retries of idempotent GET requests
+    """
+    retry = LimiterRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff_factor,
+        backoff_jitter=backoff_jitter,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        # hand the last response back so that raise_for_status() reports it
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process wide Session, creating it on first use
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = build_session()
+    return _session
+
+
+def get_timeout() -> tuple:
+    """
+    Returns the (connect, read) timeout in seconds used for every request
+    """
+    return _timeout
+
+
+def configure_session(connect_timeout: float | None = None, read_timeout: float | None = None,
+                      **session_options) -> requests.Session:
+    """
+    Replaces the process wide Session (see build_session for the options)
+    and/or changes the timeouts
+    """
+    global _session, _timeout
+    with _lock:
+        _timeout = (
+            _timeout[0] if connect_timeout is None else connect_timeout,
+            _timeout[1] if read_timeout is None else read_timeout,
+        )
+        if session_options or _session is None:
+            old, _session = _session, build_session(**session_options)
+            if old is not None:
+                old.close()
+    return _session
@@ -0,0 +1,182 @@
+"""
+Weather data of one location, fetched once and shared by every duration.
+
+The four hourly durations ("5hr", "24hr", "pst_4d", "nxt_3d") are windows of
+the same hourly payload, and the daily durations ("1m", "2m", "3m") are the
+last days of the same archive range. LocationData fetches each payload once,
+in metric units, and keeps it in memory with its parsed table and analysis
+per unit system (Imperial is converted locally, see units.py). Any number of
+charts or stats of that location then only slice it: changing the duration
+or the units costs no HTTP request, and changing only the duration no
+parsing either.
+
+The daily archive range is fetched for the longest duration asked for so far
+(prefetch() takes all the durations of a batch up front), and shorter
+durations take its last days. The hourly payload is fetched again once it is
+older than HOURLY_MAX_AGE, so that a long session still shows the last hours,
+and the daily range when the day changes.
+"""
+from datetime import date, timedelta
+from typing import NamedTuple
+import time
+
+from analysis import analyze_data_daily, analyze_data_hourly
+from archive_store import fetch_daily_data
+from data_processing import (
+    UNIXTIME,
+    daily_data_table,
+    daily_data_units,
+    data_in_table,
+    fetch_hourly_metric_data,
+    hourly_data_units,
+)
+from units import to_imperial
+
+HOURLY_DURATIONS = ("5hr", "24hr", "pst_4d", "nxt_3d")
+# Days back from yesterday plotted for each daily duration code
+DAILY_DURATION_DAYS = {"1m": 30, "2m": 60, "3m": 90}
+# Window of the hourly analysis (see analysis.HOURLY_WINDOWS) of each hourly duration
+HOURLY_DURATION_WINDOWS = {"5hr": "5h", "24hr": "1d", "pst_4d": "archive", "nxt_3d": "forecast"}
+# Seconds an hourly payload is used before it is fetched again
+HOURLY_MAX_AGE = 15 * 60
+
+
+class Loaded(NamedTuple):
+    """
+    Data of a location for one duration
+
+    :units: variable -> unit, as returned by the API
+    :timezone: timezone of the location
+    :analysis: HourlyAnalysis for hourly durations,
+               (table, stats) of the last days for daily ones
+    """
+    units: dict
+    timezone: str
+    analysis: object
+
+
+class LocationData:
+    """
+    Fetched and analysed weather data of a location
+
+    :coords: (lat, lng)
+    :unit_sys: default unit system, "Metric" or "Imperial"
+    :fetches: number of payloads fetched so far
+    :clock: time source in seconds (for the age of the hourly payload)
+    """
+    def __init__(self, coords, unit_sys: str = "Metric", clock=time.monotonic):
+        self.coords = tuple(coords)
+        self.unit_sys = unit_sys
+        self.fetches = 0
+        self.clock = clock
+        # (fetched at, metric payload) and unit system -> Loaded
+        self._hourly_raw = None
+        self._hourly = {}
+        # (yesterday, days, metric payload) and unit system -> (units, timezone, table)
+        self._daily_raw = None
+        self._daily = {}
+
+    def snapshot(self) -> "LocationData":
+        """
+        Copy holding the payloads fetched so far, without the parsed tables
+        (small to pickle: the HTTP API sends it to its chart workers)
+        """
+        copy = LocationData(self.coords, self.unit_sys, self.clock)
+        copy._hourly_raw = self._hourly_raw
+        copy._daily_raw = self._daily_raw
+        return copy
+
+    def load(self, duration: str, unit_sys: str | None = None) -> Loaded:
+        """
+        Data of a duration code (fetched on first use)
+
+        :param unit_sys: "Metric" or "Imperial" (default: self.unit_sys)
+        :raises ValueError: for an unknown duration
+        """
+        if duration in HOURLY_DURATIONS:
+            return self.hourly(unit_sys)
+        if duration in DAILY_DURATION_DAYS:
+            return self.daily(DAILY_DURATION_DAYS[duration], unit_sys)
+        raise ValueError(f"Unknown duration: {duration}")
+
+    def prefetch(self, durations) -> None:
+        """
+        Fetches what the durations need with one request per payload
+        (the daily range of the longest daily duration)
+        """
+        days = [DAILY_DURATION_DAYS[duration] for duration in durations if duration in DAILY_DURATION_DAYS]
+        if days:
+            self._daily_payload(max(days))
+        if any(duration in HOURLY_DURATIONS for duration in durations):
+            self._hourly_payload()
+
+    def _convert(self, raw_data: dict, unit_sys: str | None) -> dict:
+        return to_imperial(raw_data) if (unit_sys or self.unit_sys) == "Imperial" else raw_data
+
+    def _hourly_payload(self) -> dict:
+        """Metric hourly payload, fetched if there is none or it is too old"""
+        now = self.clock()
+        if self._hourly_raw is None or now - self._hourly_raw[0] > HOURLY_MAX_AGE:
+            lat, lng = self.coords
+            # Timestamps are fetched as epoch seconds,
+            # they are only converted to datetimes for plotting
+            self._hourly_raw = (now, fetch_hourly_metric_data(lat, lng, timeformat=UNIXTIME))
+            self._hourly.clear()
+            self.fetches += 1
+        return self._hourly_raw[1]
+
+    def hourly(self, unit_sys: str | None = None) -> Loaded:
+        """
+        Hourly payload (past days and forecast) and its HourlyAnalysis
+        """
+        raw_data = self._hourly_payload()
+        unit_sys = unit_sys or self.unit_sys
+        if unit_sys not in self._hourly:
+            raw_data = self._convert(raw_data, unit_sys)
+            self._hourly[unit_sys] = Loaded(
+                hourly_data_units(raw_data),
+                raw_data.get("timezone", "UTC"),
+                analyze_data_hourly(data_in_table(raw_data)),
+            )
+        return self._hourly[unit_sys]
+
+    def _daily_payload(self, days: int) -> tuple:
+        """(days fetched, metric payload) covering the last `days` days up to yesterday"""
+        yesterday = date.today() - timedelta(days=1)
+        if self._daily_raw is None or self._daily_raw[0] != yesterday or self._daily_raw[1] < days:
+            lat, lng = self.coords
+            start = yesterday - timedelta(days=days - 1)
+            raw_data = fetch_daily_data(lat, lng, from_date=start, to_date=yesterday, timeformat=UNIXTIME)
+            self._daily_raw = (yesterday, days, raw_data)
+            self._daily.clear()
+            self.fetches += 1
+        return self._daily_raw[1:]
+
+    def daily(self, days: int, unit_sys: str | None = None) -> Loaded:
+        """
+        Daily archive data of the last `days` days up to yesterday,
+        with its min, max and average values
+        """
+        fetched_days, raw_data = self._daily_payload(days)
+        unit_sys = unit_sys or self.unit_sys
+        if unit_sys not in self._daily:
+            raw_data = self._convert(raw_data, unit_sys)
+            self._daily[unit_sys] = (daily_data_units(raw_data), raw_data.get("timezone", "UTC"),
+                                     daily_data_table(raw_data))
+
+        units, timezone, table = self._daily[unit_sys]
+        # One row per day: the last rows are the days of the duration
+        table = table.iloc[fetched_days - days:] if fetched_days > days else table
+        return Loaded(units, timezone, analyze_data_daily(table, days))
+
+    def window(self, duration: str, unit_sys: str | None = None) -> tuple:
+        """
+        Rows and min/max/avg stats of a duration
+
+        :return: (table, stats) with times as epoch seconds
+        """
+        analysis = self.load(duration, unit_sys).analysis
+        if duration in HOURLY_DURATIONS:
+            window = HOURLY_DURATION_WINDOWS[duration]
+            return analysis.window(window), analysis.stats(window)[0]
+        return analysis
@@ -0,0 +1,270 @@
+"""
+Client side rate limiting of the Open-Meteo requests.
+
+Open-Meteo limits the calls per minute, per hour and per day. Every request
+of data_processing.py takes a token from each tier of one process wide
+RateLimiter before it is sent, so a batch over many cities stays under the
+budgets instead of running into HTTP 429.
+
+Each tier is a token bucket that holds up to `burst` tokens and refills at
+(limit - burst) / period tokens per second. Whatever the timing, a tier
+never lets more than `limit` calls through in any window of `period`
+seconds.
+
+The limiter adapts to what the API answers. A 429 halves the refill rate of
+every tier and pauses all callers for the Retry-After delay (or a backoff
+when the header is missing), during which the buckets do not refill. Every
+successful response then raises the rate again by a small step, up to the
+configured budgets (additive increase, multiplicative decrease).
+
+The budgets come from WEATHER_RATE_LIMITS, e.g. "600/minute,5000/hour,
+10000/day" (the default, Open-Meteo's free tier; "off" disables limiting),
+or from set_limiter(). The limits apply per process: a pool of worker
+processes splits them with worker_limits() and use_limits(), each worker
+taking an equal share of every budget.
+"""
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import os
+import threading
+import time
+
+DEFAULT_LIMITS = "600/minute,5000/hour,10000/day"
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+# Share of a tier's limit that can be used at once
+BURST_FRACTIONS = {"minute": 0.1, "hour": 0.5, "day": 0.5}
+DEFAULT_BURST_FRACTION = 0.1
+MIN_FACTOR = 0.05  # lowest share of the configured rates after 429s
+RECOVERY_STEP = 0.02  # share of the rates given back per successful response
+BACKOFF = 5.0  # seconds paused on a 429 without Retry-After, doubled on each in a row
+MAX_BACKOFF = 300.0
+
+
+class Tier:
+    """
+    Token bucket of one budget: at most `limit` calls per `period` seconds
+
+    :burst: tokens the bucket holds (calls that can be made at once)
+    """
+    def __init__(self, name: str, limit: int, period: float, burst: float | None = None,
+                 clock=time.monotonic):
+        if limit < 1 or period <= 0:
+            raise ValueError(f"Invalid rate limit {limit}/{period}s")
+        self.name = name
+        self.limit = limit
+        self.period = period
+        fraction = BURST_FRACTIONS.get(name, DEFAULT_BURST_FRACTION)
+        self.burst = max(1.0, min(float(limit - 1), limit * fraction)) if burst is None else float(burst)
+        self.rate = (limit - self.burst) / period if limit > self.burst else limit / period
+        self.tokens = self.burst
+        self._updated = clock()
+
+    def refill(self, now: float, factor: float) -> None:
+        if now > self._updated:
+            self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate * factor)
+            self._updated = now
+
+    def hold(self, until: float) -> None:
+        """No tokens added before `until`"""
+        self._updated = max(self._updated, until)
+
+    def wait_time(self, factor: float) -> float:
+        """Seconds until a token is available (after refill())"""
+        # rounding can leave a refilled token a hair under 1
+        return 0.0 if self.tokens >= 1 - 1e-9 else (1 - self.tokens) / (self.rate * factor)
+
+    def __repr__(self) -> str:
+        return f"Tier({self.name!r}, {self.limit}/{self.period:g}s, burst={self.burst:g})"
+
+
+@dataclass
+class LimiterStats:
+    acquired: int = 0  # tokens taken (requests sent)
+    waited: float = 0.0  # seconds callers slept in acquire()
+    throttled: int = 0  # 429 responses
+    factor: float = 1.0  # current share of the configured rates
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def parse_limits(spec: str) -> list:
+    """
+    "600/minute,5000/hour" -> [(name, limit, period seconds), ...]
+    (periods: second, minute, hour, day or a number of seconds)
+    """
+    tiers = []
+    for part in spec.split(","):
+        limit, _, period = part.strip().partition("/")
+        if not limit or not period:
+            raise ValueError(f"Invalid rate limit: {part!r} (use e.g. 600/minute)")
+        period = period.strip()
+        seconds = PERIODS.get(period) or float(period)
+        tiers.append((period if period in PERIODS else f"{seconds:g}s", int(limit), seconds))
+    return tiers
+
+
+def retry_after_seconds(value: str | None, now: float | None = None) -> float | None:
+    """
+    Seconds of a Retry-After header (a number of seconds or an HTTP date),
+    None if missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = datetime.now(timezone.utc).timestamp() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def backoff_seconds(in_a_row: int) -> float:
+    """Pause after the n-th 429 in a row that came without Retry-After"""
+    return min(MAX_BACKOFF, BACKOFF * 2 ** (in_a_row - 1))
+
+
+class RateLimiter:
+    """
+    Multi-tier token bucket limiter shared by threads
+
+    :param tiers: Tier objects, or (name, limit, period) tuples
+    """
+    def __init__(self, tiers, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.tiers = [tier if isinstance(tier, Tier) else Tier(*tier, clock=clock) for tier in tiers]
+        self.stats = LimiterStats()
+        self._paused_until = 0.0
+        self._throttled_in_a_row = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_spec(cls, spec: str, **kwargs) -> "RateLimiter":
+        """RateLimiter of a WEATHER_RATE_LIMITS string"""
+        return cls(parse_limits(spec), **kwargs)
+
+    def share(self, parts: int) -> list:
+        """
+        Tiers of one of `parts` processes splitting these budgets
+        (at least one call per period each)
+        """
+        return [(tier.name, max(1, tier.limit // parts), tier.period) for tier in self.tiers]
+
+    def _try_acquire(self) -> float:
+        """Takes a token of every tier, or returns the seconds to wait"""
+        with self._lock:
+            now = self.clock()
+            if now < self._paused_until:
+                return self._paused_until - now
+            factor = self.stats.factor
+            for tier in self.tiers:
+                tier.refill(now, factor)
+            wait = max((tier.wait_time(factor) for tier in self.tiers), default=0.0)
+            if wait > 0:
+                return wait
+            for tier in self.tiers:
+                tier.tokens -= 1
+            self.stats.acquired += 1
+            return 0.0
+
+    def acquire(self) -> float:
+        """
+        Blocks until every tier allows a request
+
+        :return: seconds waited
+        """
+        waited = 0.0
+        while True:
+            wait = self._try_acquire()
+            if wait <= 0:
+                break
+            self.sleep(wait)
+            waited += wait
+        if waited:
+            with self._lock:
+                self.stats.waited += waited
+        return waited
+
+    def success(self) -> None:
+        """A request went through: gives back part of the rate"""
+        with self._lock:
+            self._throttled_in_a_row = 0
+            if self.stats.factor < 1.0:
+                now = self.clock()
+                for tier in self.tiers:
+                    tier.refill(now, self.stats.factor)
+                self.stats.factor = min(1.0, self.stats.factor + RECOVERY_STEP)
+
+    def throttled(self, retry_after: float | None = None) -> float:
+        """
+        The API answered 429: halves the rates and pauses every caller for
+        retry_after seconds (or a doubling backoff)
+
+        :return: seconds paused
+        """
+        with self._lock:
+            now = self.clock()
+            for tier in self.tiers:
+                tier.refill(now, self.stats.factor)
+            self._throttled_in_a_row += 1
+            self.stats.throttled += 1
+            self.stats.factor = max(MIN_FACTOR, self.stats.factor / 2)
+            if retry_after is None:
+                retry_after = backoff_seconds(self._throttled_in_a_row)
+            self._paused_until = max(self._paused_until, now + retry_after)
+            # nothing refills during the pause
+            for tier in self.tiers:
+                tier.hold(self._paused_until)
+            return retry_after
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter() -> RateLimiter | None:
+    """
+    Returns the process wide RateLimiter, or None if limiting is disabled
+    (WEATHER_RATE_LIMITS=off or set_limiter(None))
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                spec = os.environ.get("WEATHER_RATE_LIMITS", DEFAULT_LIMITS)
+                _limiter = False if spec.strip().lower() == "off" else RateLimiter.from_spec(spec)
+    return _limiter or None
+
+
+def set_limiter(limiter: RateLimiter | None) -> None:
+    """
+    Replaces the process wide limiter; None disables limiting
+    """
+    global _limiter
+    _limiter = limiter if limiter is not None else False
+
+
+def worker_limits(workers: int) -> list:
+    """
+    Tiers for each of `workers` processes sharing the budgets of this
+    process' limiter (an empty list if limiting is disabled),
+    to pass to use_limits() in the workers
+    """
+    limiter = get_limiter()
+    return limiter.share(max(1, workers)) if limiter is not None else []
+
+
+def use_limits(tiers: list) -> None:
+    """
+    Replaces the process wide limiter by one with the given tiers;
+    no tiers disables limiting
+    """
+    set_limiter(RateLimiter(tiers) if tiers else None)
@@ -0,0 +1,179 @@
+"""
+Single-flight: concurrent calls for the same key share one execution.
+
+When many callers ask for the same thing at once (a popular city on a
+dashboard), the first caller for a key runs the work, and every caller
+that arrives while it is in flight waits for it and gets a copy of its
+result (see copy_result), or the same exception. Callers can change what
+they get without touching each other's data, as if each had made the call.
+Once the call is done, the key is free again: this is not a cache, it only
+merges calls that overlap in time.
+
+A SingleFlight serves threads (do) and asyncio tasks (do_async) through
+the same table of calls. An asyncio task never blocks its event loop: it
+awaits a future that is resolved when the call finishes, also when the
+call runs on another thread. data_processing.fetch_json keys its requests
+by http_cache.cache_key, the canonical form of the URL and params.
+
+The counters (FlightStats) tell how many calls ran and how many were
+coalesced into one that was already in flight.
+"""
+from dataclasses import dataclass, asdict
+import asyncio
+import threading
+
+# leaves shared as they are, without a copy_result() call per item
+IMMUTABLE = frozenset({str, bytes, int, float, bool, type(None)})
+
+
+@dataclass
+class FlightStats:
+    calls: int = 0  # calls that ran
+    coalesced: int = 0  # calls that waited for one in flight instead
+    errors: int = 0  # calls that raised (their waiters raise too)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def copy_result(value):
+    """
+    Copy of a result for a caller that waited for it: dicts, lists and
+    tuples are rebuilt around copies of their items, objects with a copy()
+    method (DataFrame, ndarray) are copied, and immutable leaves (str,
+    bytes, numbers) are shared
+    """
+    if isinstance(value, dict):
+        return {key: item if type(item) in IMMUTABLE else copy_result(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [item if type(item) in IMMUTABLE else copy_result(item) for item in value]
+    if isinstance(value, tuple):
+        items = [copy_result(item) for item in value]
+        return type(value)(*items) if hasattr(value, "_fields") else tuple(items)
+    copy = getattr(value, "copy", None)
+    return copy() if callable(copy) else value
+
+
+class _Call:
+    """One call in flight, its outcome and its waiters"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self._callbacks = []
+
+    def finish(self, result=None, error=None) -> None:
+        self.result, self.error = result, error
+        self.done.set()
+        for callback in self._callbacks:
+            callback()
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def wait(self):
+        self.done.wait()
+        return self.outcome()
+
+    async def wait_async(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        self._callbacks.append(wake)
+        # finished between the lookup and the callback registration
+        if self.done.is_set():
+            wake()
+        await future
+        return self.outcome()
+
+
+class SingleFlight:
+    """
+    Table of the calls in flight, by key
+
+    :param copy: what the waiters get from the result (None: the result itself)
+    """
+    def __init__(self, copy=copy_result):
+        self.copy = copy or (lambda result: result)
+        self.stats = FlightStats()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key) -> tuple:
+        """(call, True if this caller has to run it)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats.coalesced += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self.stats.calls += 1
+            return call, True
+
+    def _finish(self, key, call: _Call, result=None, error=None) -> None:
+        with self._lock:
+            del self._calls[key]
+            if error is not None:
+                self.stats.errors += 1
+        call.finish(result, error)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Runs func(*args, **kwargs), unless a call for key is in flight:
+        then waits for it and returns a copy of its result (or raises its error)
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self.copy(call.wait())
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key, call, error=error)
+            raise
+        self._finish(key, call, result)
+        return result
+
+    async def do_async(self, key, func, *args, **kwargs):
+        """
+        Coroutine version of do(): func is a coroutine function, and
+        waiting does not block the event loop
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self.copy(await call.wait_async())
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as error:
+            self._finish(key, call, error=error)
+            raise
+        self._finish(key, call, result)
+        return result
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_flights = SingleFlight()
+
+
+def get_flights() -> SingleFlight | None:
+    """
+    Returns the process wide SingleFlight of the fetchers, or None if disabled
+    """
+    return _flights or None
+
+
+def set_flights(flights: SingleFlight | None) -> None:
+    """
+    Replaces the process wide SingleFlight; None disables coalescing
+    """
+    global _flights
+    _flights = flights if flights is not None else False
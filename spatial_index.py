@@ -0,0 +1,242 @@
+"""
+Spatial index over the gazetteer's lat/lng columns.
+
+Cities are stored as unit vectors on the sphere and bucketed into uniform
+3-D grids of a few cell sizes. A point in a cell that is r+1 cells away (along
+any axis) is more than r cell widths away in chord distance, which bounds every
+query to a small block of cells around the query point. Queries that no grid
+level can answer fall back to one vectorized scan of all the cities.
+"""
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+
+from gazetteer import Place, get_gazetteer
+
+EARTH_RADIUS_KM = 6371.0088
+# Grid levels, finest first: dense areas are answered by the fine grid,
+# oceans and deserts by the coarser ones
+CELL_KM = (50.0, 400.0)
+# Blocks of (2 * reach + 1) ** 3 cells tried around a query on each grid level
+REACHES = (1, 2)
+
+
+class Neighbour(NamedTuple):
+    """
+    A city returned by a spatial query
+
+    :place: the gazetteer Place (place.coords feeds the fetch functions)
+    :distance_km: great circle distance from the query point
+    """
+    place: Place
+    distance_km: float
+
+    @property
+    def coords(self) -> tuple:
+        """(lat, lng) of the city"""
+        return self.place.coords
+
+
+def unit_vectors(lat, lng) -> np.ndarray:
+    """
+    Converts latitudes and longitudes (degrees) to (n, 3) unit vectors
+    """
+    lat = np.deg2rad(np.asarray(lat, dtype=np.float64))
+    lng = np.deg2rad(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack(
+        (cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)), axis=-1
+    )
+
+
+def chord_to_km(chord):
+    """Chord length on the unit sphere to great circle distance in km"""
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2.0, 0.0, 1.0))
+
+
+def chords_to(points: np.ndarray, xyz: np.ndarray) -> np.ndarray:
+    """
+    Chord lengths from every row of points to xyz, via one matrix-vector
+    product (|a - b|^2 = 2 - 2 a.b for unit vectors)
+    """
+    return np.sqrt(np.maximum(2.0 - 2.0 * (points @ xyz), 0.0))
+
+
+def km_to_chord(km):
+    """Great circle distance in km to chord length on the unit sphere"""
+    return 2.0 * np.sin(np.minimum(km / EARTH_RADIUS_KM, np.pi) / 2.0)
+
+
+class _CellGrid:
+    """
+    Unit vectors bucketed into cubic cells of a fixed chord width
+    """
+    def __init__(self, xyz: np.ndarray, cell_km: float):
+        self.cell = float(km_to_chord(cell_km))
+        self._span = int(np.ceil(1.0 / self.cell)) + 2
+
+        # Group the rows by cell: rows of cell_codes[i] are
+        # rows[cell_start[i]:cell_start[i + 1]]
+        codes = self._codes(np.floor(xyz / self.cell).astype(np.int64))
+        self._rows = np.argsort(codes, kind="stable")
+        self._cell_codes, cell_start = np.unique(codes[self._rows], return_index=True)
+        self._cell_start = np.append(cell_start, len(codes))
+        self._offsets = {}
+
+    def _codes(self, cells: np.ndarray) -> np.ndarray:
+        """Packs integer (x, y, z) cell coordinates into one int64 key"""
+        width = 2 * self._span + 1
+        cells = cells + self._span
+        return (cells[..., 0] * width + cells[..., 1]) * width + cells[..., 2]
+
+    def rows_near(self, xyz: np.ndarray, reach: int) -> tuple[np.ndarray, float]:
+        """
+        Rows in the (2 * reach + 1) ** 3 block of cells around xyz, and the
+        distance from xyz to the block's faces: every row outside the block
+        is at least that far away.
+        """
+        offsets = self._offsets.get(reach)
+        if offsets is None:
+            steps = np.arange(-reach, reach + 1)
+            offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1)
+            offsets = self._offsets[reach] = offsets.reshape(-1, 3)
+        centre = np.floor(xyz / self.cell).astype(np.int64)
+        codes = self._codes(offsets + centre)
+        clearance = float(min(
+            (xyz - (centre - reach) * self.cell).min(),
+            ((centre + reach + 1) * self.cell - xyz).min(),
+        ))
+
+        pos = np.searchsorted(self._cell_codes, codes)
+        found = pos < len(self._cell_codes)
+        pos, codes = pos[found], codes[found]
+        pos = pos[self._cell_codes[pos] == codes]
+        if not len(pos):
+            return np.empty(0, dtype=np.int64), clearance
+        rows = np.concatenate([
+            self._rows[self._cell_start[p]:self._cell_start[p + 1]] for p in pos
+        ])
+        return rows, clearance
+
+
+class SpatialIndex:
+    """
+    Grid index answering k nearest neighbour, radius and bounding box queries
+    """
+    def __init__(self, lat, lng, cell_km: tuple = CELL_KM):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self._xyz = unit_vectors(self.lat, self.lng)
+        self._grids = [_CellGrid(self._xyz, km) for km in sorted(cell_km)]
+
+        # Latitude order for bounding box queries
+        self._lat_order = np.argsort(self.lat, kind="stable")
+        self._lat_sorted = self.lat[self._lat_order]
+
+    def __len__(self) -> int:
+        return len(self.lat)
+
+    def _candidates(self, xyz: np.ndarray, accept, need: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Tries growing blocks on each grid level, finest first, until
+        accept(chords, guaranteed_chord) holds. Blocks that cannot reach
+        `need` (chord) around xyz are skipped. Falls back to all rows.
+        """
+        for grid in self._grids:
+            for reach in REACHES:
+                if (reach + 1) * grid.cell < need:
+                    continue
+                rows, clearance = grid.rows_near(xyz, reach)
+                chords = chords_to(self._xyz[rows], xyz)
+                if accept(chords, clearance):
+                    return rows, chords
+        rows = np.arange(len(self))
+        return rows, chords_to(self._xyz, xyz)
+
+    def nearest(self, lat: float, lng: float, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """
+        k nearest cities to (lat, lng)
+
+        :return: (rows, distances in km), closest first (empty for k < 1)
+        """
+        k = min(k, len(self))
+        if k < 1:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        def accept(chords, guaranteed):
+            # k cities found, all closer than anything outside the block
+            return len(chords) >= k and np.partition(chords, k - 1)[k - 1] <= guaranteed
+
+        rows, chords = self._candidates(unit_vectors(lat, lng), accept)
+        best = np.argpartition(chords, k - 1)[:k] if k < len(chords) else np.arange(len(chords))
+        best = best[np.lexsort((rows[best], chords[best]))]
+        return rows[best], chord_to_km(chords[best])
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cities within radius_km of (lat, lng)
+
+        :return: (rows, distances in km), closest first
+        """
+        max_chord = float(km_to_chord(radius_km))
+        rows, chords = self._candidates(
+            unit_vectors(lat, lng),
+            lambda chords, guaranteed: max_chord <= guaranteed,
+            need=max_chord,
+        )
+        hit = chords <= max_chord
+        rows, chords = rows[hit], chords[hit]
+        order = np.lexsort((rows, chords))
+        return rows[order], chord_to_km(chords[order])
+
+    def in_bbox(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """
+        Cities inside a lat/lng bounding box, in CSV order.
+        A box with west > east crosses the antimeridian.
+        """
+        lo = np.searchsorted(self._lat_sorted, south, side="left")
+        hi = np.searchsorted(self._lat_sorted, north, side="right")
+        rows = self._lat_order[lo:hi]
+        lng = self.lng[rows]
+        if west <= east:
+            rows = rows[(lng >= west) & (lng <= east)]
+        else:
+            rows = rows[(lng >= west) | (lng <= east)]
+        return np.sort(rows)
+
+
+@lru_cache(maxsize=None)
+def get_spatial_index() -> SpatialIndex:
+    """
+    Returns the process wide SpatialIndex over the gazetteer
+    """
+    gaz = get_gazetteer()
+    return SpatialIndex(gaz.lat, gaz.lng)
+
+
+def _neighbours(rows, distances) -> list[Neighbour]:
+    gaz = get_gazetteer()
+    return [Neighbour(gaz.place(row), float(dist)) for row, dist in zip(rows, distances)]
+
+
+def nearest_cities(lat: float, lng: float, k: int = 1) -> list[Neighbour]:
+    """
+    Reverse geocoding: the k known cities closest to (lat, lng)
+    """
+    return _neighbours(*get_spatial_index().nearest(lat, lng, k))
+
+
+def cities_within(lat: float, lng: float, radius_km: float) -> list[Neighbour]:
+    """
+    All known cities within radius_km of (lat, lng), closest first
+    """
+    return _neighbours(*get_spatial_index().within_radius(lat, lng, radius_km))
+
+
+def cities_in_bbox(south: float, west: float, north: float, east: float) -> list[Place]:
+    """
+    All known cities inside the bounding box, in CSV order
+    """
+    gaz = get_gazetteer()
+    return [gaz.place(row) for row in get_spatial_index().in_bbox(south, west, north, east)]
@@ -81,3 +81,50 @@ def test_non_empty_dataFrames(analyzed_hourly_data, analyzed_daily_data):
 
     for df in analyzed_daily_data:
         assert not df.empty
+
+
+def test_epoch_time_matches_iso_time(sample_daily_metric_data):
+    """Test that Unix epoch times give the same daily statistics as ISO 8601 strings."""
+
+    df_epoch = sample_daily_metric_data.copy()
+    df_epoch["time"] = (
+        pd.to_datetime(df_epoch["time"], utc=True) - pd.Timestamp(0, tz="UTC")
+    ) // pd.Timedelta(seconds=1)
+
+    iso_results = analyze_data_daily(sample_daily_metric_data.copy(), time_limit=10)
+    epoch_results = analyze_data_daily(df_epoch, time_limit=10)
+
+    assert len(epoch_results[0]) == len(iso_results[0])
+    for iso_stats, epoch_stats in zip(iso_results[1:], epoch_results[1:]):
+        pd.testing.assert_frame_equal(iso_stats, epoch_stats)
+
+
+def test_hourly_result_is_lazy_and_tuple_compatible(sample_hourly_metric_data):
+    """Test that only the accessed window is computed and the result still behaves like the 10-tuple."""
+
+    result = analyze_data_hourly(sample_hourly_metric_data)
+
+    stats_5h = result.df_stats_5h
+    assert result[6] is stats_5h
+    assert "df_forecast" not in vars(result)
+    assert list(result._stats) == ["5h"]
+
+    assert len(result) == 10
+    df, df_5h, df_1d, df_archive, df_forecast, *stats = result
+    assert df_5h is result.df_5h
+    assert stats[1] is stats_5h
+    assert len(result[5:]) == 5
+    assert list(stats_5h.index) == ["min", "max", "avg"]
+
+
+def test_unsorted_daily_data_gives_the_same_window(sample_daily_metric_data):
+    """Test that the window is cut from the time sorted data, whatever the row order."""
+
+    shuffled = sample_daily_metric_data.sample(frac=1, random_state=3)
+
+    df_custom, df_stats_custom = analyze_data_daily(shuffled, time_limit=7)
+    expected_custom, expected_stats = analyze_data_daily(sample_daily_metric_data, time_limit=7)
+
+    assert df_custom["time"].is_monotonic_increasing
+    assert len(df_custom) == 8
+    pd.testing.assert_frame_equal(df_stats_custom, expected_stats)
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import archive_store
+import data_processing
+from archive_store import ArchiveStore, day_ranges, fetch_daily_data
+from data_processing import DAILY_VARIABLES, UNIXTIME
+
+
+def fake_archive(lat, lng, from_date, to_date, timeformat):
+    """Archive response whose values are the day ordinals (NaN on the 1st of a month)."""
+    days = [from_date + timedelta(days=n) for n in range((to_date - from_date).days + 1)]
+    values = [None if day.day == 1 else float(day.toordinal()) for day in days]
+    return {
+        "latitude": lat,
+        "longitude": lng,
+        "timezone": "Europe/Berlin",
+        "daily_units": {name: "x" for name in ["time", *DAILY_VARIABLES]},
+        "daily": {"time": [day.isoformat() for day in days], **{name: values for name in DAILY_VARIABLES}},
+    }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Fixture with an empty store at a fixed date and a recording fake archive API."""
+    clock = lambda: datetime(2026, 6, 30, 12).timestamp()
+    store = ArchiveStore(tmp_path / "store.sqlite3", clock=clock)
+    store.fetches = []
+
+    def fetch(lat, lng, from_date, to_date, timeformat):
+        store.fetches.append((from_date, to_date))
+        return fake_archive(lat, lng, from_date, to_date, timeformat)
+
+    monkeypatch.setattr(data_processing, "fetch_daily_data", fetch)
+    yield store
+    store.close()
+
+
+def test_day_ranges():
+    days = np.array([1, 2, 3, 7, 8, 20])
+
+    assert day_ranges(days) == [(1, 3), (7, 8), (20, 20)]
+    assert day_ranges(days, merge_gap=3) == [(1, 8), (20, 20)]
+    assert day_ranges(np.array([], dtype=np.int64)) == []
+
+
+def test_only_missing_days_are_fetched(store):
+    start, end = date(2026, 4, 1), date(2026, 6, 29)
+
+    first = fetch_daily_data(52.52, 13.41, start, end, store=store)
+    assert store.fetches == [(start, end)]
+
+    # a longer range fetches the older days and the still provisional last days only
+    store.fetches.clear()
+    second = fetch_daily_data(52.52, 13.41, date(2026, 2, 1), end, store=store)
+    assert store.fetches == [(date(2026, 2, 1), date(2026, 3, 31)), (date(2026, 6, 26), end)]
+
+    assert second["daily"]["time"][-len(first["daily"]["time"]):] == first["daily"]["time"]
+    values = second["daily"][DAILY_VARIABLES[0]]
+    assert len(values) == (end - date(2026, 2, 1)).days + 1
+    assert np.isnan(values[0])  # None from the API is kept as missing
+    assert values[1] == date(2026, 2, 2).toordinal()
+
+
+def test_unixtime_is_local_midnight(store):
+    data = fetch_daily_data(52.52, 13.41, date(2026, 6, 1), date(2026, 6, 2), UNIXTIME, store=store)
+
+    # Berlin is UTC+2 in summer
+    assert data["daily"]["time"].tolist() == [
+        int(datetime(2026, 5, 31, 22, tzinfo=timezone.utc).timestamp()),
+        int(datetime(2026, 6, 1, 22, tzinfo=timezone.utc).timestamp()),
+    ]
+    assert data["timezone"] == "Europe/Berlin"
+
+
+def test_without_store_fetches_directly(monkeypatch, store):
+    archive_store.set_store(None)
+    try:
+        fetch_daily_data(1.0, 2.0, date(2026, 1, 1), date(2026, 1, 5))
+        fetch_daily_data(1.0, 2.0, date(2026, 1, 1), date(2026, 1, 5))
+    finally:
+        monkeypatch.setattr(archive_store, "_store", None)
+    assert len(store.fetches) == 2
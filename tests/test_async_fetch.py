@@ -0,0 +1,66 @@
+import pytest
+import json
+import threading
+import time
+import pandas as pd
+from pathlib import Path
+import data_processing
+from async_fetch import fetch_many
+
+
+@pytest.fixture
+def slow_api(monkeypatch):
+    """Fixture that replaces fetch_json with a 50 ms fake and tracks concurrency."""
+    hourly = json.load(open(Path(__file__).parent / "mock_data" / "hourly_metric.json"))
+    state = {"running": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fake_fetch_json(url, params):
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.05)
+        with lock:
+            state["running"] -= 1
+        return {**hourly, "latitude": params["latitude"]}
+
+    monkeypatch.setattr(data_processing, "fetch_json", fake_fetch_json)
+    yield state
+
+
+def test_fetch_many_bounded_and_ordered(slow_api):
+    """Test that downloads run concurrently, within the limit, and keep the input order."""
+    coords = [(float(n), 0.0) for n in range(20)]
+
+    start = time.perf_counter()
+    results = fetch_many("hourly_metric", coords, max_concurrency=5)
+    elapsed = time.perf_counter() - start
+
+    assert [r["latitude"] for r in results] == [lat for lat, _ in coords]
+    assert slow_api["peak"] == 5
+    assert elapsed < 20 * 0.05 / 2
+
+
+def test_fetch_many_tables(slow_api):
+    """Test that tables=True returns the same DataFrames as data_in_table."""
+    frames = fetch_many("hourly_metric", [(1.0, 2.0), (3.0, 4.0)], tables=True)
+
+    assert all(isinstance(df, pd.DataFrame) for df in frames)
+    assert list(frames[0].columns) == list(data_processing.data_in_table(
+        data_processing.fetch_hourly_metric_data(1.0, 2.0)).columns)
+
+
+def test_fetch_many_coalesces_duplicates(slow_api, monkeypatch):
+    """Test that the same location asked for concurrently is fetched once."""
+    from single_flight import SingleFlight
+
+    flights = SingleFlight()
+    monkeypatch.setattr("single_flight._flights", flights)
+    coords = [(1.0, 2.0)] * 6 + [(3.0, 4.0)]
+
+    results = fetch_many("hourly_metric", coords)
+
+    assert [r["latitude"] for r in results] == [lat for lat, _ in coords]
+    # equal results, but each caller gets its own copy
+    assert results[0] == results[5] and results[0] is not results[5]
+    assert flights.stats.coalesced == 5
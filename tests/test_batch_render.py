@@ -0,0 +1,168 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+import batch_render
+from batch_render import RenderJob, job_filename, read_jobs, render_batch, resolve_city, resolve_place
+from gazetteer import Place
+
+
+def place(city, country, lat, lng):
+    return Place(0, city, city, country, "", lat, lng)
+
+
+def fake_fetch_json(url, params):
+    """Constant weather for the requested variables and dates, times as epoch seconds."""
+    block = "hourly" if "hourly" in params else "daily"
+    epoch = date(1970, 1, 1).toordinal()
+    start = (date.fromisoformat(params["start_date"]).toordinal() - epoch) * 86400
+    end = (date.fromisoformat(params["end_date"]).toordinal() - epoch + 1) * 86400
+    times = np.arange(start, end, 3600 if block == "hourly" else 86400)
+    columns = {name: np.full(len(times), 10.0) for name in params[block]}
+    return {
+        "timezone": "GMT",
+        f"{block}_units": {name: "x" for name in columns},
+        block: {"time": times, **columns},
+    }
+
+
+def use_fake_data():
+    """Worker initializer: answers requests with fake_fetch_json, without caches."""
+    import archive_store
+    import data_processing
+    import http_cache
+
+    http_cache.set_cache(None)
+    archive_store.set_store(None)
+    data_processing.fetch_json = fake_fetch_json
+
+
+def test_job_filename():
+    assert job_filename(RenderJob("Saint-Denis, France", "5hr"), "svg") == "saint-denis_france_5hr_metric.svg"
+    assert job_filename(RenderJob((51.5, -0.12), "1m", "Imperial"), "png") == "51.5000_-0.1200_1m_imperial.png"
+
+
+def test_invalid_jobs_are_rejected(tmp_path):
+    report = render_batch([((1.0, 2.0), "1y", "Metric"), ((1.0, 2.0), "5hr", "Kelvin")], tmp_path, workers=0)
+    assert [result.error for result in report.failed] == [
+        "ValueError: Unknown duration: 1y", "ValueError: Unknown unit system: Kelvin"]
+    assert report.locations == 0
+    with pytest.raises(ValueError):
+        render_batch([((1.0, 2.0), "5hr")], tmp_path, fmt="gif")
+
+
+def test_render_in_process(tmp_path, monkeypatch):
+    import archive_store
+    import data_processing
+    import http_cache
+
+    # what use_fake_data does in a worker, undone after the test
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(archive_store, "_store", False)
+    monkeypatch.setattr(data_processing, "fetch_json", fake_fetch_json)
+    monkeypatch.setattr(batch_render, "resolve_place", lambda city: place("London", "United Kingdom", 51.5, -0.12))
+    jobs = [("London", "24hr", "Metric"), ("London", "2m", "Imperial"), ("London", "1m")]
+
+    report = render_batch(jobs, tmp_path, fmt="svg", workers=0)
+
+    assert report.charts == 3 and not report.failed
+    assert [result.path.name for result in report.results] == [
+        "london_24hr_metric.svg", "london_2m_imperial.svg", "london_1m_metric.svg"
+    ]
+    assert all(result.path.read_text().startswith("<?xml") for result in report.results)
+    assert report.charts_per_second_per_core > 0
+
+
+def test_render_in_worker_process(tmp_path):
+    report = render_batch([((51.5, -0.12), "pst_4d", "Metric")], tmp_path, workers=1,
+                          initializer=use_fake_data)
+
+    assert not report.failed, report.failed
+    assert report.results[0].path.read_bytes().startswith(b"\x89PNG")
+
+
+def test_batch_cities_are_not_guessed():
+    assert resolve_place("Paris, France").country == "France"
+    # accents and case do not matter for a single exact match
+    assert resolve_place("zurich").city == "Zürich"
+    assert resolve_place((48.86, 2.35)) is None and resolve_city((48.86, 2.35)) == (48.86, 2.35)
+    # a misspelt name with several candidates is not replaced by the best one
+    with pytest.raises(ValueError, match="Ambiguous city"):
+        resolve_place("Springfeld, United States")
+    assert resolve_city("Springfeld, United States", strict=False)
+    with pytest.raises(ValueError, match="not found"):
+        resolve_place("Xyzzyq")
+
+
+def test_city_without_country_is_looked_up_exactly(monkeypatch):
+    import city_search
+
+    def no_search(*args, **kwargs):
+        raise AssertionError("exact names do not need the city search")
+
+    monkeypatch.setattr(city_search, "search_cities", no_search)
+    # listed once (its accented name is found through city_ascii)
+    assert resolve_place("Reykjavik").country == "Iceland"
+    # listed in India and Japan: the job fails rather than picking one
+    with pytest.raises(ValueError, match="Ambiguous city: Kota .*India.*Japan"):
+        resolve_place("Kota")
+    assert resolve_place("Kota", strict=False).country == "India"
+
+
+def test_read_jobs(tmp_path):
+    csv_file = tmp_path / "jobs.csv"
+    csv_file.write_text("city,country,duration,unit\nParis,France,5hr,imperial\nOslo,,1m,\n")
+    jsonl_file = tmp_path / "jobs.jsonl"
+    jsonl_file.write_text('{"city": "Paris", "country": "France", "duration": "3m"}\n\n')
+
+    assert read_jobs(csv_file) == [RenderJob("Paris, France", "5hr", "Imperial"), RenderJob("Oslo", "1m")]
+    assert read_jobs(jsonl_file) == [RenderJob("Paris, France", "3m", "Metric")]
+
+    csv_file.write_text("city,country,duration\nParis,France,\n")
+    with pytest.raises(ValueError):
+        read_jobs(csv_file)
+
+
+def test_jobs_of_a_location_share_fetches(tmp_path, monkeypatch):
+    import archive_store
+    import data_processing
+    import http_cache
+
+    fetches = []
+
+    def recording_fetch_json(url, params):
+        fetches.append(url)
+        return fake_fetch_json(url, params)
+
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(archive_store, "_store", False)
+    monkeypatch.setattr(data_processing, "fetch_json", recording_fetch_json)
+
+    def resolve(city):
+        if city == "Nowhere":
+            raise ValueError("City not found: Nowhere")
+        return {"London": place("London", "United Kingdom", 51.5, -0.12),
+                "Paris": place("Paris", "France", 48.86, 2.35)}[city]
+
+    monkeypatch.setattr(batch_render, "resolve_place", resolve)
+    jobs = [("London", "5hr"), ("London", "1m"), ("London", "nxt_3d", "Imperial"), ("London", "3m"),
+            ("Paris", "24hr"), ("Nowhere", "5hr"), ("Paris", "1y")]
+
+    report = render_batch(jobs, tmp_path, workers=0, charts=False, stats=True)
+
+    # London: one hourly and one 90 day daily payload (for both unit systems),
+    # Paris: one hourly payload
+    assert len(fetches) == report.fetches == 3
+    assert report.locations == 2
+    # an invalid row fails alone, the other jobs are rendered
+    assert [result.error is None for result in report.results] == [True] * 5 + [False] * 2
+    assert not list(tmp_path.iterdir())
+
+    table = report.stats_table()
+    assert list(table.columns) == ["city", "place", "duration", "unit_sys", "variable", "unit",
+                                   "min", "max", "avg"]
+    assert set(table["place"]) == {"London, United Kingdom", "Paris, France"}
+    assert report.results[0].place.country == "United Kingdom" and report.results[-1].place is None
+    assert set(table["duration"]) == {"5hr", "1m", "nxt_3d", "3m", "24hr"}
+    assert (table["max"] == 10.0).all()
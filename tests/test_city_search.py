@@ -0,0 +1,53 @@
+import pytest
+from city_search import fold, get_city_search_index, search_cities, suggest_cities
+
+
+def test_fold_removes_accents_and_punctuation():
+    """Test that names are folded to plain lower case words."""
+    assert fold("  Zürich ") == "zurich"
+    assert fold("Saint-Denis") == "saint denis"
+    assert fold("São Paulo") == "sao paulo"
+
+
+def test_exact_match_ignores_accents():
+    """Test that an unaccented query finds the accented city first."""
+    match = search_cities("Sao Paulo", "Brazil")[0]
+
+    assert match.place.city == "São Paulo"
+    assert match.kind == "exact"
+
+
+@pytest.mark.parametrize("query, country, expected", [
+    ("Athnes", "Greece", "Athens"),
+    ("Lodon", "UK", "London"),
+    ("Mumbay", None, "Mumbai"),
+])
+def test_fuzzy_match_typos(query, country, expected):
+    """Test that misspelt city (and country) names still find the city."""
+    match = search_cities(query, country)[0]
+
+    assert match.place.city_ascii == expected
+    assert match.kind == "fuzzy"
+
+
+def test_country_restricts_candidates():
+    """Test that the country (even misspelt) disambiguates the same city name."""
+    matches = search_cities("Kota", "Japn")
+
+    assert matches
+    assert all(m.place.country == "Japan" for m in matches)
+
+
+def test_suggest_prefix_in_csv_order():
+    """Test that completions are prefix matches, most populous (first in CSV) first."""
+    matches = suggest_cities("athe", limit=5)
+    rows = [m.place.row for m in matches]
+
+    assert all(m.kind == "prefix" for m in matches)
+    assert all(m.place.city_ascii.lower().startswith("athe") for m in matches)
+    assert rows == sorted(rows)
+
+
+def test_unknown_query():
+    """Test that nothing similar returns an empty list."""
+    assert get_city_search_index().search("qqqqqq") == []
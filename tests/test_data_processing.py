@@ -5,11 +5,25 @@
 
 # importing the module
 import pytest
-from data_processing import fetch_hourly_metric_data
+import requests
+import data_processing
+from data_processing import (
+    FORECAST_URL,
+    daily_data_table_batch,
+    data_in_table_batch,
+    fetch_archive_chunks,
+    fetch_hourly_metric_data,
+    fetch_hourly_metric_data_batch,
+    fetch_json,
+    plan_coord_chunks,
+    plan_date_chunks,
+)
+from http_cache import ResponseCache
 
 
 
 from pathlib import Path
+from datetime import date, timedelta
 import json
 
 
@@ -131,3 +145,173 @@ def test_daily_data_units():
 
 
 
+
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+
+class FakeSession:
+    """Session that answers from a list of responses and records the calls."""
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url, params, timeout))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def no_network(monkeypatch, tmp_path):
+    """Fixture that routes fetch_json to a fake session and an empty cache."""
+    cache = ResponseCache(tmp_path / "cache.sqlite3")
+    monkeypatch.setattr(data_processing, "get_cache", lambda: cache)
+
+    def install(*responses):
+        session = FakeSession(*responses)
+        monkeypatch.setattr(data_processing, "get_session", lambda: session)
+        return session
+
+    yield install
+    cache.close()
+
+
+def test_fetch_json_uses_cache(no_network):
+    """Test that a repeated request (params in any order) is answered from the cache."""
+    data = load_hourly_json()
+    session = no_network(FakeResponse(200, data))
+    url = "https://api.open-meteo.com/v1/forecast"
+
+    assert fetch_json(url, {"latitude": 1, "longitude": 2}) == data
+    assert fetch_json(url, {"longitude": 2, "latitude": 1}) == data
+    assert len(session.calls) == 1
+    assert session.calls[0][2] is not None  # a timeout is always set
+
+
+def test_fetch_json_raises_on_error(no_network):
+    """Test that an HTTP error is raised and not cached."""
+    no_network(FakeResponse(400, {"error": True, "reason": "bad"}), FakeResponse(200, {}))
+    url = "https://archive-api.open-meteo.com/v1/archive"
+
+    with pytest.raises(requests.HTTPError):
+        fetch_json(url, {"latitude": 1})
+    # errors are not cached
+    assert fetch_json(url, {"latitude": 1}) == {}
+
+
+def test_plan_coord_chunks():
+    """Test that locations are split into requests under the URL and location limits."""
+    coords = [(51.5072 + n / 1000, -0.1275) for n in range(50)]
+
+    chunks = plan_coord_chunks(coords, FORECAST_URL, {"hourly": "x"}, max_url_length=500)
+
+    assert [pos for chunk in chunks for pos in chunk] == list(range(50))
+    assert len(chunks) > 1
+    assert len(plan_coord_chunks(coords, FORECAST_URL, {}, max_locations=20)) == 3
+
+
+def test_fetch_hourly_metric_data_batch(no_network, monkeypatch):
+    """Test that many locations are fetched in few requests, results in input order."""
+    data = load_hourly_json()
+    session = no_network(FakeResponse(200, [data, data]), FakeResponse(200, data))
+    coords = [(51.5, -0.12), (48.85, 2.35), (37.98, 23.72)]
+    monkeypatch.setattr(data_processing, "MAX_LOCATIONS_PER_REQUEST", 2)
+
+    results = fetch_hourly_metric_data_batch(coords)
+
+    assert results == [data, data, data]
+    assert len(session.calls) == 2
+    assert session.calls[0][1]["latitude"] == "51.5,48.85"
+
+
+def test_data_in_table_batch():
+    """Test that the tables of several locations are stacked with a location column."""
+    data = load_hourly_json()
+
+    df = data_in_table_batch([data, data], locations=["London", "Paris"])
+
+    assert list(df.columns[:2]) == ["location", "time"]
+    assert len(df) == 2 * len(data["hourly"]["time"])
+    assert set(df["location"]) == {"London", "Paris"}
+
+
+def test_data_in_table_batch_of_no_locations():
+    """Test that an empty list gives an empty table with the usual columns."""
+    df = data_in_table_batch([])
+
+    assert df.empty
+    assert list(df.columns) == ["location", *data_in_table(load_hourly_json()).columns]
+    assert list(daily_data_table_batch([]).columns) == ["location", *daily_data_table(load_daily_json()).columns]
+
+
+def test_plan_date_chunks():
+    """Test that a date range is cut into aligned, contiguous chunks."""
+    chunks = plan_date_chunks(date(2020, 1, 1), date(2023, 12, 31), 366)
+
+    assert chunks[0][0] == date(2020, 1, 1)
+    assert chunks[-1][1] == date(2023, 12, 31)
+    assert all(end - start < timedelta(days=366) for start, end in chunks)
+    assert all(nxt[0] == end + timedelta(days=1) for (_, end), nxt in zip(chunks, chunks[1:]))
+    # aligned: a range starting later shares the inner chunks
+    assert plan_date_chunks(date(2021, 6, 1), date(2023, 12, 31), 366)[1:] == chunks[-2:]
+    assert plan_date_chunks(date(2020, 1, 2), date(2020, 1, 1), 366) == []
+
+
+def test_fetch_archive_chunks_retries_and_stitches(monkeypatch):
+    """Test that a failed chunk is retried alone and the chunks are joined without duplicate days."""
+    calls = []
+
+    def fake_fetch_json(url, params):
+        calls.append(params["start_date"])
+        start = date.fromisoformat(params["start_date"])
+        end = date.fromisoformat(params["end_date"])
+        if start.year == 2021 and calls.count(params["start_date"]) == 1:
+            raise requests.ConnectionError("connection reset")
+        # every chunk also returns the day after its end, like an overlapping boundary
+        days = [start + timedelta(days=n) for n in range((end - start).days + 2)]
+        return {
+            "timezone": "GMT",
+            "daily": {
+                "time": [day.isoformat() for day in days],
+                "precipitation_sum": [None if day.day == 1 else float(day.day) for day in days],
+            },
+        }
+
+    monkeypatch.setattr(data_processing, "fetch_json", fake_fetch_json)
+    monkeypatch.setattr(data_processing, "CHUNK_RETRY_DELAY", 0)
+
+    data = fetch_archive_chunks(1.0, 2.0, date(2020, 3, 1), date(2022, 3, 1), "daily")
+
+    times = data["daily"]["time"]
+    assert times[0] == "2020-03-01"
+    assert times == sorted(set(times))
+    assert len(times) == (date(2022, 3, 2) - date(2020, 3, 1)).days + 1
+    assert len(data["daily"]["precipitation_sum"]) == len(times)
+    # only the failed chunk was fetched again
+    assert len(calls) == len(set(calls)) + 1
+
+
+def test_fetch_archive_chunks_does_not_retry_client_errors(monkeypatch):
+    """Test that a 4xx error is raised at once, without retries."""
+    calls = []
+
+    def fake_fetch_json(url, params):
+        calls.append(params)
+        raise requests.HTTPError("400 error", response=FakeResponse(400, {"error": True}))
+
+    monkeypatch.setattr(data_processing, "fetch_json", fake_fetch_json)
+
+    with pytest.raises(requests.HTTPError):
+        fetch_archive_chunks(1.0, 2.0, date(2020, 1, 1), date(2020, 1, 31), "hourly")
+    assert len(calls) == 1
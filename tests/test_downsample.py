@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+from downsample import downsample
+
+
+def hourly_table(n):
+    rng = np.random.default_rng(3)
+    return pd.DataFrame({
+        "time": pd.date_range("2026-01-01", periods=n, freq="h"),
+        "temperature_2m": rng.normal(10, 5, n),
+        "precipitation": np.zeros(n),
+    })
+
+
+def test_short_tables_are_not_downsampled():
+    df = hourly_table(200)
+
+    assert downsample(df) is df
+    assert downsample(df, threshold=100, buckets=150) is df
+
+
+def test_peaks_are_kept():
+    df = hourly_table(5000)
+    df.loc[1234, "precipitation"] = 12.5
+    df.loc[77, "temperature_2m"] = np.nan
+
+    out = downsample(df, threshold=1000, buckets=250)
+
+    assert len(out) == 500 and list(out.columns) == list(df.columns)
+    assert out["precipitation"].max() == 12.5
+    assert out["temperature_2m"].max() == df["temperature_2m"].max()
+    assert out["temperature_2m"].min() == df["temperature_2m"].min()
+    assert out["time"].is_monotonic_increasing
+    assert out["time"].iloc[0] == df["time"].iloc[0] and out["time"].iloc[-1] == df["time"].iloc[-1]
+
+
+def test_extremes_keep_their_order():
+    # a rising then a falling bucket
+    times = np.arange(8)
+    values = np.array([1.0, 3.0, 2.0, 4.0, 9.0, 5.0, 8.0, 0.0])
+    df = pd.DataFrame({"time": times, "value": values})
+
+    out = downsample(df, threshold=4, buckets=2)
+
+    assert out["value"].tolist() == [1.0, 4.0, 9.0, 0.0]
+    assert out["time"].tolist() == [0, 3, 4, 7]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from figure_templates import DailyTemplate, HourlyTemplate, get_template
+
+HOURLY = ["temperature_2m", "relative_humidity_2m", "precipitation", "cloud_cover",
+          "surface_pressure", "wind_speed_10m", "wind_direction_10m"]
+
+
+def hourly_frame(hours, value):
+    data = {"time": pd.date_range("2026-06-01", periods=hours, freq="h")}
+    data.update({name: np.full(hours, value) for name in HOURLY})
+    return pd.DataFrame(data)
+
+
+def test_hourly_template_is_reused():
+    template = HourlyTemplate()
+    names = {name: name for name in HOURLY}
+    units = {name: "x" for name in HOURLY}
+    axes = template.fig.get_axes()
+
+    first = template.render(hourly_frame(24, 1.0), names, units, "first", "stats")
+    second = template.render(hourly_frame(48, 5.0), names, units, "second", "stats")
+
+    assert first is second and second.get_axes() == axes
+    assert len(template.temperature.get_xdata()) == 48
+    assert template.ax1.get_ylim()[1] >= 5.0
+    assert template.suptitle.get_text() == "second"
+    assert len(template.legends) == 5
+
+
+def test_get_template_builds_once():
+    assert get_template("daily") is get_template("daily")
+    assert isinstance(get_template("daily"), DailyTemplate)
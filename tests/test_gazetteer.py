@@ -0,0 +1,51 @@
+import pytest
+from gazetteer import get_gazetteer, Place
+
+
+@pytest.fixture
+def gazetteer():
+    """Fixture to provide the process wide gazetteer."""
+    yield get_gazetteer()
+
+
+def test_gazetteer_loaded_once(gazetteer):
+    """Test that the CSV is only parsed once per process."""
+    assert get_gazetteer() is gazetteer
+    assert len(gazetteer) > 40000
+
+
+def test_lookup_is_case_insensitive(gazetteer):
+    """Test that city and country are matched ignoring case and outer spaces."""
+    place = gazetteer.lookup("  athens ", "GREECE")
+
+    assert isinstance(place, Place)
+    assert place.city_ascii == "Athens"
+    assert place.coords == (place.lat, place.lng)
+
+
+def test_lookup_picks_first_duplicate(gazetteer):
+    """Test that a city listed twice for a country resolves to the first row."""
+    place = gazetteer.lookup("Jaipur", "India")
+
+    assert place.coords == (26.9, 75.8)
+
+
+def test_lookup_same_city_other_country(gazetteer):
+    """Test that the country disambiguates cities with the same name."""
+    assert gazetteer.coords("Kota", "India") != gazetteer.coords("Kota", "Japan")
+
+
+def test_lookup_city_without_country(gazetteer):
+    """Test that a name alone gives one Place per country listing it."""
+    places = gazetteer.lookup_city("kota")
+
+    assert [place.country for place in places][:2] == ["India", "Japan"]
+    assert len({place.country for place in places}) == len(places)
+    assert [place.country for place in gazetteer.lookup_city("Jaipur")] == ["India"]
+    assert gazetteer.lookup_city("Atlantis") == []
+
+
+def test_lookup_unknown_city(gazetteer):
+    """Test that an unknown city returns None / an empty tuple."""
+    assert gazetteer.lookup("Atlantis", "Greece") is None
+    assert gazetteer.coords("Atlantis", "Greece") == ()
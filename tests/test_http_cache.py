@@ -0,0 +1,115 @@
+import pytest
+import json
+from datetime import date, datetime
+from http_cache import ResponseCache, cache_key, ttl_for
+
+FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
+ARCHIVE_URL = "https://archive-api.open-meteo.com/v1/archive"
+
+
+class FakeClock:
+    """Clock that only moves when told to."""
+    def __init__(self, now=1_800_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    yield FakeClock()
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    """Fixture to provide an empty cache in a temporary directory."""
+    cache = ResponseCache(tmp_path / "cache.sqlite3", clock=clock)
+    yield cache
+    cache.close()
+
+
+def body(**data):
+    return json.dumps(data).encode()
+
+
+def test_cache_key_is_canonical():
+    """Test that param order and list vs comma separated values give the same key."""
+    a = cache_key(FORECAST_URL, {"latitude": 1.5, "hourly": ["a", "b"], "longitude": 2})
+    b = cache_key("HTTPS://API.open-meteo.com/v1/forecast/", {"longitude": 2, "latitude": 1.5, "hourly": "a,b"})
+
+    assert a == b
+    assert a != cache_key(FORECAST_URL, {"latitude": 1.5, "hourly": "a,b", "longitude": 3})
+
+
+def test_memory_then_disk_hits(tmp_path, cache, clock):
+    """Test that entries are served from memory, and from disk after a restart."""
+    params = {"latitude": 1, "longitude": 2}
+    assert cache.get(FORECAST_URL, params) is None
+
+    cache.put(FORECAST_URL, params, body(x=1))
+    assert cache.get(FORECAST_URL, params) == {"x": 1}
+
+    reopened = ResponseCache(tmp_path / "cache.sqlite3", clock=clock)
+    assert reopened.get(FORECAST_URL, params) == {"x": 1}
+    assert reopened.get(FORECAST_URL, params) == {"x": 1}
+    reopened.close()
+
+    assert cache.stats.as_dict()["misses"] == 1
+    assert cache.stats.memory_hits == 1
+    assert reopened.stats.disk_hits == 1
+    assert reopened.stats.memory_hits == 1
+
+
+def test_hits_are_copies(cache):
+    """Test that changing a cached response, or the data that was stored, changes no other hit."""
+    params = {"latitude": 1, "longitude": 2}
+    stored = {"hourly": {"time": [1, 2]}}
+    cache.put(FORECAST_URL, params, body(hourly={"time": [1, 2]}), stored)
+    stored["hourly"]["time"].append(3)
+
+    first = cache.get(FORECAST_URL, params)
+    first["hourly"]["time"].clear()
+    assert cache.get(FORECAST_URL, params) == {"hourly": {"time": [1, 2]}}
+    assert cache.stats.memory_hits == 2
+
+
+def test_forecast_expires_at_next_update(cache, clock):
+    """Test that forecast entries expire at the next hourly model update."""
+    params = {"latitude": 1, "longitude": 2}
+    cache.put(FORECAST_URL, params, body(x=1))
+
+    clock.now += ttl_for(FORECAST_URL, params, clock.now) - 1
+    assert cache.get(FORECAST_URL, params) == {"x": 1}
+    clock.now += 1
+    assert cache.get(FORECAST_URL, params) is None
+    assert cache.stats.expired == 1
+
+
+def test_archive_ttl():
+    """Test that settled archive ranges never expire and recent ones do."""
+    now = datetime(2026, 6, 30, 12).timestamp()
+    old = {"start_date": "2026-01-01", "end_date": "2026-05-31"}
+    recent = {"start_date": "2026-06-01", "end_date": str(date(2026, 6, 29))}
+
+    assert ttl_for(ARCHIVE_URL, old, now) is None
+    assert ttl_for(ARCHIVE_URL, recent, now) > 0
+
+
+def test_size_based_eviction(tmp_path, clock):
+    """Test that the least recently used entries are evicted beyond max_bytes."""
+    cache = ResponseCache(tmp_path / "small.sqlite3", max_bytes=350, clock=clock)
+    for n in range(3):
+        clock.now += 1
+        cache.put(ARCHIVE_URL, {"n": n}, body(pad="x" * 90), ttl=None)
+    clock.now += 1
+    cache.get(ARCHIVE_URL, {"n": 0})  # touch the oldest one
+    clock.now += 1
+    cache.put(ARCHIVE_URL, {"n": 3}, body(pad="x" * 90), ttl=None)
+    cache._memory.clear()
+
+    assert cache.size_bytes() <= 350
+    assert cache.get(ARCHIVE_URL, {"n": 0}) is not None
+    assert cache.get(ARCHIVE_URL, {"n": 1}) is None
+    assert cache.stats.evictions == 1
+    cache.close()
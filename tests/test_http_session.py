@@ -0,0 +1,53 @@
+import pytest
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_session import build_session
+
+
+@pytest.fixture
+def flaky_server():
+    """Fixture to run a local server that fails twice with 503 before answering."""
+    statuses = [503, 503, 200]
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(self.headers.get("Connection"))
+            status = statuses.pop(0) if statuses else 200
+            body = b'{"ok": true}'
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", seen
+    server.shutdown()
+    server.server_close()
+
+
+def test_session_retries_server_errors(flaky_server):
+    """Test that 5xx responses are retried until the request succeeds."""
+    url, seen = flaky_server
+    session = build_session(backoff_factor=0, backoff_jitter=0)
+
+    response = session.get(url, timeout=5)
+
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert len(seen) == 3
+
+
+def test_session_gives_up(flaky_server):
+    """Test that the last error response is returned once retries run out."""
+    url, seen = flaky_server
+    session = build_session(retries=1, backoff_factor=0, backoff_jitter=0)
+
+    assert session.get(url, timeout=5).status_code == 503
+    assert len(seen) == 2
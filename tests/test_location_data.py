@@ -0,0 +1,111 @@
+import pytest
+
+import archive_store
+import data_processing
+import http_cache
+import location_data
+from location_data import LocationData
+from tests.test_batch_render import fake_fetch_json
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Fixture recording the requests, answered with fake data and without caches."""
+    requests = []
+
+    def fetch_json(url, params):
+        requests.append((url, params["start_date"], params["end_date"]))
+        return fake_fetch_json(url, params)
+
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(archive_store, "_store", False)
+    monkeypatch.setattr(data_processing, "fetch_json", fetch_json)
+    return requests
+
+
+def test_durations_and_units_share_the_hourly_payload(fetches):
+    data = LocationData((51.5, -0.12))
+
+    analysis = data.load("5hr").analysis
+    assert data.load("pst_4d").analysis is analysis
+    table, stats = data.window("nxt_3d")
+    imperial = data.load("24hr", "Imperial")
+
+    assert len(fetches) == data.fetches == 1
+    assert imperial.units["temperature_2m"] == "x"
+    assert list(stats.index) == ["min", "max", "avg"] and len(table)
+
+
+def test_longest_daily_range_serves_shorter_ones(fetches):
+    data = LocationData((51.5, -0.12))
+    data.prefetch(["1m", "3m", "5hr"])
+
+    one_month, stats = data.window("1m")
+    three_months, _ = data.window("3m", "Imperial")
+
+    assert len(fetches) == 2
+    assert len(one_month) == 30 and len(three_months) == 90
+    assert one_month["time"].iloc[-1] == three_months["time"].iloc[-1]
+    assert stats.loc["max", "precipitation_sum"] == 10.0
+
+
+def test_old_hourly_payload_is_fetched_again(fetches):
+    now = [0.0]
+    data = LocationData((51.5, -0.12), clock=lambda: now[0])
+
+    data.load("5hr")
+    now[0] = location_data.HOURLY_MAX_AGE - 1
+    data.load("5hr")
+    assert data.fetches == 1
+
+    now[0] = location_data.HOURLY_MAX_AGE + 1
+    data.load("5hr")
+    assert data.fetches == 2
+
+
+def test_session_reuses_location_data(fetches, monkeypatch):
+    import weather_main
+    import visuals
+
+    plotted = []
+
+    def fake_visuals(coords, duration, unit_sys, output=None, data=None):
+        plotted.append((duration, unit_sys))
+        data.load(duration, unit_sys)
+
+    answers = iter(["d", "5", "u", "2", "x", "q"])
+    monkeypatch.setattr(visuals, "Visuals", fake_visuals)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    session = weather_main.Session()
+    monkeypatch.setattr(session, "user_inputs", lambda: ((51.5, -0.12), "5hr", "Metric"))
+
+    session.run()
+
+    assert plotted == [("5hr", "Metric"), ("1m", "Metric"), ("1m", "Imperial")]
+    assert len(fetches) == 2  # hourly, then daily
+    assert list(session.locations) == [(51.5, -0.12)]
+
+
+def test_session_survives_a_failed_plot(fetches, monkeypatch, capsys):
+    import weather_main
+    import visuals
+
+    plotted = []
+
+    def fake_visuals(coords, duration, unit_sys, output=None, data=None):
+        if duration == "1m":
+            raise ConnectionError("network down")
+        plotted.append((duration, unit_sys))
+        data.load(duration, unit_sys)
+
+    answers = iter(["d", "5", "d", "1", "q"])
+    monkeypatch.setattr(visuals, "Visuals", fake_visuals)
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    session = weather_main.Session()
+    monkeypatch.setattr(session, "user_inputs", lambda: ((51.5, -0.12), "5hr", "Metric"))
+
+    session.run()
+
+    assert "Could not plot: ConnectionError: network down" in capsys.readouterr().out
+    assert plotted == [("5hr", "Metric"), ("5hr", "Metric")]
+    assert len(fetches) == 1  # the hourly data stayed in memory
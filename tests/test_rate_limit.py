@@ -0,0 +1,257 @@
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import data_processing
+import http_cache
+import http_session
+import rate_limit
+from rate_limit import RateLimiter, Tier, parse_limits, retry_after_seconds
+
+
+class FakeClock:
+    """Clock whose sleep() only moves the time forward."""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def limiter_of(*tiers):
+    clock = FakeClock()
+    return RateLimiter([Tier(*tier, clock=clock) for tier in tiers], clock=clock, sleep=clock.sleep), clock
+
+
+def calls_in_windows(times, period):
+    """Most calls made in any window of `period` seconds."""
+    return max(sum(1 for other in times if start <= other < start + period) for start in times)
+
+
+def test_parse_limits():
+    assert parse_limits("600/minute, 5000/hour,10000/day") == [
+        ("minute", 600, 60), ("hour", 5000, 3600), ("day", 10000, 86400)]
+    assert parse_limits("10/30") == [("30s", 10, 30.0)]
+    with pytest.raises(ValueError):
+        parse_limits("600")
+
+
+def test_burst_then_steady_rate():
+    limiter, clock = limiter_of(("minute", 60, 60, 10))
+
+    times = []
+    for _ in range(30):
+        limiter.acquire()
+        times.append(clock.now)
+
+    # the burst goes through at once, then (60 - 10) calls per minute
+    assert times[:10] == [0.0] * 10
+    assert times[-1] == pytest.approx(20 * 60 / 50)
+    assert limiter.stats.acquired == 30
+    assert limiter.stats.waited == pytest.approx(times[-1])
+
+
+def test_no_window_goes_over_any_tier():
+    limiter, clock = limiter_of(("minute", 20, 60), ("hour", 100, 3600))
+
+    times = []
+    for _ in range(300):
+        limiter.acquire()
+        times.append(clock.now)
+
+    assert calls_in_windows(times, 60) <= 20
+    assert calls_in_windows(times, 3600) <= 100
+    # the hour tier ends up setting the pace
+    assert times[-1] - times[-2] == pytest.approx(3600 / limiter.tiers[1].limit / (1 - 0.5), rel=0.01)
+
+
+def test_throttled_pauses_and_slows_down():
+    limiter, clock = limiter_of(("minute", 60, 60, 1))
+    limiter.acquire()
+
+    assert limiter.throttled(retry_after=30) == 30
+    assert limiter.stats.factor == 0.5
+    limiter.acquire()
+    assert clock.now == pytest.approx(30 + 60 / 59 / 0.5)
+
+    # without Retry-After the pause doubles on each 429 in a row
+    assert limiter.throttled() == rate_limit.BACKOFF * 2
+    limiter.success()
+    assert limiter.throttled() == rate_limit.BACKOFF
+    assert limiter.throttled() == rate_limit.BACKOFF * 2
+    assert limiter.stats.throttled == 4
+    assert limiter.stats.factor == pytest.approx((0.25 + rate_limit.RECOVERY_STEP) / 4)
+
+
+def test_successes_restore_the_rate():
+    limiter, _ = limiter_of(("minute", 60, 60))
+    for _ in range(20):
+        limiter.throttled(0)
+    assert limiter.stats.factor == rate_limit.MIN_FACTOR
+
+    for _ in range(int(1 / rate_limit.RECOVERY_STEP) + 1):
+        limiter.success()
+    assert limiter.stats.factor == 1.0
+    # the backoff starts over after a success
+    assert limiter.throttled() == rate_limit.BACKOFF
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("12") == 12
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("soon") is None
+    assert retry_after_seconds(formatdate(1000.0, usegmt=True), now=990.0) == 10
+
+
+def test_threads_share_the_budget():
+    limiter = RateLimiter([("second", 20, 1)])
+    started = time.monotonic()
+
+    def worker():
+        for _ in range(5):
+            limiter.acquire()
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 40 calls: a burst of 2, then 18 per second
+    assert limiter.stats.acquired == 40
+    assert time.monotonic() - started == pytest.approx(38 / 18, abs=0.3)
+
+
+def test_get_limiter_from_environment(monkeypatch):
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+    monkeypatch.setenv("WEATHER_RATE_LIMITS", "100/minute,1000/day")
+    assert [(tier.name, tier.limit) for tier in rate_limit.get_limiter().tiers] == [("minute", 100), ("day", 1000)]
+
+    monkeypatch.setattr(rate_limit, "_limiter", None)
+    monkeypatch.setenv("WEATHER_RATE_LIMITS", "off")
+    assert rate_limit.get_limiter() is None
+
+
+@pytest.fixture
+def throttling_server():
+    """Fixture to run a local server that answers 429 twice before the data."""
+    statuses = [429, 429, 200]
+    seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = statuses.pop(0) if statuses else 200
+            seen.append(status)
+            body = b'{"ok": true}'
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "0")
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/", seen, statuses
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_json_slows_down_on_429(monkeypatch, throttling_server):
+    url, seen, statuses = throttling_server
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(http_session, "_session", http_session.build_session(backoff_factor=0))
+    limiter = RateLimiter([("second", 1000, 1)])
+    monkeypatch.setattr(rate_limit, "_limiter", limiter)
+
+    assert data_processing.download_json(url, {"latitude": 1}) == {"ok": True}
+    assert seen == [429, 429, 200]
+    assert limiter.stats.throttled == 2 and limiter.stats.acquired == 3
+    assert limiter.stats.factor == 0.25 + rate_limit.RECOVERY_STEP
+
+    # a 429 that persists is raised once the retries run out
+    statuses.extend([429] * (data_processing.RATE_LIMIT_RETRIES + 1))
+    with pytest.raises(requests.HTTPError):
+        data_processing.download_json(url, {"latitude": 2})
+
+
+def test_download_json_retries_429_without_limiter(monkeypatch, throttling_server):
+    url, seen, statuses = throttling_server
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(http_session, "_session", http_session.build_session(backoff_factor=0))
+    monkeypatch.setattr(rate_limit, "_limiter", False)  # WEATHER_RATE_LIMITS=off
+
+    assert data_processing.download_json(url, {"latitude": 1}) == {"ok": True}
+    assert seen == [429, 429, 200]
+
+    statuses.extend([429] * (data_processing.RATE_LIMIT_RETRIES + 1))
+    with pytest.raises(requests.HTTPError):
+        data_processing.download_json(url, {"latitude": 2})
+    assert len(seen) == 3 + data_processing.RATE_LIMIT_RETRIES + 1
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def use_logged_requests(log_path):
+    """
+    Worker initializer: answers download_json (which takes the rate limiter's
+    tokens) with fake data, logging the pid, time and rate limit of each request.
+    """
+    import json
+    import os
+
+    import archive_store
+    from tests.test_batch_render import fake_fetch_json
+
+    http_cache.set_cache(None)
+    archive_store.set_store(None)
+
+    class Session:
+        def get(self, url, params=None, timeout=None):
+            with open(log_path, "a") as log:
+                log.write(f"{os.getpid()} {time.time()} {rate_limit.get_limiter().tiers[0].limit}\n")
+            payload = fake_fetch_json(url, params)
+            block = "hourly" if "hourly" in payload else "daily"
+            payload[block] = {name: list(map(float, values)) for name, values in payload[block].items()}
+            return FakeResponse(json.dumps(payload).encode())
+
+    data_processing.get_session = Session
+
+
+def test_batch_workers_share_the_budget(tmp_path, monkeypatch):
+    from batch_render import render_batch
+
+    monkeypatch.setattr(rate_limit, "_limiter", RateLimiter([("second", 8, 1)]))
+    log_path = tmp_path / "requests.log"
+    jobs = [((float(lat), 2.0), "5hr") for lat in range(16)]
+
+    report = render_batch(jobs, tmp_path, workers=2, charts=False,
+                          initializer=use_logged_requests, initargs=(str(log_path),))
+
+    assert not report.failed, report.failed
+    requests = [line.split() for line in log_path.read_text().splitlines()]
+    assert len(requests) == report.fetches == 16
+    # each worker has half of the budget, and together they stay within it
+    assert {limit for _, _, limit in requests} == {"4"}
+    assert calls_in_windows(sorted(float(sent) for _, sent, _ in requests), 1) <= 8
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import data_processing
+import http_cache
+from single_flight import SingleFlight
+
+
+def slow_counter(delay=0.1):
+    """Function that sleeps and returns a new object per run, with its run count."""
+    runs = []
+
+    def func(value):
+        runs.append(value)
+        time.sleep(delay)
+        return {"value": value}
+
+    return func, runs
+
+
+def test_threads_share_one_call():
+    flights = SingleFlight()
+    func, runs = slow_counter()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: flights.do("key", func, 1), range(8)))
+
+    assert len(runs) == 1
+    assert all(result == results[0] for result in results)
+    assert len({id(result) for result in results}) == 8  # one object per caller
+    assert flights.stats.as_dict() == {"calls": 1, "coalesced": 7, "errors": 0}
+    assert flights.in_flight() == 0
+
+    # the key is free again once the call is done
+    flights.do("key", func, 2)
+    assert runs == [1, 2]
+
+
+def test_errors_are_shared():
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("upstream down")
+
+    def waiter():
+        started.wait()
+        return flights.do("key", failing)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flights.do, "key", failing)
+        waiters = [pool.submit(waiter) for _ in range(3)]
+        for future in [leader, *waiters]:
+            with pytest.raises(ValueError, match="upstream down"):
+                future.result()
+
+    assert flights.stats.as_dict() == {"calls": 1, "coalesced": 3, "errors": 1}
+
+
+def test_asyncio_tasks_share_one_call():
+    flights = SingleFlight()
+    runs = []
+
+    async def fetch(value):
+        runs.append(value)
+        await asyncio.sleep(0.05)
+        return [value]
+
+    async def main():
+        return await asyncio.gather(*(flights.do_async(("k", 1), fetch, 1) for _ in range(10)),
+                                    flights.do_async(("k", 2), fetch, 2))
+
+    results = asyncio.run(main())
+
+    assert runs == [1, 2]
+    assert all(result == [1] for result in results[:10]) and results[10] == [2]
+    assert flights.stats.coalesced == 9
+
+
+def test_asyncio_waits_for_a_thread_without_blocking():
+    flights = SingleFlight()
+    func, runs = slow_counter(0.2)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        thread_call = loop.run_in_executor(None, flights.do, "key", func, 1)
+        await asyncio.sleep(0.05)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while not thread_call.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        async def coalesced():
+            return await flights.do_async("key", None)
+
+        shared, _, threaded = await asyncio.gather(coalesced(), ticker(), thread_call)
+        return shared, threaded, ticks
+
+    shared, threaded, ticks = asyncio.run(main())
+
+    assert shared == threaded and len(runs) == 1
+    assert ticks > 5  # the loop kept running while waiting
+
+
+def test_waiters_do_not_share_mutable_results():
+    import numpy as np
+    import pandas as pd
+
+    flights = SingleFlight()
+    started = threading.Event()
+
+    def make_table():
+        started.set()
+        time.sleep(0.1)
+        return {"hourly": {"time": np.arange(3)}}, pd.DataFrame({"time": ["2024-01-01T00:00"] * 3})
+
+    def mutating_waiter():
+        started.wait()
+        payload, df = flights.do("key", make_table)
+        payload["hourly"]["time"] += 100
+        df["time"] = pd.to_datetime(df["time"])
+        return payload, df
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        leader = pool.submit(flights.do, "key", make_table)
+        waiter = pool.submit(mutating_waiter)
+        other = pool.submit(lambda: (started.wait(), flights.do("key", make_table))[1])
+        results = [leader.result(), waiter.result(), other.result()]
+
+    assert flights.stats.coalesced == 2
+    for payload, df in results[::2]:
+        assert payload["hourly"]["time"].tolist() == [0, 1, 2]
+        assert df["time"].tolist() == ["2024-01-01T00:00"] * 3
+    assert results[1][0]["hourly"]["time"].tolist() == [100, 101, 102]
+
+
+def test_fetch_json_coalesces_identical_requests(monkeypatch):
+    monkeypatch.setattr(http_cache, "_cache", False)
+    downloads = []
+
+    def download(url, params, cache=None):
+        downloads.append(params["latitude"])
+        time.sleep(0.1)
+        return {"latitude": params["latitude"]}
+
+    monkeypatch.setattr(data_processing, "download_json", download)
+    # the same request with the keys in another order, and another location
+    requests = [{"latitude": 1.0, "longitude": 2.0}, {"longitude": 2.0, "latitude": 1.0}] * 3
+    requests.append({"latitude": 5.0, "longitude": 2.0})
+
+    with ThreadPoolExecutor(max_workers=len(requests)) as pool:
+        results = list(pool.map(lambda params: data_processing.fetch_json("https://x/v1/forecast", params),
+                                requests))
+
+    assert sorted(downloads) == [1.0, 5.0]
+    assert [result["latitude"] for result in results] == [1.0] * 6 + [5.0]
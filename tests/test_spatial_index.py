@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from gazetteer import get_gazetteer
+from spatial_index import (
+    cities_in_bbox,
+    cities_within,
+    chord_to_km,
+    get_spatial_index,
+    nearest_cities,
+    unit_vectors,
+)
+
+
+def brute_force_km(lat, lng):
+    """Distance from (lat, lng) to every city, without the index."""
+    gaz = get_gazetteer()
+    xyz = unit_vectors(gaz.lat, gaz.lng)
+    return chord_to_km(np.linalg.norm(xyz - unit_vectors(lat, lng), axis=1))
+
+
+@pytest.mark.parametrize("lat, lng", [(37.98, 23.72), (-40.0, -120.0), (89.0, 0.0), (0.0, 179.9)])
+def test_nearest_matches_brute_force(lat, lng):
+    """Test that the k nearest cities are the same as a full scan, on land and at sea."""
+    rows, distances = get_spatial_index().nearest(lat, lng, k=7)
+
+    assert np.allclose(distances, np.sort(brute_force_km(lat, lng))[:7])
+    assert list(distances) == sorted(distances)
+
+
+def test_reverse_geocode():
+    """Test that raw coordinates resolve to the closest known city."""
+    athens = get_gazetteer().lookup("Athens", "Greece")
+    neighbour = nearest_cities(37.98, 23.72)[0]
+
+    assert neighbour.place == athens
+    assert neighbour.coords == athens.coords
+    assert neighbour.distance_km < 5
+
+
+def test_nearest_with_k_zero():
+    """Test that asking for no neighbours returns empty results instead of failing."""
+    rows, distances = get_spatial_index().nearest(37.98, 23.72, k=0)
+
+    assert len(rows) == 0 and len(distances) == 0
+    assert nearest_cities(37.98, 23.72, k=-1) == []
+
+
+def test_cities_within_radius():
+    """Test that the radius query returns exactly the cities inside the circle."""
+    distances = brute_force_km(48.85, 2.35)
+    found = cities_within(48.85, 2.35, 100)
+
+    assert {n.place.row for n in found} == set(np.nonzero(distances <= 100)[0])
+    assert all(n.distance_km <= 100 for n in found)
+
+
+def test_cities_in_bbox_across_antimeridian():
+    """Test that a bounding box with west > east wraps around the antimeridian."""
+    places = cities_in_bbox(50, 170, 75, -170)
+
+    assert places
+    assert all(50 <= p.lat <= 75 and (p.lng >= 170 or p.lng <= -170) for p in places)
@@ -0,0 +1,30 @@
+from pathlib import Path
+import subprocess
+import sys
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def modules_after_import(module):
+    """Modules loaded by importing module in a fresh interpreter."""
+    code = f"import sys, {module}; print(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return set(result.stdout.split())
+
+
+def test_prompts_do_not_load_heavy_modules():
+    loaded = modules_after_import("weather_main")
+
+    assert not loaded & {"numpy", "pandas", "matplotlib", "requests"}
+
+
+def test_fetching_does_not_load_pandas():
+    loaded = modules_after_import("data_processing")
+
+    assert "pandas" not in loaded and "matplotlib" not in loaded
+
+
+def test_headless_charts_do_not_load_pyplot():
+    loaded = modules_after_import("visuals")
+
+    assert "matplotlib" in loaded and "matplotlib.pyplot" not in loaded
@@ -0,0 +1,64 @@
+import pytest
+import copy
+import json
+import numpy as np
+from pathlib import Path
+from units import to_imperial
+from data_processing import data_in_table, hourly_data_units
+
+
+@pytest.fixture
+def hourly_metric():
+    """Fixture to load the sample hourly metric response."""
+    yield json.load(open(Path(__file__).parent / "mock_data" / "hourly_metric.json"))
+
+
+def test_to_imperial_values(hourly_metric):
+    """Test that temperature, wind speed and precipitation are converted."""
+    imperial = to_imperial(hourly_metric)
+    metric_hourly = hourly_metric["hourly"]
+
+    assert np.allclose(
+        imperial["hourly"]["temperature_2m"],
+        np.asarray(metric_hourly["temperature_2m"]) * 9 / 5 + 32,
+        atol=0.05,
+    )
+    assert np.allclose(
+        imperial["hourly"]["wind_speed_10m"],
+        np.asarray(metric_hourly["wind_speed_10m"]) / 1.609344,
+        atol=0.05,
+    )
+    assert np.allclose(
+        imperial["hourly"]["precipitation"],
+        np.asarray(metric_hourly["precipitation"]) / 25.4,
+        atol=0.0005,
+    )
+    # other columns are untouched
+    assert imperial["hourly"]["cloud_cover"] == metric_hourly["cloud_cover"]
+
+
+def test_to_imperial_units_metadata(hourly_metric):
+    """Test that the units metadata used for the axis labels is rewritten."""
+    units = hourly_data_units(to_imperial(hourly_metric))
+
+    assert units["temperature_2m"] == "°F"
+    assert units["wind_speed_10m"] == "mp/h"
+    assert units["precipitation"] == "inch"
+    assert units["surface_pressure"] == "hPa"
+
+
+def test_to_imperial_keeps_input(hourly_metric):
+    """Test that the (cached, shared) metric response is not modified."""
+    before = copy.deepcopy(hourly_metric)
+
+    df = data_in_table(to_imperial(hourly_metric))
+
+    assert hourly_metric == before
+    assert len(df) == len(before["hourly"]["time"])
+
+
+def test_to_imperial_missing_values(hourly_metric):
+    """Test that missing (null) values become NaN."""
+    hourly_metric["hourly"]["temperature_2m"][0] = None
+
+    assert np.isnan(to_imperial(hourly_metric)["hourly"]["temperature_2m"][0])
@@ -0,0 +1,183 @@
+import asyncio
+import json
+
+import pytest
+
+import archive_store
+import data_processing
+import http_cache
+from tests.test_batch_render import fake_fetch_json
+from weather_server import LRUCache, WeatherService
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Fixture answering requests with fake data, without caches, and recording them."""
+    requests = []
+
+    def fetch_json(url, params):
+        requests.append(url)
+        return fake_fetch_json(url, params)
+
+    monkeypatch.setattr(http_cache, "_cache", False)
+    monkeypatch.setattr(archive_store, "_store", False)
+    monkeypatch.setattr(data_processing, "fetch_json", fetch_json)
+    return requests
+
+
+async def get(port, *targets):
+    """GETs the targets over one keep-alive connection: list of (status, headers, body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    responses = []
+    for target in targets:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: test\r\n\r\n".encode())
+        await writer.drain()
+        head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in head[1:] if line)
+        body = await reader.readexactly(int(headers["Content-Length"]))
+        responses.append((int(head[0].split()[1]), headers, body))
+    writer.close()
+    return responses
+
+
+def serve_and_get(*targets, render_workers=0):
+    async def main():
+        service = WeatherService(render_workers=render_workers)
+        server = await service.start("127.0.0.1", 0)
+        try:
+            return service, await get(server.sockets[0].getsockname()[1], *targets)
+        finally:
+            server.close()
+            service.close()
+
+    return asyncio.run(main())
+
+
+def test_lru_cache_expires_and_evicts():
+    now = [0.0]
+    cache = LRUCache(2, ttl=10, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.as_dict() == {"items": 2, "hits": 2, "misses": 2}
+
+
+def test_stats_and_tables_share_one_fetch(fetches):
+    service, responses = serve_and_get(
+        "/stats?lat=51.5&lng=-0.12&duration=5hr",
+        "/stats?lat=51.5&lng=-0.12&duration=nxt_3d&unit=imperial",
+        "/hourly?lat=51.5&lng=-0.12&duration=pst_4d&format=csv",
+        "/stats?lat=51.5&lng=-0.12&duration=5hr",
+    )
+
+    assert [status for status, _, _ in responses] == [200] * 4
+    stats = json.loads(responses[0][2])
+    assert stats["stats"]["temperature_2m"] == {"unit": "x", "min": 10.0, "max": 10.0, "avg": 10.0}
+    assert json.loads(responses[1][2])["unit"] == "Imperial"
+    assert responses[2][1]["Content-Type"].startswith("text/csv")
+    assert responses[2][2].startswith(b"time,temperature_2m")
+    assert responses[3][2] == responses[0][2]
+    assert len(fetches) == 1
+    assert service.responses.hits == 1
+
+
+def test_daily_table_and_chart(fetches):
+    service, responses = serve_and_get(
+        "/daily?lat=51.5&lng=-0.12&days=7",
+        "/chart.png?lat=51.5&lng=-0.12&duration=1m",
+        "/chart.png?lat=51.5&lng=-0.12&duration=1m",
+    )
+
+    (status, _, body), (chart_status, headers, png), (_, _, again) = responses
+    table = json.loads(body)
+    assert status == 200 and len(table["data"]) == 7 and table["columns"][0] == "time"
+    assert chart_status == 200 and headers["Content-Type"] == "image/png"
+    assert png.startswith(b"\x89PNG") and again == png
+    assert service.charts.as_dict() == {"items": 1, "hits": 1, "misses": 1}
+
+
+def test_charts_are_drawn_from_the_fetched_data(fetches):
+    service, responses = serve_and_get(
+        "/stats?lat=51.5&lng=-0.12&duration=1m",
+        "/chart.png?lat=51.5&lng=-0.12&duration=1m",
+        "/chart.png?lat=51.5&lng=-0.12&duration=5hr&unit=imperial",
+    )
+
+    assert [status for status, _, _ in responses] == [200] * 3
+    # one daily and one hourly payload, none fetched again for drawing
+    assert len(fetches) == 2
+
+
+def test_charts_are_drawn_in_a_worker_process(fetches):
+    service, responses = serve_and_get(
+        "/chart.png?lat=51.5&lng=-0.12&duration=5hr",
+        "/chart.png?lat=51.5&lng=-0.12&duration=1m&unit=imperial",
+        render_workers=1,
+    )
+
+    assert [status for status, _, _ in responses] == [200] * 2
+    assert all(png.startswith(b"\x89PNG") for _, _, png in responses)
+    # the worker does not have the fake data: only the server fetched
+    assert len(fetches) == 2
+
+
+def test_bad_requests():
+    _, responses = serve_and_get(
+        "/stats?lat=51.5&lng=-0.12&duration=1y",
+        "/stats?lat=abc&lng=1",
+        "/daily?lat=1&lng=1&days=200",
+        "/nothing",
+    )
+
+    assert [status for status, _, _ in responses] == [400, 400, 400, 404]
+    assert "duration must be one of" in json.loads(responses[0][2])["error"]
+
+
+def test_malformed_content_length():
+    async def main():
+        service = WeatherService(render_workers=0)
+        server = await service.start("127.0.0.1", 0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(b"GET /health HTTP/1.1\r\nHost: test\r\nContent-Length: ten\r\n\r\n")
+            response = await reader.read()  # until the server closes the connection
+            writer.close()
+            return response
+        finally:
+            server.close()
+            service.close()
+
+    response = asyncio.run(main())
+
+    assert response.startswith(b"HTTP/1.1 400 Bad Request\r\n")
+    assert b"Connection: close" in response and b"Invalid Content-Length" in response
+
+
+def test_coords_are_resolved_once():
+    service, responses = serve_and_get(
+        "/coords?city=Paris&country=France",
+        "/coords?city=paris&country=france",
+    )
+
+    (status, _, body), (_, _, again) = responses
+    coords = json.loads(body)
+    assert status == 200 and again == body
+    assert round(coords["lat"]) == 49 and round(coords["lng"]) == 2
+    assert service.coords.as_dict() == {"items": 1, "hits": 1, "misses": 1}
+
+
+def test_locations_are_evicted_with_their_locks(fetches, monkeypatch):
+    import weather_server
+
+    monkeypatch.setattr(weather_server, "LOCATION_ITEMS", 2)
+    service, responses = serve_and_get(*(f"/stats?lat={lat}&lng=1&duration=5hr" for lat in range(5)))
+
+    assert [status for status, _, _ in responses] == [200] * 5
+    assert len(service.locations) == 2
+    # the per-location locks are kept in the LRU entries, nowhere else
+    assert all(isinstance(lock, asyncio.Lock) for _, (_, lock) in service.locations._items.values())
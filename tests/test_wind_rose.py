@@ -0,0 +1,37 @@
+import numpy as np
+
+from wind_rose import SECTORS, SPEED_CLASSES, speed_edges, wind_rose
+
+
+def test_speed_edges_are_round():
+    assert speed_edges(22.0).tolist() == [0, 5, 10, 15, 20, 25, 30]
+    assert np.allclose(speed_edges(0.9), [0, 0.2, 0.4, 0.6, 0.8, 1.0, 1.2])
+    assert speed_edges(float("nan")).tolist() == list(range(SPEED_CLASSES + 1))
+
+
+def test_wind_rose_bins_by_sector_and_speed():
+    # from the north (and just either side of it), from the east, one missing sample
+    directions = [0.0, 350.0, 10.0, 90.0, np.nan]
+    speeds = [1.0, 6.0, 6.0, 29.0, 3.0]
+
+    rose = wind_rose(directions, speeds, toward=False)
+
+    assert rose.frequencies.shape == (SECTORS, SPEED_CLASSES)
+    assert rose.samples == 4
+    assert rose.frequencies.sum() == 100.0
+    north, east = 0, SECTORS // 4
+    assert rose.frequencies[north].tolist() == [25.0, 50.0, 0, 0, 0, 0]
+    assert rose.frequencies[east, -1] == 25.0
+    assert rose.angles[east] == np.pi / 2
+
+
+def test_wind_rose_points_where_the_wind_blows_to():
+    rose = wind_rose([0.0], [5.0])
+
+    assert rose.frequencies[SECTORS // 2].sum() == 100.0
+
+
+def test_empty_wind_rose():
+    rose = wind_rose([np.nan], [np.nan])
+
+    assert rose.samples == 0 and not rose.frequencies.any()
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from window_stats import window_stats, stats_frames
+
+
+@pytest.fixture
+def table():
+    """Fixture with a random weather like table sorted by time, with some missing values."""
+    rng = np.random.default_rng(7)
+    n = 500
+    df = pd.DataFrame(
+        {
+            "time": np.arange(n, dtype=np.int64) * 3600,
+            "temperature_2m": rng.normal(12, 6, n),
+            "surface_pressure": rng.normal(1013, 8, n),
+            "precipitation": rng.exponential(0.3, n),
+        }
+    )
+    df.loc[rng.choice(n, 40, replace=False), "temperature_2m"] = np.nan
+    df.loc[100:160, "precipitation"] = np.nan
+    yield df
+
+
+BOUNDS = [(0, 500), (495, 500), (476, 500), (0, 300), (300, 500), (120, 140), (250, 250)]
+
+
+def test_matches_pandas(table):
+    """Test that every window gives the statistics pandas computes on a copy of it."""
+    stats = ("min", "max", "avg", "std", "p10", "median", "count")
+    frames = stats_frames(table, BOUNDS, stats)
+
+    for (start, stop), frame in zip(BOUNDS, frames):
+        window = table.iloc[start:stop].drop("time", axis=1)
+        expected = pd.concat(
+            [
+                window.min(),
+                window.max(),
+                window.mean(),
+                window.std(),
+                window.quantile(0.1),
+                window.median(),
+                window.count().astype(float),
+            ],
+            axis=1,
+        ).T
+        expected.index = list(stats)
+        pd.testing.assert_frame_equal(frame, expected, check_exact=False, rtol=1e-9)
+
+
+def test_empty_and_all_missing_windows(table):
+    """Test that an empty window and an all-NaN column give NaN (and a count of 0)."""
+    result = window_stats(table[["precipitation"]].to_numpy(), [(250, 250), (110, 150)],
+                          ("min", "avg", "count"))
+
+    assert np.isnan(result["min"]).all()
+    assert np.isnan(result["avg"]).all()
+    assert result["count"].tolist() == [[0.0], [0.0]]
+
+
+def test_invalid_bounds():
+    """Test that a window ending before it starts is rejected."""
+    with pytest.raises(ValueError):
+        window_stats(np.zeros((10, 2)), [(5, 2)])
@@ -0,0 +1,60 @@
+"""
+Unit conversion of Open-Meteo responses.
+
+Data is always fetched in metric (SI) units and converted locally, so that
+switching a city between Metric and Imperial costs no network round-trip and
+no second cache entry. Columns are picked by the unit Open-Meteo reports for
+them in hourly_units / daily_units, converted with vectorized NumPy
+operations, rounded to the precision the API uses for those units, and the
+units metadata is rewritten to match (Visuals uses it for the axis labels).
+"""
+import numpy as np
+
+# metric unit -> (imperial unit as Open-Meteo labels it, conversion, decimals)
+IMPERIAL = {
+    "°C": ("°F", lambda c: c * 9.0 / 5.0 + 32.0, 1),
+    "km/h": ("mp/h", lambda kmh: kmh / 1.609344, 1),
+    "mm": ("inch", lambda mm: mm / 25.4, 3),
+}
+
+# time series blocks of a response and their units metadata
+BLOCKS = (("hourly", "hourly_units"), ("daily", "daily_units"))
+
+
+def convert_block(values: dict, units: dict, table: dict) -> tuple[dict, dict]:
+    """
+    Converts the columns of one block whose unit is in `table`
+
+    :return: (new values, new units); None values become NaN
+    """
+    values = dict(values)
+    units = dict(units)
+    for name, unit in list(units.items()):
+        if unit not in table or name not in values:
+            continue
+        new_unit, convert, decimals = table[unit]
+        column = np.asarray(values[name], dtype=np.float64)
+        values[name] = np.round(convert(column), decimals)
+        units[name] = new_unit
+    return values, units
+
+
+def convert_units(raw_data: dict, table: dict) -> dict:
+    """
+    Returns a copy of an Open-Meteo response converted with `table`.
+    The input (possibly shared through the response cache) is not modified.
+    """
+    converted = dict(raw_data)
+    for block, units_key in BLOCKS:
+        if block in raw_data and units_key in raw_data:
+            converted[block], converted[units_key] = convert_block(
+                raw_data[block], raw_data[units_key], table
+            )
+    return converted
+
+
+def to_imperial(raw_data: dict) -> dict:
+    """
+    Metric Open-Meteo response -> Fahrenheit, mph and inch
+    """
+    return convert_units(raw_data, IMPERIAL)
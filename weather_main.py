@@ -1,5 +1,9 @@
-from visuals import Visuals
-import pandas as pd
+from collections import OrderedDict
+import argparse
+import sys
+
+# The city index (pandas, numpy) and the plotting code (matplotlib) are
+# imported where they are first used, so the first prompt shows at once
 
 class City:
     """
@@ -27,30 +31,17 @@ class City:
         :return: a tuple of lattitude and longitude
         :rtype: tuple
         """
-        res = ()
-        dfc = pd.read_csv("worldcities.csv")
-        dfc["city_ascii"] = dfc["city_ascii"].str.lower()
-        dfc["country"] = dfc["country"].str.lower()
-
-        search_city = self.name.lower().strip()
-        serch_cntry = self.country.lower().strip()
-
-        # exact match for city and country
+        # worldcities.csv is loaded and indexed once per process
+        # the exact match is on city and country,
         # because same city is in multiple countries like "Kota" in Japan and India
-        match = dfc[
-            (dfc["city_ascii"] == search_city) & 
-            (dfc["country"] == serch_cntry)
-            ]
-        
-        # pick first value from csv if same city and country are multiple times
-        # like "Jaipur" in "India" is multiple times
-        if not match.empty:
-            lat = match["lat"].iloc[0]
-            lng = match["lng"].iloc[0]
-            return (lat, lng)
-        else:
+        # and the first row is picked if the same city and country are in the csv
+        # multiple times like "Jaipur" in "India"
+        from gazetteer import get_gazetteer
+
+        coords = get_gazetteer().coords(self.name, self.country)
+        if not coords:
             print(f"City '{self.name}' not found in database")
-            return res
+        return coords
 
 class UserInputs:
     """
@@ -101,7 +92,30 @@ class UserInputs:
             user_country = input("Enter country name: ")
         
         city_coords = City(user_city, user_country).coords
+        if not city_coords:
+            city_coords = self.pick_city_suggestion(user_city, user_country)
         return city_coords
+
+    def pick_city_suggestion(self, user_city: str, user_country: str) -> tuple:
+        """
+        Lists the closest known cities (typos, accents, partial names)
+        and lets the user pick one of them
+
+        :return: (lat, lng) of the picked city, or an empty tuple to ask again
+        """
+        from city_search import search_cities
+
+        matches = search_cities(user_city, user_country, limit=5)
+        if not matches:
+            return ()
+        print("Did you mean:")
+        for num, match in enumerate(matches, start=1):
+            place = match.place
+            print(f"{num}: {place.city}, {place.country} ({place.lat:.2f}, {place.lng:.2f})")
+        choice = input(f"Enter 1-{len(matches)} (or press Enter to search again):").strip()
+        if choice.isdigit() and 1 <= int(choice) <= len(matches):
+            return matches[int(choice) - 1].coords
+        return ()
     
 
     #-------- Functions for configured values : Start--------
@@ -171,9 +185,147 @@ class UserInputs:
             user_duration = self.get_user_duration()
         return options[user_duration]
 
-def main():
+class Session(UserInputs):
+    """
+    Interactive loop: plots a chart, then lets the user change the city,
+    the duration or the units and plots again.
+    The data of the last locations stays in memory (see location_data.py),
+    so changing the duration or the units needs no new request.
+
+    :max_locations: number of locations kept in memory
+    """
+    def __init__(self, max_locations: int = 8):
+        self.max_locations = max_locations
+        self.locations = OrderedDict()
+
+    def location_data(self, coords: tuple):
+        """
+        Returns the in-memory data of a location (the least recently
+        used one is dropped past max_locations)
+        """
+        from location_data import LocationData
+
+        coords = tuple(coords)
+        if coords in self.locations:
+            self.locations.move_to_end(coords)
+        else:
+            self.locations[coords] = LocationData(coords)
+            if len(self.locations) > self.max_locations:
+                self.locations.popitem(last=False)
+        return self.locations[coords]
+
+    def plot(self, city_coords: tuple, duration: str, unit_sys: str) -> None:
+        """
+        Plots the chart with the data in memory
+        """
+        from visuals import Visuals
+
+        Visuals(city_coords, duration, unit_sys, data=self.location_data(city_coords))
+
+    def get_next_action(self) -> str:
+        """
+        Asks what to change before the next chart
+
+        :return: "c" (city), "d" (duration), "u" (units) or "q" (quit)
+        """
+        while True:
+            print()
+            print("-"*10)
+            print("c: Change city || d: Change duration || u: Change units || q: Quit")
+            action = input("Enter c/d/u/q:").strip().lower()
+            if action in ("c", "d", "u", "q"):
+                return action
+            print("Not a valid option")
+
+    def run(self) -> None:
+        """
+        Asks for the first chart, then loops until the user quits
+        """
+        city_coords, duration, unit_sys = self.user_inputs()
+        while True:
+            try:
+                self.plot(city_coords, duration, unit_sys)
+            except Exception as error:  # e.g. a failed fetch: the data in memory is kept
+                print(f"Could not plot: {type(error).__name__}: {error}")
+            action = self.get_next_action()
+            if action == "q":
+                return
+            if action == "c":
+                city_coords = None
+                while not city_coords:
+                    city_coords = self.get_user_city_coords()
+            elif action == "d":
+                duration = self.get_user_duration()
+            else:
+                unit_sys = self.get_user_unit()
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Command line options; without --jobs the program asks for its inputs
+    """
+    parser = argparse.ArgumentParser(
+        description="Plot weather data from Open-Meteo, interactively or for a file of jobs."
+    )
+    parser.add_argument("--session", action="store_true",
+                        help="keep asking for charts, reusing the data of the cities already shown")
+    parser.add_argument("--jobs", metavar="FILE",
+                        help="CSV or JSON lines file of jobs: city, country, duration, unit "
+                             "(durations: 5hr, 24hr, pst_4d, nxt_3d, 1m, 2m, 3m)")
+    parser.add_argument("--out", metavar="DIR", default="charts",
+                        help="directory for the charts (default: charts)")
+    parser.add_argument("--format", default="png", choices=("png", "svg", "pdf"),
+                        help="chart file format (default: png)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: one per core, 0: none)")
+    parser.add_argument("--stats", metavar="FILE",
+                        help="also write the min, max and avg values of every job to this CSV file")
+    parser.add_argument("--no-charts", action="store_true",
+                        help="only compute the stats, do not draw charts")
+    return parser.parse_args(argv)
+
+
+def run_jobs(args: argparse.Namespace) -> int:
+    """
+    Renders the jobs of args.jobs (see batch_render.py)
+
+    :return: exit status, 1 if a job failed
+    """
+    from batch_render import read_jobs, render_batch
+
+    if args.no_charts and not args.stats:
+        print("Nothing to do: --no-charts needs --stats", file=sys.stderr)
+        return 2
+    try:
+        jobs = read_jobs(args.jobs)
+        report = render_batch(jobs, args.out, fmt=args.format, workers=args.workers,
+                              charts=not args.no_charts, stats=bool(args.stats))
+    except (OSError, ValueError) as error:
+        print(error, file=sys.stderr)
+        return 2
+
+    for result in report.failed:
+        print(f"{result.job.city} {result.job.duration} {result.job.unit_sys}: {result.error}",
+              file=sys.stderr)
+    if args.stats:
+        report.stats_table().to_csv(args.stats, index=False)
+    print(report)
+    return 1 if report.failed else 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.jobs:
+        return run_jobs(args)
+    if args.session:
+        Session().run()
+        return 0
+
     user_data = UserInputs()
+    from visuals import Visuals
+
     Visuals(user_data.city_coords, user_data.duration, user_data.unit_sys)
+    return 0
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
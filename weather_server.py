@@ -0,0 +1,455 @@
+"""
+HTTP API of the weather project, on asyncio (standard library only).
+
+Endpoints (GET, parameters in the query string):
+
+    /coords?city=Paris&country=France        coordinates of a city (via City)
+    /hourly?lat=48.85&lng=2.35[&duration=5hr] hourly table, or a window of it
+    /daily?city=Paris&country=France&days=30  daily table of the last days
+    /stats?...&duration=pst_4d                min, max and avg of every variable
+    /chart.png?...&duration=1m                chart (Visuals in headless mode)
+    /health                                   cache and pool counters
+
+A location is given either as lat and lng or as city and country; every
+endpoint takes unit=Metric|Imperial, and the tables take format=json|csv.
+
+Each stage has its own in-process LRU cache: city -> coordinates, location ->
+LocationData (fetched payloads, tables and analyses, see location_data.py),
+and the encoded response of every table, stats and chart request. A repeated
+request is answered from memory without leaving the event loop, and
+simultaneous requests for a response not made yet wait for the same one. Fetching and
+parsing run on a thread pool, one location at a time, and charts are drawn by
+a pool of worker processes (batch_render's headless setup). The workers never
+fetch: they draw from a snapshot of the payloads the server already has.
+
+Run:
+    python weather_server.py [--host 127.0.0.1] [--port 8080] [--workers N]
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+import argparse
+import asyncio
+import io
+import json
+import multiprocessing
+import os
+import time
+
+from rate_limit import get_limiter
+from single_flight import SingleFlight, get_flights
+
+HOST = "127.0.0.1"
+PORT = 8080
+# Seconds a cached table, stats or chart response is served
+RESPONSE_TTL = 5 * 60
+# Entries of each stage cache
+COORDS_ITEMS = 4096
+LOCATION_ITEMS = 256
+RESPONSE_ITEMS = 2048
+CHART_ITEMS = 512
+FETCH_THREADS = 8
+# Bytes of a request head (request line and headers)
+MAX_HEAD = 16 * 1024
+
+UNIT_SYSTEMS = ("Metric", "Imperial")
+JSON = "application/json"
+
+
+class HTTPError(Exception):
+    """An error answered with its status code and message"""
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class LRUCache:
+    """
+    In-memory LRU cache with an optional time to live, and hit counters
+    (used from the event loop only, so without locking)
+    """
+    def __init__(self, maxsize: int, ttl: float | None = None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()  # key -> (expires, value)
+
+    def get(self, key, default=None):
+        item = self._items.get(key)
+        if item is None or (item[0] is not None and item[0] < self.clock()):
+            self.misses += 1
+            return default
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def put(self, key, value) -> None:
+        expires = None if self.ttl is None else self.clock() + self.ttl
+        self._items[key] = (expires, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def as_dict(self) -> dict:
+        return {"items": len(self._items), "hits": self.hits, "misses": self.misses}
+
+
+def render_png(data, duration: str, unit_sys: str) -> bytes:
+    """
+    Draws a chart and returns the PNG (runs in a render worker)
+
+    :param data: LocationData.snapshot() holding the payload of the duration
+    """
+    from batch_render import configure_headless
+
+    configure_headless()
+    from visuals import Visuals
+
+    buffer = io.BytesIO()
+    Visuals(data.coords, duration, unit_sys, output=buffer, data=data)
+    return buffer.getvalue()
+
+
+def _render_worker_init() -> None:
+    from batch_render import _init_worker
+
+    _init_worker()
+
+
+def json_body(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), allow_nan=False, default=str).encode()
+
+
+def table_body(df, units: dict, timezone: str, fmt: str) -> tuple:
+    """(content type, body) of a table as JSON ("split" layout) or CSV"""
+    if fmt == "csv":
+        return "text/csv; charset=utf-8", df.to_csv(index=False).encode()
+    table = json.loads(df.to_json(orient="split", index=False))
+    return JSON, json_body({"timezone": timezone, "units": units, **table})
+
+
+class WeatherService:
+    """
+    The endpoints, their caches and pools (see the module docstring)
+
+    :param render_workers: chart worker processes; 0 draws on one thread
+                           of this process instead
+    """
+    def __init__(self, render_workers: int | None = None, fetch_threads: int = FETCH_THREADS):
+        self.coords = LRUCache(COORDS_ITEMS)
+        self.locations = LRUCache(LOCATION_ITEMS)
+        self.responses = LRUCache(RESPONSE_ITEMS, ttl=RESPONSE_TTL)
+        self.charts = LRUCache(CHART_ITEMS, ttl=RESPONSE_TTL)
+        self.requests = 0
+        # coalesces concurrent misses of the same response
+        # (immutable (content type, bytes) pairs: shared, not copied)
+        self.flights = SingleFlight(copy=None)
+        self._threads = ThreadPoolExecutor(max_workers=fetch_threads, thread_name_prefix="fetch")
+        render_workers = (os.cpu_count() or 1) if render_workers is None else render_workers
+        if render_workers:
+            # spawned, not forked: the server already has threads and open sockets
+            self._renderers = ProcessPoolExecutor(max_workers=render_workers, initializer=_render_worker_init,
+                                                  mp_context=multiprocessing.get_context("spawn"))
+        else:
+            # matplotlib is not thread safe: one drawing thread
+            self._renderers = ThreadPoolExecutor(max_workers=1, thread_name_prefix="render")
+        self.routes = {
+            "/coords": self.get_coords,
+            "/hourly": self.get_hourly,
+            "/daily": self.get_daily,
+            "/stats": self.get_stats,
+            "/chart.png": self.get_chart,
+            "/health": self.get_health,
+        }
+
+    def close(self) -> None:
+        self._threads.shutdown(wait=False)
+        self._renderers.shutdown(wait=False)
+
+    async def run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._threads, partial(func, *args))
+
+    # -------- Parameters --------
+    async def location(self, params: dict) -> tuple:
+        """(lat, lng) from lat and lng, or from city and country"""
+        if "lat" in params or "lng" in params:
+            try:
+                lat, lng = float(params["lat"]), float(params["lng"])
+            except (KeyError, ValueError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "lat and lng must both be numbers")
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "lat or lng out of range")
+            return round(lat, 4), round(lng, 4)
+        city = params.get("city", "").strip()
+        if not city:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Give lat and lng, or city (and country)")
+        key = (city.lower(), params.get("country", "").strip().lower())
+        coords = self.coords.get(key)
+        if coords is None:
+            coords = await self.run_blocking(self.resolve_city, city, params.get("country", "").strip())
+            self.coords.put(key, coords)
+        return coords
+
+    @staticmethod
+    def resolve_city(city: str, country: str) -> tuple:
+        """Coordinates of a city through weather_main.City, then the city search"""
+        from batch_render import resolve_city
+        from weather_main import City
+
+        coords = City(city, country).coords if country else ()
+        if not coords:
+            try:
+                coords = resolve_city(f"{city}, {country}" if country else city, strict=False)
+            except ValueError as error:
+                raise HTTPError(HTTPStatus.NOT_FOUND, str(error))
+        return tuple(coords)
+
+    @staticmethod
+    def unit_sys(params: dict) -> str:
+        unit_sys = params.get("unit", "Metric").capitalize()
+        if unit_sys not in UNIT_SYSTEMS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"unit must be one of {', '.join(UNIT_SYSTEMS)}")
+        return unit_sys
+
+    @staticmethod
+    def duration(params: dict, durations) -> str:
+        duration = params.get("duration", "")
+        if duration not in durations:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"duration must be one of {', '.join(durations)}")
+        return duration
+
+    async def location_data(self, coords: tuple, func, *args):
+        """
+        Calls func(LocationData of coords, *args) on the fetch pool;
+        the calls of one location run one at a time
+        """
+        from location_data import LocationData
+
+        # the lock lives and is evicted with the data it guards
+        entry = self.locations.get(coords)
+        if entry is None:
+            entry = (LocationData(coords), asyncio.Lock())
+            self.locations.put(coords, entry)
+        data, lock = entry
+        async with lock:
+            return await self.run_blocking(func, data, *args)
+
+    async def cached(self, cache: LRUCache, key, make):
+        """
+        Cached (content type, body) of a response, made by the coroutine
+        function make; concurrent misses of a key share one make()
+        """
+        response = cache.get(key)
+        if response is None:
+            response = await self.flights.do_async(key, self._make_and_put, cache, key, make)
+        return response
+
+    @staticmethod
+    async def _make_and_put(cache: LRUCache, key, make):
+        response = await make()
+        cache.put(key, response)
+        return response
+
+    # -------- Endpoints: return (content type, body) --------
+    async def get_coords(self, params: dict) -> tuple:
+        lat, lng = await self.location(params)
+        return JSON, json_body({"lat": lat, "lng": lng})
+
+    async def get_hourly(self, params: dict) -> tuple:
+        from location_data import HOURLY_DURATION_WINDOWS, HOURLY_DURATIONS
+
+        coords, unit_sys = await self.location(params), self.unit_sys(params)
+        duration = self.duration(params, HOURLY_DURATIONS) if "duration" in params else None
+        fmt = params.get("format", "json")
+
+        def make_table(data):
+            loaded = data.hourly(unit_sys)
+            analysis = loaded.analysis
+            df = analysis.window(HOURLY_DURATION_WINDOWS[duration]) if duration else analysis.df
+            return table_body(df, loaded.units, loaded.timezone, fmt)
+
+        return await self.cached(self.responses, ("hourly", coords, unit_sys, duration, fmt),
+                                 lambda: self.location_data(coords, make_table))
+
+    async def get_daily(self, params: dict) -> tuple:
+        from location_data import DAILY_DURATION_DAYS
+
+        coords, unit_sys = await self.location(params), self.unit_sys(params)
+        if "duration" in params:
+            days = DAILY_DURATION_DAYS[self.duration(params, DAILY_DURATION_DAYS)]
+        else:
+            try:
+                days = int(params.get("days", 30))
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "days must be a whole number")
+        if not 1 <= days <= 90:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "days must be between 1 and 90")
+        fmt = params.get("format", "json")
+
+        def make_table(data):
+            loaded = data.daily(days, unit_sys)
+            df, _ = loaded.analysis
+            return table_body(df, loaded.units, loaded.timezone, fmt)
+
+        return await self.cached(self.responses, ("daily", coords, unit_sys, days, fmt),
+                                 lambda: self.location_data(coords, make_table))
+
+    async def get_stats(self, params: dict) -> tuple:
+        from location_data import DAILY_DURATION_DAYS, HOURLY_DURATIONS
+
+        coords, unit_sys = await self.location(params), self.unit_sys(params)
+        duration = self.duration(params, HOURLY_DURATIONS + tuple(DAILY_DURATION_DAYS))
+
+        def make_stats(data):
+            _, stats = data.window(duration, unit_sys)
+            units = data.load(duration, unit_sys).units
+            variables = {
+                name: {"unit": units.get(name, ""), **{stat: (None if value != value else value)
+                                                        for stat, value in stats[name].items()}}
+                for name in stats.columns
+            }
+            return JSON, json_body({"lat": coords[0], "lng": coords[1], "duration": duration,
+                                    "unit": unit_sys, "stats": variables})
+
+        return await self.cached(self.responses, ("stats", coords, unit_sys, duration),
+                                 lambda: self.location_data(coords, make_stats))
+
+    async def get_chart(self, params: dict) -> tuple:
+        from location_data import DAILY_DURATION_DAYS, HOURLY_DURATIONS
+
+        coords, unit_sys = await self.location(params), self.unit_sys(params)
+        duration = self.duration(params, HOURLY_DURATIONS + tuple(DAILY_DURATION_DAYS))
+
+        def chart_data(data):
+            data.load(duration, unit_sys)
+            return data.snapshot()
+
+        async def make_chart():
+            # fetched here, with the data of the other endpoints
+            data = await self.location_data(coords, chart_data)
+            loop = asyncio.get_running_loop()
+            png = await loop.run_in_executor(self._renderers, render_png, data, duration, unit_sys)
+            return "image/png", png
+
+        return await self.cached(self.charts, (coords, unit_sys, duration), make_chart)
+
+    async def get_health(self, params: dict) -> tuple:
+        return JSON, json_body({
+            "requests": self.requests,
+            "coords": self.coords.as_dict(),
+            "locations": self.locations.as_dict(),
+            "responses": self.responses.as_dict(),
+            "charts": self.charts.as_dict(),
+            "coalesced_responses": self.flights.stats.as_dict(),
+            "coalesced_fetches": flights.stats.as_dict() if (flights := get_flights()) else None,
+            "rate_limit": limiter.stats.as_dict() if (limiter := get_limiter()) else None,
+        })
+
+    # -------- HTTP --------
+    async def respond(self, method: str, target: str) -> tuple:
+        """(status, content type, body) of a request"""
+        self.requests += 1
+        if method not in ("GET", "HEAD"):
+            return HTTPStatus.METHOD_NOT_ALLOWED, JSON, json_body({"error": "Only GET is supported"})
+        url = urlsplit(target)
+        handler = self.routes.get(url.path)
+        if handler is None:
+            return HTTPStatus.NOT_FOUND, JSON, json_body({"error": f"Unknown endpoint: {url.path}"})
+        try:
+            content_type, body = await handler(dict(parse_qsl(url.query)))
+        except HTTPError as error:
+            return error.status, JSON, json_body({"error": str(error)})
+        except Exception as error:  # the fetch or the drawing failed: the server goes on
+            import requests
+
+            status = (HTTPStatus.BAD_GATEWAY if isinstance(error, requests.RequestException)
+                      else HTTPStatus.INTERNAL_SERVER_ERROR)
+            return status, JSON, json_body({"error": f"{type(error).__name__}: {error}"})
+        return HTTPStatus.OK, content_type, body
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the requests of one connection (HTTP/1.1 keep-alive)"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # the end of the request is unknown: answer and close
+                    status, content_type, body = (HTTPStatus.BAD_REQUEST, JSON,
+                                                  json_body({"error": "Invalid Content-Length header"}))
+                    keep_alive = False
+                else:
+                    if length:
+                        await reader.readexactly(length)
+                    status, content_type, body = await self.respond(method, target)
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (version != "HTTP/1.0" or connection == "keep-alive")
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                )
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        finally:
+            writer.close()
+
+    async def start(self, host: str = HOST, port: int = PORT) -> asyncio.Server:
+        return await asyncio.start_server(self.handle, host, port, limit=MAX_HEAD)
+
+
+async def serve(host: str = HOST, port: int = PORT, render_workers: int | None = None) -> None:
+    """Runs the server until it is cancelled"""
+    service = WeatherService(render_workers)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP API for weather tables, stats and charts.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="chart worker processes (default: one per core, 0: a thread)")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
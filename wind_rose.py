@@ -0,0 +1,81 @@
+"""
+Wind rose aggregation: how often the wind blew from each direction, by speed.
+
+Directions are binned into compass sectors centred on N, NNE, NE... and speeds
+into classes of equal width, with one vectorized 2-D histogram over all
+samples. The chart then draws a fixed number of stacked bars (sectors x speed
+classes) whatever the number of hourly or daily samples.
+
+Directions are meteorological degrees: the direction the wind comes from,
+clockwise from north, as Open-Meteo returns them for wind_direction_10m and
+wind_direction_10m_dominant. The rose has always pointed its bars where the
+wind blows to, so by default the sectors are turned by 180 degrees.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+SECTORS = 16
+SPEED_CLASSES = 6
+NICE_STEPS = (1.0, 2.0, 2.5, 5.0, 10.0)
+
+
+class WindRose(NamedTuple):
+    """
+    Result of wind_rose()
+
+    :angles: centre of each sector in radians, clockwise from north
+    :width: angular width of a sector in radians
+    :edges: speed class edges, SPEED_CLASSES + 1 values from 0
+    :frequencies: percent of the samples per (sector, speed class)
+    :samples: number of samples with both a direction and a speed
+    """
+    angles: np.ndarray
+    width: float
+    edges: np.ndarray
+    frequencies: np.ndarray
+    samples: int
+
+
+def speed_edges(max_speed: float, classes: int = SPEED_CLASSES) -> np.ndarray:
+    """
+    Speed class edges 0, step, 2*step... covering max_speed, with a
+    round step (1, 2, 2.5 or 5 times a power of ten)
+    """
+    if not np.isfinite(max_speed) or max_speed <= 0:
+        return np.arange(classes + 1, dtype=np.float64)
+    raw = max_speed / classes
+    power = 10.0 ** np.floor(np.log10(raw))
+    step = next(nice * power for nice in NICE_STEPS if nice * power >= raw)
+    return step * np.arange(classes + 1, dtype=np.float64)
+
+
+def wind_rose(directions, speeds, sectors: int = SECTORS, classes: int = SPEED_CLASSES,
+              edges=None, toward: bool = True) -> WindRose:
+    """
+    Bins wind samples into direction sectors and speed classes
+
+    :param directions: wind directions in degrees (meteorological, "from")
+    :param speeds: wind speeds, in any unit
+    :param edges: speed class edges (default: speed_edges of the highest speed)
+    :param toward: turn the sectors to where the wind blows to
+    :return: WindRose; samples with a missing direction or speed are skipped
+    """
+    directions = np.asarray(directions, dtype=np.float64)
+    speeds = np.asarray(speeds, dtype=np.float64)
+    valid = np.isfinite(directions) & np.isfinite(speeds)
+    directions, speeds = directions[valid], speeds[valid]
+
+    if edges is None:
+        edges = speed_edges(speeds.max() if len(speeds) else 0.0, classes)
+    edges = np.asarray(edges, dtype=np.float64)
+    width = 2 * np.pi / sectors
+
+    # Shift by half a sector so that sector 0 is centred on north
+    shifted = (directions + (180.0 if toward else 0.0) + 180.0 / sectors) % 360.0
+    # Speeds past the last edge (given edges) count in the last class
+    clipped = np.clip(speeds, edges[0], edges[-1])
+    counts, _, _ = np.histogram2d(shifted, clipped, bins=(np.linspace(0.0, 360.0, sectors + 1), edges))
+    frequencies = counts * (100.0 / len(speeds)) if len(speeds) else counts
+
+    return WindRose(np.arange(sectors) * width, width, edges, frequencies, int(len(speeds)))
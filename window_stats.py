@@ -0,0 +1,157 @@
+"""
+Summary statistics of time windows of a weather table in one pass.
+
+The analysis windows (5 hours, 1 day, archive, forecast, the whole table...)
+are row ranges [start, stop) of a table sorted by time. Instead of copying
+every window and reducing each copy separately, the window boundaries cut the
+value block into elementary segments. Each segment is reduced once with
+ufunc.reduceat (min, max, sum, count, sum of squares), and a window's
+statistics are then combined from the few segments it spans. NaNs are skipped
+like pandas does, and an empty window gives NaN.
+
+Percentiles cannot be combined from segments and are computed on a view of
+each window instead.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Row labels of the stats frames, in the order analysis.py has always used
+STATS = ("min", "max", "avg")
+
+
+def window_bounds(bounds, n: int) -> np.ndarray:
+    """
+    Validates (start, stop) row ranges and clips them to [0, n]
+
+    :return: int64 array of shape (windows, 2)
+    """
+    bounds = np.asarray(bounds, dtype=np.int64).reshape(-1, 2)
+    bounds = np.clip(bounds, 0, n)
+    if np.any(bounds[:, 0] > bounds[:, 1]):
+        raise ValueError("Window start must not be after its stop.")
+    return bounds
+
+
+def _percentile(name: str) -> float | None:
+    """'p90' -> 90.0, 'median' -> 50.0, anything else -> None"""
+    if name == "median":
+        return 50.0
+    if name.startswith("p"):
+        try:
+            return float(name[1:])
+        except ValueError:
+            return None
+    return None
+
+
+def window_stats(values: np.ndarray, bounds, stats=STATS, ddof: int = 1) -> dict:
+    """
+    Computes `stats` of every column of `values` for each row window
+
+    :param values: 2D float array (rows sorted by time, one column per variable)
+    :param bounds: sequence of (start, stop) row ranges
+    :param stats: any of "min", "max", "avg" (or "mean"), "std", "count",
+                  "sum", "median" and "pNN" percentiles such as "p90"
+    :param ddof: delta degrees of freedom of "std" (pandas uses 1)
+    :return: stat name -> array of shape (windows, columns)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, None]
+    n, k = values.shape
+    bounds = window_bounds(bounds, n)
+
+    # Elementary segments between consecutive distinct boundaries
+    cuts = np.unique(bounds)
+    starts = cuts[:-1]
+    needed = set(stats)
+    segments = {}
+    if len(starts):
+        # reduceat reduces values[starts[i]:starts[i + 1]] and the last
+        # segment up to the end of the array, so end the array at the last cut
+        block = values[:cuts[-1]]
+        missing = np.isnan(block)
+        if "min" in needed:
+            segments["min"] = np.fmin.reduceat(block, starts, axis=0)
+        if "max" in needed:
+            segments["max"] = np.fmax.reduceat(block, starts, axis=0)
+        if needed & {"avg", "mean", "std", "sum", "count"}:
+            filled = np.where(missing, 0.0, block)
+            segments["sum"] = np.add.reduceat(filled, starts, axis=0)
+            segments["count"] = np.add.reduceat(~missing, starts, axis=0, dtype=np.int64)
+            if "std" in needed:
+                segments["sumsq"] = np.add.reduceat(filled * filled, starts, axis=0)
+
+    # Window i spans the segments first[i]:last[i]
+    first = np.searchsorted(cuts, bounds[:, 0])
+    last = np.searchsorted(cuts, bounds[:, 1])
+
+    def combine(name, reduce, fill):
+        out = np.full((len(bounds), k), fill, dtype=np.float64)
+        for i, (a, b) in enumerate(zip(first, last)):
+            if b > a:
+                out[i] = reduce(segments[name][a:b], axis=0)
+        return out
+
+    result = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if "min" in needed:
+            result["min"] = combine("min", np.fmin.reduce, np.nan)
+        if "max" in needed:
+            result["max"] = combine("max", np.fmax.reduce, np.nan)
+        if needed & {"avg", "mean", "std", "sum", "count"}:
+            sums = combine("sum", np.sum, 0.0)
+            counts = combine("count", np.sum, 0.0)
+            means = np.where(counts > 0, sums / counts, np.nan)
+            if "count" in needed:
+                result["count"] = counts
+            if "sum" in needed:
+                result["sum"] = sums
+            for name in ("avg", "mean"):
+                if name in needed:
+                    result[name] = means
+            if "std" in needed:
+                sumsq = combine("sumsq", np.sum, 0.0)
+                var = (sumsq - sums * means) / (counts - ddof)
+                result["std"] = np.where(counts > ddof, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    for name in stats:
+        if name in result:
+            continue
+        q = _percentile(name)
+        if q is None:
+            raise ValueError(f"Unknown statistic: {name}")
+        out = np.full((len(bounds), k), np.nan)
+        for i, (start, stop) in enumerate(bounds):
+            if stop > start:
+                with warnings.catch_warnings():
+                    # all NaN columns give NaN, like pandas
+                    warnings.simplefilter("ignore", RuntimeWarning)
+                    out[i] = np.nanpercentile(values[start:stop], q, axis=0)
+        result[name] = out
+
+    return {name: result[name] for name in stats}
+
+
+def stats_frames(df: pd.DataFrame, bounds, stats=STATS, ddof: int = 1) -> list[pd.DataFrame]:
+    """
+    window_stats() of the variables of a weather table (every column but
+    'time'), as one frame per window with the stat names as row labels
+
+    :param df: table sorted by time
+    :param bounds: sequence of (start, stop) row ranges
+    :return: list of DataFrames (stats x variables), one per window
+    """
+    columns = [column for column in df.columns if column != "time"]
+    values = df[columns].to_numpy(dtype=np.float64)
+    result = window_stats(values, bounds, stats, ddof)
+    return [
+        pd.DataFrame(
+            np.stack([result[name][i] for name in stats]),
+            index=list(stats),
+            columns=columns,
+        )
+        for i in range(len(np.asarray(bounds).reshape(-1, 2)))
+    ]